@@ -0,0 +1,128 @@
+"""Benchmark sending seen updates to the entities of every device.
+
+Compares the dispatcher signal per device the entities used to subscribe
+to with the per-device listener registry of the coordinator.
+
+Run from the repository root with Home Assistant installed:
+
+    python -m benchmarks.dispatch [--devices N] [--entities-per-device N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import (
+    async_dispatcher_connect,
+    async_dispatcher_send,
+)
+
+from custom_components.ProxyProximity import coordinator as coordinator_module
+from custom_components.ProxyProximity.coordinator import ProxyProximityCoordinator
+
+ROUNDS = 20
+
+
+class _Counter:
+    """Counts the calls of the listeners of every entity."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def listener(self) -> Callable[[object], None]:
+        """Return a new listener, as each entity subscribes its own callable."""
+
+        @callback
+        def _async_seen(_advertisement: object) -> None:
+            self.calls += 1
+
+        return _async_seen
+
+
+def _device_ids(devices: int) -> list[str]:
+    return [
+        f"00000000-0000-0000-0000-000000001234_1_{number}_AA:BB:CC:{number:06X}"
+        for number in range(devices)
+    ]
+
+
+def _bench_dispatcher(hass: HomeAssistant, device_ids: list[str], entities: int) -> float:
+    """Return the seconds per advertisement using one dispatcher signal per device."""
+    counter = _Counter()
+    for device_id in device_ids:
+        for _ in range(entities):
+            async_dispatcher_connect(
+                hass, f"ProxyProximity_seen_device_{device_id}", counter.listener()
+            )
+
+    advertisement = object()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for device_id in device_ids:
+            async_dispatcher_send(
+                hass, f"ProxyProximity_seen_device_{device_id}", advertisement
+            )
+    elapsed = time.perf_counter() - start
+    assert counter.calls == ROUNDS * len(device_ids) * entities
+    return elapsed / (ROUNDS * len(device_ids))
+
+
+def _bench_listeners(device_ids: list[str], entities: int) -> float:
+    """Return the seconds per advertisement using the coordinator listener registry."""
+    with patch.object(coordinator_module, "Store"):
+        coordinator = ProxyProximityCoordinator(
+            SimpleNamespace(),
+            SimpleNamespace(entry_id="benchmark", data={}, options={}),
+            SimpleNamespace(),
+        )
+    counter = _Counter()
+    for device_id in device_ids:
+        for _ in range(entities):
+            coordinator.async_add_device_listener(
+                device_id, counter.listener(), lambda: None
+            )
+
+    advertisement = object()
+    write_seen = coordinator._async_write_seen  # pylint: disable=protected-access
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for device_id in device_ids:
+            write_seen(device_id, advertisement)
+    elapsed = time.perf_counter() - start
+    assert counter.calls == ROUNDS * len(device_ids) * entities
+    return elapsed / (ROUNDS * len(device_ids))
+
+
+async def _async_run(devices: int, entities: int) -> None:
+    """Run both benchmarks and print the cost per advertisement."""
+    device_ids = _device_ids(devices)
+    with tempfile.TemporaryDirectory() as config_dir:
+        try:
+            hass = HomeAssistant(config_dir)
+        except TypeError:
+            hass = HomeAssistant()  # pylint: disable=no-value-for-parameter
+            hass.config.config_dir = config_dir
+        dispatcher = _bench_dispatcher(hass, device_ids, entities)
+    listeners = _bench_listeners(device_ids, entities)
+    print(f"{devices} devices, {entities} entities per device")
+    print(f"dispatcher signals: {dispatcher * 1_000_000:8.2f} us/advertisement")
+    print(f"listener registry:  {listeners * 1_000_000:8.2f} us/advertisement")
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=2_000)
+    parser.add_argument("--entities-per-device", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(_async_run(args.devices, args.entities_per_device))
+
+
+if __name__ == "__main__":
+    main()
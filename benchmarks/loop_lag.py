@@ -0,0 +1,186 @@
+"""Benchmark how long the ProxyProximity area classification stalls the event loop.
+
+Runs the area classification of the update tick over thousands of
+beacons heard by several scanners in each pipeline mode while a probe
+task measures how late the event loop wakes it up. Reports the time
+spent on the loop per tick and the p99 and max lag seen by the probe.
+
+Run from the repository root with Home Assistant installed:
+
+    python -m benchmarks.loop_lag [--beacons N] [--ticks N] [--pipeline MODE ...]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Coroutine
+import random
+import time
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+from uuid import UUID
+
+from custom_components.ProxyProximity import (
+    area as area_module,
+    coordinator as coordinator_module,
+)
+from custom_components.ProxyProximity.const import (
+    CONF_PIPELINE,
+    CONF_SCANNER_AREAS,
+    MAX_SOURCES_PER_BEACON,
+    Pipeline,
+)
+from custom_components.ProxyProximity.coordinator import ProxyProximityCoordinator
+
+SCANNERS = 32
+AREAS = 8
+# Seconds between probe wake ups and between classification ticks
+PROBE_INTERVAL = 0.001
+TICK_INTERVAL = 0.1
+# Loop stall the pipeline should stay under at 5,000 beacons
+TARGET_MS = 5.0
+
+
+class _Advertisement:
+    """Minimal stand-in for ProxyProximityAdvertisement."""
+
+    __slots__ = ("rssi", "source", "transient")
+
+    def __init__(self, rssi: int, source: str) -> None:
+        self.rssi = rssi
+        self.source = source
+        self.transient = False
+
+
+def _address(number: int) -> str:
+    return ":".join(f"{byte:02X}" for byte in number.to_bytes(6, "big"))
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """Return a percentile of values, 0 if there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _build_coordinator(
+    loop: asyncio.AbstractEventLoop, beacons: int, pipeline: Pipeline
+) -> ProxyProximityCoordinator:
+    """Build a coordinator tracking beacons heard by several scanners each."""
+
+    def _async_add_executor_job(target: Any, *args: Any) -> asyncio.Future[Any]:
+        return loop.run_in_executor(None, target, *args)
+
+    def _async_create_background_task(
+        _hass: object, target: Coroutine[Any, Any, Any], name: str
+    ) -> asyncio.Task[Any]:
+        return loop.create_task(target, name=name)
+
+    scanners = [f"proxy_{number}" for number in range(SCANNERS)]
+    with patch.object(coordinator_module, "Store"):
+        coordinator = ProxyProximityCoordinator(
+            SimpleNamespace(loop=loop, async_add_executor_job=_async_add_executor_job),
+            SimpleNamespace(
+                entry_id="benchmark",
+                data={},
+                options={
+                    CONF_PIPELINE: pipeline,
+                    CONF_SCANNER_AREAS: {
+                        scanner: f"area_{number % AREAS}"
+                        for number, scanner in enumerate(scanners)
+                    },
+                },
+                async_create_background_task=_async_create_background_task,
+            ),
+            SimpleNamespace(devices={}, async_get_device=lambda **_kwargs: None),
+        )
+    index = coordinator._index  # pylint: disable=protected-access
+    beacon_uuid = index.add_uuid(UUID(int=0x1234))
+    rng = random.Random(beacons)
+    now = time.monotonic()
+    for number in range(beacons):
+        group = index.add_group(beacon_uuid, number >> 16, number & 0xFFFF)
+        beacon = index.track(group, _address(number))
+        beacon.advertisement = _Advertisement(-70, scanners[0])
+        for scanner in rng.sample(scanners, MAX_SOURCES_PER_BEACON):
+            beacon.state.sources.add(scanner, rng.randint(-95, -45), now)
+    return coordinator
+
+
+async def _async_run(beacons: int, ticks: int, pipeline: Pipeline) -> dict[str, float]:
+    """Classify the areas ticks times while probing the loop lag."""
+    loop = asyncio.get_running_loop()
+    coordinator = _build_coordinator(loop, beacons, pipeline)
+    if pipeline is Pipeline.PROCESS:
+        # Started by async_start before the first tick
+        await coordinator._async_start_process_pool()  # pylint: disable=protected-access
+    update_areas = coordinator._async_update_areas  # pylint: disable=protected-access
+    lags: list[float] = []
+    stalls: list[float] = []
+    running = True
+
+    async def _probe() -> None:
+        while running:
+            expected = loop.time() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(loop.time() - expected, 0.0))
+
+    probe = loop.create_task(_probe())
+    perf_counter = time.perf_counter
+    for _ in range(ticks):
+        start = perf_counter()
+        update_areas()
+        stalls.append(perf_counter() - start)
+        await asyncio.sleep(TICK_INTERVAL)
+    running = False
+    await probe
+    coordinator._async_stop()  # pylint: disable=protected-access
+    return {
+        "stall_p99_ms": _percentile(stalls, 99) * 1000,
+        "lag_p99_ms": _percentile(lags, 99) * 1000,
+        "lag_max_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+def run(beacons: int, ticks: int, pipelines: list[Pipeline]) -> None:
+    """Run the benchmark for each pipeline mode and print the results."""
+    area_registry = SimpleNamespace(
+        async_get_area=lambda area_id: SimpleNamespace(name=area_id)
+    )
+    print(
+        f"{'pipeline':>9} {'beacons':>8} {'stall p99 ms':>13} "
+        f"{'lag p99 ms':>11} {'lag max ms':>11} {'target':>7}"
+    )
+    with patch.object(area_module.ar, "async_get", return_value=area_registry):
+        for pipeline in pipelines:
+            result = asyncio.run(_async_run(beacons, ticks, pipeline))
+            print(
+                f"{pipeline:>9} {beacons:>8} {result['stall_p99_ms']:>13.3f} "
+                f"{result['lag_p99_ms']:>11.3f} {result['lag_max_ms']:>11.3f} "
+                f"{'ok' if result['lag_max_ms'] < TARGET_MS else 'miss':>7}"
+            )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--beacons", type=int, default=5_000)
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument(
+        "--pipeline",
+        action="append",
+        choices=[pipeline.value for pipeline in Pipeline],
+        dest="pipelines",
+    )
+    args = parser.parse_args()
+    run(
+        args.beacons,
+        args.ticks,
+        [Pipeline(pipeline) for pipeline in args.pipelines or Pipeline],
+    )
+
+
+if __name__ == "__main__":
+    main()
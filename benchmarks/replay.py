@@ -0,0 +1,606 @@
+"""Replay a stream of advertisements through the ProxyProximity coordinator.
+
+Feeds synthetic scenarios or a recorded stream of advertisements into
+the Bluetooth callback and the update and refresh ticks of the coordinator under a
+stub hass with a fake clock, a fake bluetooth.async_last_service_info
+and no scanner besides the source of each advertisement, so hot path regressions can be caught locally without a radio. Reports
+throughput, p99 and max callback latency, tick and refresh latency, the
+peak memory of the replay and the memory held by the integration at its
+end.
+Scenarios can restart the coordinator from its snapshot midway, and the
+replay exits with status 1 if the regression check of a scenario fails.
+
+Run from the repository root with Home Assistant installed:
+
+    python -m benchmarks.replay [--scenario NAME ...] [--devices N] [--duration SECONDS]
+    python -m benchmarks.replay --recording advertisements.jsonl
+
+A recording has one JSON object per line, in time order, with the keys
+time (seconds), address, name, rssi, source and payload (the Apple
+manufacturer data as hex).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import ExitStack
+from datetime import datetime
+import heapq
+from itertools import count
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+from uuid import UUID
+
+from ProxyProximity_ble import (
+    APPLE_MFR_ID,
+    ProxyProximity_FIRST_BYTE,
+    ProxyProximity_SECOND_BYTE,
+)
+
+from homeassistant.components import bluetooth
+from homeassistant.core import CoreState
+
+from custom_components.ProxyProximity import (
+    coordinator as coordinator_module,
+    ignore_list as ignore_list_module,
+    state_writer as state_writer_module,
+)
+from custom_components.ProxyProximity.const import REFRESH_TICK, UPDATE_INTERVAL
+from custom_components.ProxyProximity.coordinator import ProxyProximityCoordinator
+
+FIXED_UUID = UUID("f7826da6-4fa2-4e98-8024-bc5b71e0893e")
+PHONE_UUID = UUID("74278bda-b644-4520-8f0c-720eaf059935")
+PASSER_BY_UUID = UUID("e2c56db5-dffb-48d2-b060-d0f5a71096e0")
+FLOOD_UUID = UUID("fda50693-a4e2-4fb1-afcf-c6eb07647825")
+SOURCES = ("proxy_kitchen", "proxy_office", "proxy_hall")
+# Ids sharing an UUID in the well behaved scenarios, below MAX_IDS_PER_UUID
+IDS_PER_UUID = 32
+# Seconds a passer-by is heard, one in LINGER_EVERY stays for
+# LINGER_SECONDS, longer than TRANSIENT_MIN_DWELL
+PASSER_BY_SECONDS = 10
+LINGER_EVERY = 10
+LINGER_SECONDS = 60
+# Memory allocated from these files counts as the memory of the integration
+INTEGRATION_FILES = os.path.join(os.path.dirname(coordinator_module.__file__), "*")
+# Seconds the fake bluetooth.async_last_service_info keeps returning the
+# last advertisement of an address, it is forgotten after that
+SERVICE_INFO_STALE_SECONDS = 2 * UPDATE_INTERVAL.total_seconds()
+
+
+class ReplayDevice:
+    """Minimal stand-in for BLEDevice."""
+
+    __slots__ = ("address", "name")
+
+    def __init__(self, address: str, name: str | None) -> None:
+        self.address = address
+        self.name = name
+
+
+class ReplayServiceInfo:
+    """Minimal stand-in for BluetoothServiceInfoBleak."""
+
+    __slots__ = (
+        "name",
+        "address",
+        "rssi",
+        "manufacturer_data",
+        "service_data",
+        "service_uuids",
+        "source",
+        "time",
+        "device",
+        "connectable",
+    )
+
+    def __init__(
+        self,
+        time_: float,
+        address: str,
+        name: str,
+        rssi: int,
+        source: str,
+        payload: bytes,
+    ) -> None:
+        self.name = name
+        self.address = address
+        self.rssi = rssi
+        self.manufacturer_data = {APPLE_MFR_ID: payload}
+        self.service_data: dict[str, bytes] = {}
+        self.service_uuids: list[str] = []
+        self.source = source
+        self.time = time_
+        self.device = ReplayDevice(address, name)
+        self.connectable = False
+
+
+class Restart:
+    """Point in a stream where Home Assistant restarts.
+
+    The coordinator is rebuilt from the snapshot of the one it replaces.
+    """
+
+    __slots__ = ("time",)
+
+    def __init__(self, time_: float) -> None:
+        self.time = time_
+
+
+ReplayEvent = ReplayServiceInfo | Restart
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the replay moves it."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeTimers:
+    """Stand-in for async_call_later that fires on the fake clock."""
+
+    def __init__(self, clock: FakeClock) -> None:
+        self._clock = clock
+        self._timers: list[list[Any]] = []
+        self._ids = count()
+
+    def call_later(
+        self, _hass: object, delay: float, action: Callable[[datetime | None], None]
+    ) -> Callable[[], None]:
+        timer = [self._clock.now + delay, next(self._ids), action, True]
+        heapq.heappush(self._timers, timer)
+
+        def _cancel() -> None:
+            timer[3] = False
+
+        return _cancel
+
+    def run_due(self) -> None:
+        timers = self._timers
+        while timers and timers[0][0] <= self._clock.now:
+            _, _, action, active = heapq.heappop(timers)
+            if active:
+                action(None)
+
+
+class FakeDeviceRegistry:
+    """Empty device registry."""
+
+    def __init__(self) -> None:
+        self.devices: dict[str, Any] = {}
+
+    def async_get_device(self, **_kwargs: Any) -> None:
+        return None
+
+    def async_remove_device(self, _device_id: str) -> None:
+        return None
+
+
+def _address(number: int) -> str:
+    return ":".join(f"{byte:02X}" for byte in number.to_bytes(6, "big"))
+
+
+def _payload(uuid: UUID, major: int, minor: int, power: int = -59) -> bytes:
+    return (
+        bytes((ProxyProximity_FIRST_BYTE, ProxyProximity_SECOND_BYTE))
+        + uuid.bytes
+        + major.to_bytes(2, "big")
+        + minor.to_bytes(2, "big")
+        + power.to_bytes(1, "big", signed=True)
+    )
+
+
+def _spec_payload(base: UUID, major: int, number: int) -> bytes:
+    """Return the payload of a well behaved beacon, IDS_PER_UUID ids share an UUID."""
+    return _payload(
+        UUID(int=base.int + number // IDS_PER_UUID), major, number % IDS_PER_UUID
+    )
+
+
+def fixed_mac(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayServiceInfo]:
+    """Beacons with a fixed MAC address advertising every second."""
+    payloads = [_spec_payload(FIXED_UUID, 1, number) for number in range(devices)]
+    for second in range(duration):
+        for number, payload in enumerate(payloads):
+            yield ReplayServiceInfo(
+                second + number / devices,
+                _address(0x100000 + number),
+                f"Beacon {number}",
+                -65 + rng.randint(-8, 8),
+                SOURCES[(number + second // 30) % len(SOURCES)],
+                payload,
+            )
+
+
+def rotating_mac(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayServiceInfo]:
+    """Phones advertising the same id from a MAC address that rotates every minute."""
+    payloads = [_spec_payload(PHONE_UUID, 2, number) for number in range(devices)]
+    for second in range(duration):
+        rotation = second // 60
+        for number, payload in enumerate(payloads):
+            yield ReplayServiceInfo(
+                second + number / devices,
+                _address(0x200000 + rotation * devices + number),
+                f"Phone {number}",
+                -70 + rng.randint(-10, 10),
+                rng.choice(SOURCES),
+                payload,
+            )
+
+
+def transient(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayServiceInfo]:
+    """Passers-by with transient names, heard for ten seconds and never again.
+
+    One in LINGER_EVERY stays for LINGER_SECONDS, long enough to be
+    promoted by the transient admission.
+    """
+    per_second = max(devices // 10, 1)
+    for second in range(duration):
+        first = max(second - LINGER_SECONDS + 1, 0) * per_second
+        last = (second + 1) * per_second
+        heard = [
+            number
+            for number in range(first, last)
+            if number // per_second
+            + (LINGER_SECONDS if number % LINGER_EVERY == 0 else PASSER_BY_SECONDS)
+            > second
+        ]
+        for position, number in enumerate(heard):
+            address = 0x300000 + number
+            yield ReplayServiceInfo(
+                second + position / len(heard),
+                _address(address),
+                # Names the parser marks as transient, S + 16 hex digits + C
+                f"S{address:016X}C",
+                -85 + rng.randint(-5, 5),
+                rng.choice(SOURCES),
+                _spec_payload(PASSER_BY_UUID, 3, number),
+            )
+
+
+def fixed_pairs(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayEvent]:
+    """Beacons cloned onto two fixed MAC addresses, with a restart halfway.
+
+    Neither the first sightings nor hearing both addresses again after
+    the restart may be taken for MAC rotation.
+    """
+    payloads = [_spec_payload(FIXED_UUID, 4, number) for number in range(devices)]
+    for second in range(duration):
+        if second == duration // 2:
+            yield Restart(second)
+        for number, payload in enumerate(payloads):
+            for clone in range(2):
+                yield ReplayServiceInfo(
+                    second + (2 * number + clone) / (2 * devices),
+                    _address(0x700000 + 2 * number + clone),
+                    f"Clone {number}",
+                    -65 + rng.randint(-8, 8),
+                    SOURCES[(number + clone) % len(SOURCES)],
+                    payload,
+                )
+
+
+def flood_address(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayServiceInfo]:
+    """Devices sending sensor data in the major and minor, hits MAX_IDS per address."""
+    for second in range(duration):
+        for number in range(devices):
+            yield ReplayServiceInfo(
+                second + number / devices,
+                _address(0x400000 + number),
+                f"Sensor {number}",
+                -75 + rng.randint(-5, 5),
+                rng.choice(SOURCES),
+                _payload(
+                    FLOOD_UUID, rng.randrange(0x10000), rng.randrange(0x10000)
+                ),
+            )
+
+
+def flood_uuid(devices: int, duration: int, rng: random.Random) -> Iterator[ReplayServiceInfo]:
+    """New addresses with a new major and minor of one UUID, hits MAX_IDS_PER_UUID."""
+    uuid = UUID(int=rng.getrandbits(128))
+    for second in range(duration):
+        for number in range(devices):
+            serial = second * devices + number
+            yield ReplayServiceInfo(
+                second + number / devices,
+                _address(0x500000 + serial),
+                f"Tag {serial}",
+                -80 + rng.randint(-5, 5),
+                rng.choice(SOURCES),
+                _payload(uuid, serial >> 16 & 0xFFFF, serial & 0xFFFF),
+            )
+
+
+SCENARIOS: dict[
+    str, Callable[[int, int, random.Random], Iterator[ReplayEvent]]
+] = {
+    "fixed_mac": fixed_mac,
+    "fixed_pairs": fixed_pairs,
+    "rotating_mac": rotating_mac,
+    "transient": transient,
+    "flood_address": flood_address,
+    "flood_uuid": flood_uuid,
+}
+
+
+# Regression checks of the scenarios, return a failure message or None
+CHECKS: dict[str, Callable[[dict[str, Any]], str | None]] = {
+    "fixed_pairs": lambda result: (
+        f"{result['rotations']} groups of cloned beacons taken for MAC rotation"
+        if result["rotations"]
+        else None
+    ),
+}
+
+
+def recording(path: str) -> Iterator[ReplayServiceInfo]:
+    """Advertisements recorded as JSON lines."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield ReplayServiceInfo(
+                float(record["time"]),
+                record["address"],
+                record.get("name") or record["address"],
+                int(record["rssi"]),
+                record["source"],
+                bytes.fromhex(record["payload"]),
+            )
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def replay(
+    stream: Iterable[ReplayEvent], measure_latency: bool = True
+) -> dict[str, Any]:
+    """Replay a stream through a new coordinator and return the results."""
+    clock = FakeClock()
+    timers = FakeTimers(clock)
+    last_service_info: dict[str, ReplayServiceInfo] = {}
+    new_devices = 0
+
+    def _async_last_service_info(
+        _hass: object, address: str, connectable: bool
+    ) -> ReplayServiceInfo | None:
+        if (
+            service_info := last_service_info.get(address)
+        ) and clock.now - service_info.time < SERVICE_INFO_STALE_SECONDS:
+            return service_info
+        return None
+
+    def _async_dispatcher_send(_hass: object, _signal: str, *args: Any) -> None:
+        nonlocal new_devices
+        if args and isinstance(args[0], list):
+            new_devices += len(args[0])
+
+    def _async_update_entry(entry: SimpleNamespace, data: dict[str, Any]) -> None:
+        entry.data = data
+
+    hass = SimpleNamespace(
+        state=CoreState.running,
+        config_entries=SimpleNamespace(async_update_entry=_async_update_entry),
+    )
+    entry = SimpleNamespace(
+        entry_id="replay", title="Replay", data={}, options={}
+    )
+    latencies: list[float] = []
+    tick_latencies: list[float] = []
+    refresh_latencies: list[float] = []
+    advertisements = 0
+    callback_seconds = 0.0
+    tick_interval = UPDATE_INTERVAL.total_seconds()
+    next_tick = tick_interval
+    refresh_interval = REFRESH_TICK.total_seconds()
+    next_refresh = refresh_interval
+    perf_counter = time.perf_counter
+
+    with ExitStack() as stack:
+        for module, name, value in (
+            (coordinator_module, "MONOTONIC_TIME", clock),
+            (state_writer_module, "MONOTONIC_TIME", clock),
+            (coordinator_module, "async_call_later", timers.call_later),
+            (state_writer_module, "async_call_later", timers.call_later),
+            (ignore_list_module, "async_call_later", timers.call_later),
+            (coordinator_module, "async_dispatcher_send", _async_dispatcher_send),
+            (bluetooth, "async_last_service_info", _async_last_service_info),
+            (
+                bluetooth,
+                "async_scanner_devices_by_address",
+                lambda *_args, **_kwargs: [],
+            ),
+        ):
+            stack.enter_context(patch.object(module, name, value))
+        stack.enter_context(patch.object(coordinator_module, "Store"))
+
+        coordinator = ProxyProximityCoordinator(hass, entry, FakeDeviceRegistry())
+        asyncio.run(
+            coordinator._ProxyProximity_parser.async_setup()  # pylint: disable=protected-access
+        )
+        update_callback = coordinator._async_update_ProxyProximity  # pylint: disable=protected-access
+        change = bluetooth.BluetoothChange.ADVERTISEMENT
+        # Rotations detected by the coordinators replaced by a restart
+        rotations = 0
+
+        for service_info in stream:
+            while service_info.time >= next_refresh:
+                clock.now = next_refresh
+                timers.run_due()
+                start = perf_counter()
+                coordinator._async_refresh(None)  # pylint: disable=protected-access
+                refresh_latencies.append(perf_counter() - start)
+                next_refresh += refresh_interval
+            while service_info.time >= next_tick:
+                clock.now = next_tick
+                timers.run_due()
+                start = perf_counter()
+                coordinator._async_update(None)  # pylint: disable=protected-access
+                tick_latencies.append(perf_counter() - start)
+                next_tick += tick_interval
+                # The Bluetooth manager forgets addresses it stopped hearing,
+                # keeping them would count toward the peak memory
+                stale = clock.now - SERVICE_INFO_STALE_SECONDS
+                for address in [
+                    address
+                    for address, last in last_service_info.items()
+                    if last.time < stale
+                ]:
+                    del last_service_info[address]
+            clock.now = service_info.time
+            timers.run_due()
+            if isinstance(service_info, Restart):
+                # Saved by the final write of a clean stop
+                hass.state = CoreState.final_write
+                # pylint: disable-next=protected-access
+                snapshot = coordinator._async_snapshot_data()
+                hass.state = CoreState.running
+                coordinator._async_stop()  # pylint: disable=protected-access
+                rotations += coordinator.metrics.rotations
+                coordinator = ProxyProximityCoordinator(
+                    hass, entry, FakeDeviceRegistry()
+                )
+                asyncio.run(
+                    coordinator._ProxyProximity_parser.async_setup()  # pylint: disable=protected-access
+                )
+                coordinator._async_restore_from_snapshot(snapshot)  # pylint: disable=protected-access
+                update_callback = coordinator._async_update_ProxyProximity  # pylint: disable=protected-access
+                continue
+            last_service_info[service_info.address] = service_info
+            advertisements += 1
+            if measure_latency:
+                start = perf_counter()
+                update_callback(service_info, change)
+                elapsed = perf_counter() - start
+                latencies.append(elapsed)
+                callback_seconds += elapsed
+            else:
+                update_callback(service_info, change)
+
+        index = coordinator._index  # pylint: disable=protected-access
+        integration_bytes = _integration_memory() if tracemalloc.is_tracing() else 0
+        return {
+            "advertisements": advertisements,
+            "per_second": advertisements / callback_seconds if callback_seconds else 0.0,
+            "p99_us": _percentile(latencies, 99) * 1_000_000,
+            "max_us": max(latencies, default=0.0) * 1_000_000,
+            "tick_p99_ms": _percentile(tick_latencies, 99) * 1000,
+            "refresh_p99_ms": _percentile(refresh_latencies, 99) * 1000,
+            "new_devices": new_devices,
+            "rotations": rotations + coordinator.metrics.rotations,
+            "tracked": len(index.beacons) + len(index.random_mac_groups),
+            "metrics": coordinator.metrics,
+            "integration_bytes": integration_bytes,
+        }
+
+
+def _integration_memory() -> int:
+    """Return the traced memory allocated by the integration that is still held."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, INTEGRATION_FILES)]
+    )
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def _memory(
+    stream_factory: Callable[[], Iterable[ReplayEvent]]
+) -> tuple[float, float]:
+    """Return the peak memory of a replay and what the integration holds at its end in MiB.
+
+    The peak includes the replay itself, the advertisements of the stream
+    and the fake last service info that stands in for the Bluetooth
+    manager.
+    """
+    tracemalloc.start()
+    try:
+        result = replay(stream_factory(), measure_latency=False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024), result["integration_bytes"] / (1024 * 1024)
+
+
+def run(
+    streams: dict[str, Callable[[], Iterable[ReplayEvent]]], memory: bool
+) -> bool:
+    """Replay each stream, print the results and return False if a check failed."""
+    print(
+        f"{'scenario':>14} {'adverts':>9} {'adverts/s':>10} {'p99 us':>8} "
+        f"{'max us':>9} {'tick p99 ms':>12} {'refresh p99 ms':>15} {'new':>6} {'tracked':>8} "
+        f"{'ignored':>8} {'transient':>10} {'promoted':>9} {'rotations':>10} "
+        f"{'peak MiB':>9} {'integration MiB':>16}"
+    )
+    failures: list[str] = []
+    for name, stream_factory in streams.items():
+        result = replay(stream_factory())
+        metrics = result["metrics"]
+        if memory:
+            peak, integration = _memory(stream_factory)
+            memory_columns = f"{peak:>9.1f} {integration:>16.1f}"
+        else:
+            memory_columns = f"{'-':>9} {'-':>16}"
+        print(
+            f"{name:>14} {result['advertisements']:>9} {result['per_second']:>10.0f} "
+            f"{result['p99_us']:>8.1f} {result['max_us']:>9.1f} "
+            f"{result['tick_p99_ms']:>12.3f} {result['refresh_p99_ms']:>15.3f} "
+            f"{result['new_devices']:>6} "
+            f"{result['tracked']:>8} "
+            f"{metrics.ignored_address + metrics.ignored_uuid:>8} "
+            f"{metrics.transient:>10} {metrics.promoted:>9} "
+            f"{result['rotations']:>10} {memory_columns}"
+        )
+        if (check := CHECKS.get(name)) and (failure := check(result)):
+            failures.append(f"{name}: {failure}")
+    for failure in failures:
+        print(f"FAILED {failure}")
+    return not failures
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), dest="scenarios"
+    )
+    parser.add_argument("--recording", help="replay a JSON lines recording instead")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--duration", type=int, default=600, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory")
+    args = parser.parse_args()
+
+    streams: dict[str, Callable[[], Iterable[ReplayEvent]]]
+    if args.recording:
+        streams = {"recording": lambda: recording(args.recording)}
+    else:
+        streams = {
+            name: (
+                lambda scenario=SCENARIOS[name]: scenario(
+                    args.devices, args.duration, random.Random(args.seed)
+                )
+            )
+            for name in args.scenarios or SCENARIOS
+        }
+    if not run(streams, not args.no_memory):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark refreshing the RSSI of every address tracked by the ProxyProximity coordinator.
+
+Each tick refreshes every address once, the worst case for the refresh
+scheduler when every address is due at the same time.
+
+Run from the repository root with Home Assistant installed:
+
+    python -m benchmarks.rssi_tick [--ids-per-address N] [--ticks N]
+"""
+from __future__ import annotations
+
+import argparse
+from itertools import count
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import UUID
+
+from custom_components.ProxyProximity import coordinator as coordinator_module
+from custom_components.ProxyProximity.coordinator import ProxyProximityCoordinator
+
+SIZES = (500, 5_000, 50_000)
+# Scanners other than the preferred source holding each address
+SCANNER_DEVICES = [
+    SimpleNamespace(
+        scanner=SimpleNamespace(source=f"proxy_{number}"),
+        advertisement=SimpleNamespace(rssi=-80 - number),
+    )
+    for number in range(3)
+]
+
+
+class _Advertisement:
+    """Minimal stand-in for ProxyProximityAdvertisement."""
+
+    __slots__ = ("rssi", "source", "transient")
+
+    def __init__(self, rssi: int, source: str) -> None:
+        self.rssi = rssi
+        self.source = source
+        self.transient = False
+
+
+def _address(number: int) -> str:
+    return ":".join(f"{byte:02X}" for byte in number.to_bytes(6, "big"))
+
+
+def _build_coordinator(
+    tracked_ids: int, ids_per_address: int
+) -> tuple[ProxyProximityCoordinator, dict[str, SimpleNamespace]]:
+    """Build a coordinator with tracked_ids beacons and the matching last service info."""
+    with patch.object(coordinator_module, "Store"):
+        coordinator = ProxyProximityCoordinator(
+            SimpleNamespace(),
+            SimpleNamespace(entry_id="benchmark", data={}, options={}),
+            SimpleNamespace(devices={}, async_get_device=lambda **_kwargs: None),
+        )
+    index = coordinator._index  # pylint: disable=protected-access
+    last_service_info: dict[str, SimpleNamespace] = {}
+    beacon_uuid = index.add_uuid(UUID(int=0x1234))
+    group_numbers = count()
+    for number in range(tracked_ids):
+        address = _address(number // ids_per_address)
+        group_number = next(group_numbers)
+        group = index.add_group(beacon_uuid, group_number >> 16, group_number & 0xFFFF)
+        index.track(group, address).advertisement = _Advertisement(-70, "proxy_a")
+        last_service_info[address] = SimpleNamespace(
+            rssi=-70, source="proxy_a", time=0.0
+        )
+    return coordinator, last_service_info
+
+
+def run(sizes: tuple[int, ...], ids_per_address: int, ticks: int) -> None:
+    """Run the benchmark and print the tick time for each size."""
+    print(f"{'tracked ids':>12} {'addresses':>10} {'lookups':>8} {'ms/tick':>10}")
+    for tracked_ids in sizes:
+        coordinator, last_service_info = _build_coordinator(
+            tracked_ids, ids_per_address
+        )
+        lookups = 0
+
+        def _async_last_service_info(
+            _hass: object,
+            address: str,
+            connectable: bool,
+            last_service_info: dict[str, SimpleNamespace] = last_service_info,
+        ) -> SimpleNamespace | None:
+            nonlocal lookups
+            lookups += 1
+            return last_service_info.get(address)
+
+        with patch.object(
+            coordinator_module.bluetooth,
+            "async_last_service_info",
+            _async_last_service_info,
+        ), patch.object(
+            coordinator_module.bluetooth,
+            "async_scanner_devices_by_address",
+            lambda *_args, **_kwargs: SCANNER_DEVICES,
+        ):
+            address_entries = list(
+                coordinator._index.addresses.values()  # pylint: disable=protected-access
+            )
+            refresh_address = coordinator._async_refresh_address  # pylint: disable=protected-access
+            start = time.perf_counter()
+            for _ in range(ticks):
+                now = time.monotonic()
+                for address_entry in address_entries:
+                    refresh_address(address_entry, now)
+            elapsed = time.perf_counter() - start
+
+        print(
+            f"{tracked_ids:>12} {len(last_service_info):>10} "
+            f"{lookups // ticks:>8} {elapsed / ticks * 1000:>10.3f}"
+        )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids-per-address", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+    run(SIZES, args.ids_per_address, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Benchmark creating the entities of a burst of new ProxyProximity devices.
+
+Replays the burst seen after a restart, when every beacon in range is
+heard within a fraction of a second, through the Bluetooth callback of
+the coordinator. The sensor and device tracker platforms are set up on
+real entity platforms of a Home Assistant instance with the entity,
+device and area registries loaded, so adding an entity pays for the
+registry entries and the first state write as it does in production.
+Compares sending every new device on its own, as before new devices were
+batched, batching the whole burst for DELAYED_BATCH_DELAY, as the first
+version of batching did, and the current batching which sends a batch
+after NEW_DEVICE_BATCH_DELAY or as soon as it has NEW_DEVICE_BATCH_SIZE
+devices. Reports the number
+of async_add_entities calls and the time until every device has all of
+its entities.
+
+Run from the repository root with Home Assistant installed:
+
+    python -m benchmarks.startup [--devices N] [--chunk N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Iterable
+from contextlib import ExitStack
+from datetime import timedelta
+import logging
+import tempfile
+import time
+from unittest.mock import patch
+from uuid import UUID
+
+from ProxyProximity_ble import ProxyProximity_FIRST_BYTE, ProxyProximity_SECOND_BYTE
+
+from homeassistant.components import bluetooth
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity as entity_helper,
+    entity_registry as er,
+)
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import EntityPlatform
+
+from benchmarks.replay import SOURCES, ReplayServiceInfo
+from custom_components.ProxyProximity import (
+    coordinator as coordinator_module,
+    device_tracker as device_tracker_module,
+    sensor as sensor_module,
+)
+from custom_components.ProxyProximity.const import DOMAIN
+from custom_components.ProxyProximity.coordinator import ProxyProximityCoordinator
+
+BURST_UUID = UUID("b9407f30-f5f8-466e-aff9-25556b57fe6d")
+# Ids sharing an UUID, below MAX_IDS_PER_UUID
+IDS_PER_UUID = 32
+MODES = ("per_device", "delayed", "batched")
+# Batch delay before the batches had a size limit
+DELAYED_BATCH_DELAY = 0.5
+
+
+def _address(number: int) -> str:
+    return ":".join(f"{byte:02X}" for byte in number.to_bytes(6, "big"))
+
+
+def _payload(number: int) -> bytes:
+    return (
+        bytes((ProxyProximity_FIRST_BYTE, ProxyProximity_SECOND_BYTE))
+        + UUID(int=BURST_UUID.int + number // IDS_PER_UUID).bytes
+        + (1).to_bytes(2, "big")
+        + (number % IDS_PER_UUID).to_bytes(2, "big")
+        + (-59).to_bytes(1, "big", signed=True)
+    )
+
+
+class CountingPlatform(EntityPlatform):
+    """Entity platform that counts the calls to async_add_entities and the added entities."""
+
+    calls = 0
+    added_entities = 0
+    added: Callable[[], None] | None = None
+
+    async def async_add_entities(
+        self, new_entities: Iterable[Entity], update_before_add: bool = False
+    ) -> None:
+        """Add the entities and count them once they are added."""
+        new_entities = list(new_entities)
+        self.calls += 1
+        await super().async_add_entities(new_entities, update_before_add)
+        self.added_entities += len(new_entities)
+        if self.added:
+            self.added()
+
+
+async def _async_hass(config_dir: str) -> HomeAssistant:
+    """Return a Home Assistant instance with the registries loaded."""
+    hass = HomeAssistant(config_dir)
+    entity_helper.async_setup(hass)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    hass.config_entries = ConfigEntries(hass, {})
+    return hass
+
+
+async def _async_run(devices: int, chunk: int, mode: str) -> dict[str, float]:
+    """Replay a burst of new devices and return when they were populated."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await _async_hass(config_dir)
+        entry = ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="Startup",
+            data={},
+            source="user",
+        )
+        hass.config_entries._entries[entry.entry_id] = entry  # pylint: disable=protected-access
+        platforms = [
+            CountingPlatform(
+                hass=hass,
+                logger=logging.getLogger(module.__name__),
+                domain=domain,
+                platform_name=DOMAIN,
+                platform=module,
+                scan_interval=timedelta(seconds=30),
+                entity_namespace=None,
+            )
+            for domain, module in (
+                ("sensor", sensor_module),
+                ("device_tracker", device_tracker_module),
+            )
+        ]
+        expected = devices * (len(sensor_module.SENSOR_DESCRIPTIONS) + 1)
+        populated: asyncio.Future[float] = hass.loop.create_future()
+
+        def _async_added() -> None:
+            if (
+                sum(platform.added_entities for platform in platforms) >= expected
+                and not populated.done()
+            ):
+                populated.set_result(time.perf_counter())
+
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch.object(
+                    bluetooth,
+                    "async_last_service_info",
+                    lambda *_args, **_kwargs: None,
+                )
+            )
+            stack.enter_context(patch.object(coordinator_module, "Store"))
+            if mode == "delayed":
+                # Only the delay sends the batch, as before the size limit
+                for name, value in (
+                    ("NEW_DEVICE_BATCH_DELAY", DELAYED_BATCH_DELAY),
+                    ("NEW_DEVICE_BATCH_SIZE", devices + 1),
+                ):
+                    stack.enter_context(patch.object(coordinator_module, name, value))
+
+            coordinator = ProxyProximityCoordinator(hass, entry, dr.async_get(hass))
+            hass.data[DOMAIN] = {entry.entry_id: coordinator}
+            await coordinator._ProxyProximity_parser.async_setup()  # pylint: disable=protected-access
+            for platform in platforms:
+                await platform.async_setup_entry(entry)
+                # The metrics sensors are added when the platform is set up
+                platform.calls = platform.added_entities = 0
+                platform.added = _async_added
+
+            update_callback = coordinator._async_update_ProxyProximity  # pylint: disable=protected-access
+            change = bluetooth.BluetoothChange.ADVERTISEMENT
+            now = time.monotonic()
+            start = time.perf_counter()
+            for number in range(devices):
+                update_callback(
+                    ReplayServiceInfo(
+                        now,
+                        _address(0x600000 + number),
+                        f"Beacon {number}",
+                        -65,
+                        SOURCES[number % len(SOURCES)],
+                        _payload(number),
+                    ),
+                    change,
+                )
+                # pylint: disable=protected-access
+                if mode == "per_device" and coordinator._new_devices:
+                    # Send every new device on its own, as before batching
+                    if coordinator._cancel_new_devices_flush:
+                        coordinator._cancel_new_devices_flush()
+                    coordinator._async_flush_new_devices(None)
+                if number % chunk == chunk - 1:
+                    await asyncio.sleep(0)
+            finished = await populated
+            coordinator._async_stop()  # pylint: disable=protected-access
+            await hass.async_stop(force=True)
+
+    return {
+        "calls": sum(platform.calls for platform in platforms),
+        "entities": sum(platform.added_entities for platform in platforms),
+        "populated_ms": (finished - start) * 1000,
+    }
+
+
+def run(devices: int, chunk: int) -> None:
+    """Run the benchmark in each mode and print the results."""
+    print(
+        f"{'mode':>11} {'devices':>8} {'add calls':>10} {'entities':>9} "
+        f"{'populated ms':>13}"
+    )
+    for mode in MODES:
+        result = asyncio.run(_async_run(devices, chunk, mode))
+        print(
+            f"{mode:>11} {devices:>8} {result['calls']:>10} {result['entities']:>9} "
+            f"{result['populated_ms']:>13.1f}"
+        )
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1_000)
+    parser.add_argument(
+        "--chunk", type=int, default=50, help="advertisements per loop iteration"
+    )
+    args = parser.parse_args()
+    run(args.devices, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
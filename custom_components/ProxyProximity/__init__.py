@@ -3,32 +3,66 @@ from __future__ import annotations
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.device_registry import DeviceEntry, async_get
+from homeassistant.helpers.typing import ConfigType
 
 from .const import DOMAIN, PLATFORMS
-from .coordinator import ProxyProximityCoordinator
+from .coordinator import ProxyProximityCoordinator, async_get_store
+from .services import async_setup_services
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services shared by every config entry."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Bluetooth LE Tracker from a config entry."""
-    coordinator = hass.data[DOMAIN] = ProxyProximityCoordinator(hass, entry, async_get(hass))
+    coordinators: dict[str, ProxyProximityCoordinator] = hass.data.setdefault(DOMAIN, {})
+    coordinator = coordinators[entry.entry_id] = ProxyProximityCoordinator(
+        hass, entry, async_get(hass)
+    )
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     await coordinator.async_start()
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when its options changed.
+
+    The coordinator also updates the entry data to save the ignore list
+    and the calibration profiles, which must not reload it.
+    """
+    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN][entry.entry_id]
+    if entry.options != coordinator.options:
+        await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data.pop(DOMAIN)
+        coordinators: dict[str, ProxyProximityCoordinator] = hass.data[DOMAIN]
+        await coordinators.pop(entry.entry_id).async_save_snapshot()
+        if not coordinators:
+            hass.data.pop(DOMAIN)
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot of a removed config entry."""
+    await async_get_store(hass, entry.entry_id).async_remove()
+
+
 async def async_remove_config_entry_device(
     hass: HomeAssistant, config_entry: ConfigEntry, device_entry: DeviceEntry
 ) -> bool:
     """Remove ProxyProximity config entry from a device."""
-    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN]
+    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN][config_entry.entry_id]
     return not any(
         identifier
         for identifier in device_entry.identifiers
@@ -0,0 +1,210 @@
+"""Room presence for ProxyProximity beacons based on the RSSI heard by each scanner."""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import area_registry as ar, device_registry as dr
+
+from .beacon_index import BeaconState
+from .const import (
+    AREA_FINGERPRINT_RSSI,
+    AREA_RSSI_FLOOR,
+    MAX_AREA_SCANNERS,
+    SOURCE_RSSI_DECAY,
+    SOURCE_RSSI_MAX_AGE,
+)
+
+
+class AreaInputs(NamedTuple):
+    """Snapshot of the source tables of the beacons taken on the event loop.
+
+    Every array is a copy, or shared and never modified, so the snapshot
+    can be classified in an executor while the tables keep changing.
+    """
+
+    # The data of the source table of each beacon: the RSSI of each slot,
+    # the time its source was last heard and the column of the source,
+    # -1 if it has no area. Slots whose source expired are left out by
+    # their age.
+    tables: np.ndarray
+    fingerprints: np.ndarray
+    fingerprint_norms: np.ndarray
+    now: float
+
+
+def classify_areas(inputs: AreaInputs) -> tuple[list[int], list[bool]]:
+    """Return the nearest fingerprint of each beacon and if any scanner heard it.
+
+    Only depends on its inputs so it can run in an executor thread or process.
+    """
+    tables = inputs.tables
+    rows, _, slots = tables.shape
+    rssi = tables[:, 0, :].ravel()
+    age = inputs.now - tables[:, 1, :].ravel()
+    columns = tables[:, 2, :].ravel().astype(np.intp)
+    valid = (columns >= 0) & (age <= SOURCE_RSSI_MAX_AGE)
+    values = np.maximum(
+        rssi - SOURCE_RSSI_DECAY * np.maximum(age, 0.0), AREA_RSSI_FLOOR
+    )
+    vectors = np.full(
+        (rows, inputs.fingerprints.shape[1]), AREA_RSSI_FLOOR, dtype=np.float32
+    )
+    slot_rows = np.arange(rows * slots) // slots
+    vectors[slot_rows[valid], columns[valid]] = values[valid]
+    # Squared euclidean distance to each fingerprint, the norm of
+    # the vector is the same for every area so it can be left out
+    distances = inputs.fingerprint_norms - 2 * (vectors @ inputs.fingerprints.T)
+    return (
+        distances.argmin(axis=1).tolist(),
+        (vectors > AREA_RSSI_FLOOR).any(axis=1).tolist(),
+    )
+
+
+class AreaPresenceEngine:
+    """Classify the area of every beacon in one batch.
+
+    Every scanner (source) with an area gets a column. Each beacon is a
+    row holding the decayed RSSI heard by each scanner, or AREA_RSSI_FLOOR
+    if the scanner did not hear it. Each area has a fingerprint row, either
+    configured or AREA_FINGERPRINT_RSSI for the scanners in the area and
+    AREA_RSSI_FLOOR for the others, and every beacon is assigned the area
+    with the nearest fingerprint.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        dev_reg: dr.DeviceRegistry,
+        scanner_areas: Mapping[str, str],
+        fingerprints: Mapping[str, Mapping[str, float]],
+    ) -> None:
+        """Initialize the engine.
+
+        scanner_areas maps a source to an area id, sources that are not
+        in it get the area of their device in the device registry.
+        fingerprints maps an area id to the RSSI expected from each source
+        when a beacon is in that area.
+        """
+        self._hass = hass
+        self._dev_reg = dev_reg
+        self._scanner_areas = scanner_areas
+        self._configured_fingerprints = fingerprints
+        # Column of each source, -1 if the source has no area
+        self._columns: dict[str, int] = {}
+        # Source and area id of each column
+        self._column_sources: list[str] = []
+        self._column_areas: list[str] = []
+        self._area_ids: list[str] = []
+        self._area_names: list[str] = []
+        self._fingerprints = np.empty((0, 0), dtype=np.float32)
+        self._fingerprint_norms = np.empty(0, dtype=np.float32)
+
+    @callback
+    def _async_resolve_area_id(self, source: str) -> str | None:
+        """Return the area id of a source."""
+        if area_id := self._scanner_areas.get(source):
+            return area_id
+        for connection in (dr.CONNECTION_BLUETOOTH, dr.CONNECTION_NETWORK_MAC):
+            if (
+                device := self._dev_reg.async_get_device(
+                    connections={(connection, source)}
+                )
+            ) and device.area_id:
+                return device.area_id
+        return None
+
+    @property
+    def active(self) -> bool:
+        """Return True if any source has an area."""
+        return bool(self._column_sources)
+
+    @callback
+    def async_source_column(self, source: str) -> int:
+        """Return the column of a source, -1 if it has no area.
+
+        Called by the source tables when a source takes a slot, a source
+        seen for the first time gets a column if it has an area.
+        """
+        try:
+            return self._columns[source]
+        except KeyError:
+            return self._async_add_column(source)
+
+    @callback
+    def _async_add_column(self, source: str) -> int:
+        """Add the column of a new source if it has an area."""
+        column = -1
+        if (
+            len(self._column_sources) < MAX_AREA_SCANNERS
+            and (area_id := self._async_resolve_area_id(source)) is not None
+            and (area := ar.async_get(self._hass).async_get_area(area_id))
+        ):
+            column = len(self._column_sources)
+            self._column_sources.append(source)
+            self._column_areas.append(area_id)
+            if area_id not in self._area_ids:
+                self._area_ids.append(area_id)
+                self._area_names.append(area.name)
+            self._async_build_fingerprints()
+        self._columns[source] = column
+        return column
+
+    @callback
+    def _async_build_fingerprints(self) -> None:
+        """Build the fingerprint of every area for the current columns."""
+        fingerprints = np.full(
+            (len(self._area_ids), len(self._column_sources)),
+            AREA_RSSI_FLOOR,
+            dtype=np.float32,
+        )
+        for row, area_id in enumerate(self._area_ids):
+            configured = self._configured_fingerprints.get(area_id)
+            for column, source in enumerate(self._column_sources):
+                if configured is not None:
+                    fingerprints[row, column] = configured.get(source, AREA_RSSI_FLOOR)
+                elif self._column_areas[column] == area_id:
+                    fingerprints[row, column] = AREA_FINGERPRINT_RSSI
+        self._fingerprints = fingerprints
+        self._fingerprint_norms = (fingerprints * fingerprints).sum(axis=1)
+
+    @callback
+    def async_snapshot(
+        self, states: Sequence[BeaconState], now: float
+    ) -> AreaInputs | None:
+        """Return the inputs to classify the beacon states, None if there is nothing to classify."""
+        if not states or not self._column_sources:
+            return None
+        tables = np.frombuffer(
+            b"".join([state.sources.data for state in states]), dtype=np.float64
+        )
+        return AreaInputs(
+            tables.reshape(len(states), 3, -1),
+            self._fingerprints,
+            self._fingerprint_norms,
+            now,
+        )
+
+    @callback
+    def async_apply(
+        self, states: Sequence[BeaconState], nearest: list[int], heard: list[bool]
+    ) -> list[int]:
+        """Update the area of each beacon state and return the indexes that changed."""
+        area_names = self._area_names
+        changed: list[int] = []
+        for row, state in enumerate(states):
+            area = area_names[nearest[row]] if heard[row] else None
+            if state.area != area:
+                state.area = area
+                changed.append(row)
+        return changed
+
+    @callback
+    def async_classify(self, states: Sequence[BeaconState], now: float) -> list[int]:
+        """Update the area of each beacon state and return the indexes that changed."""
+        if (inputs := self.async_snapshot(states, now)) is None:
+            return []
+        return self.async_apply(states, *classify_areas(inputs))
@@ -0,0 +1,358 @@
+"""Index of the ProxyProximity beacons tracked by the coordinator."""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+import sys
+from uuid import UUID
+
+from ProxyProximity_ble import ProxyProximityAdvertisement
+
+from homeassistant.components import bluetooth
+
+from .const import RSSI_VARIANCE_ALPHA
+from .distance import RssiFilter
+from .history import RssiHistory
+from .source_rssi import SourceRssiTable
+
+
+class BeaconState:
+    """State derived from the advertisements of a beacon."""
+
+    __slots__ = (
+        "rssi_filter",
+        "rssi",
+        "distance",
+        "raw_distance",
+        "sources",
+        "history",
+        "area",
+        "variance",
+    )
+
+    def __init__(
+        self, rssi_filter: RssiFilter, source_column: Callable[[str], int]
+    ) -> None:
+        """Initialize the beacon state."""
+        self.rssi_filter = rssi_filter
+        self.sources = SourceRssiTable(source_column)
+        self.history = RssiHistory()
+        # Name of the area the beacon is in
+        self.area: str | None = None
+        # Smoothed RSSI and the distance estimated from it, and the
+        # distance estimated from the last RSSI sample. Distances are
+        # estimated for all changed beacons once per tick
+        self.rssi: float | None = None
+        self.distance: float | None = None
+        self.raw_distance: float | None = None
+        # Moving average of the squared deviation of the RSSI samples
+        # from the smoothed RSSI, high when the beacon is moving
+        self.variance = 0.0
+
+    def add_sample(self, source: str, rssi: int, seen: float) -> None:
+        """Add an RSSI sample heard by a source to the source table and the history."""
+        self.sources.add(source, rssi, seen)
+        self.history.add(seen, rssi, source)
+
+    def update_rssi(self, rssi: int) -> None:
+        """Add an RSSI sample and update the smoothed RSSI and variance."""
+        if (previous := self.rssi) is not None:
+            deviation = rssi - previous
+            self.variance += RSSI_VARIANCE_ALPHA * (deviation * deviation - self.variance)
+        self.rssi = self.rssi_filter.update(rssi)
+
+
+class BeaconUUID:
+    """An UUID and every major/minor group seen for it."""
+
+    __slots__ = ("uuid", "uuid_str", "groups")
+
+    def __init__(self, uuid: UUID, uuid_str: str) -> None:
+        """Initialize the UUID entry."""
+        self.uuid = uuid
+        self.uuid_str = uuid_str
+        self.groups: dict[tuple[int, int], BeaconGroup] = {}
+
+
+class BeaconGroup:
+    """An uuid/major/minor group and the addresses broadcasting it."""
+
+    __slots__ = (
+        "beacon_uuid",
+        "major",
+        "minor",
+        "group_id",
+        "device_id",
+        "raw_id",
+        "beacons",
+        "random_mac",
+        "last_service_info",
+        "unavailable",
+        "unavailable_timeout",
+        "state",
+        "advertisement",
+        "name",
+        "payload",
+    )
+
+    def __init__(
+        self,
+        beacon_uuid: BeaconUUID,
+        major: int,
+        minor: int,
+        unavailable_timeout: float,
+    ) -> None:
+        """Initialize the group."""
+        self.beacon_uuid = beacon_uuid
+        self.major = major
+        self.minor = minor
+        self.group_id = sys.intern(f"{beacon_uuid.uuid_str}_{major}_{minor}")
+        # Id of the device of the group once it switches to random MAC
+        # tracking, the device of one of its addresses if it took it over
+        self.device_id = self.group_id
+        # UUID, major and minor as they appear in the manufacturer data
+        self.raw_id = (
+            beacon_uuid.uuid.bytes + major.to_bytes(2, "big") + minor.to_bytes(2, "big")
+        )
+        # Seconds without an advertisement before the group is unavailable
+        self.unavailable_timeout = unavailable_timeout
+        # ProxyProximitys with fixed MAC addresses, keyed by address
+        self.beacons: dict[str, TrackedBeacon] = {}
+        # ProxyProximitys with random MAC addresses are tracked by group
+        self.random_mac = False
+        self.last_service_info: bluetooth.BluetoothServiceInfoBleak | None = None
+        self.unavailable = False
+        # Only set once the group switches to random MAC tracking
+        self.state: BeaconState | None = None
+        self.advertisement: ProxyProximityAdvertisement | None = None
+        # Name and manufacturer data of the last advertisement
+        self.name: str | None = None
+        self.payload: bytes | None = None
+
+
+class BeaconAddress:
+    """A Bluetooth address and every group it has broadcast."""
+
+    __slots__ = ("address", "beacons", "transient")
+
+    def __init__(self, address: str) -> None:
+        """Initialize the address entry."""
+        self.address = address
+        # Keyed by group_id
+        self.beacons: dict[str, TrackedBeacon] = {}
+        # Set while the address is a transient candidate without entities
+        self.transient = False
+
+
+class TrackedBeacon:
+    """An ProxyProximity with a fixed MAC address."""
+
+    __slots__ = (
+        "unique_id",
+        "group",
+        "address",
+        "advertisement",
+        "state",
+        "name",
+        "payload",
+    )
+
+    def __init__(self, group: BeaconGroup, address: str, state: BeaconState) -> None:
+        """Initialize the tracked beacon."""
+        self.unique_id = sys.intern(f"{group.group_id}_{address}")
+        self.group = group
+        self.address = address
+        # Not set until the beacon has been seen since boot
+        self.advertisement: ProxyProximityAdvertisement | None = None
+        self.state = state
+        # Name and manufacturer data of the last advertisement
+        self.name: str | None = None
+        self.payload: bytes | None = None
+
+
+class BeaconIndex:
+    """Index of uuids, groups, addresses and tracked beacons."""
+
+    def __init__(
+        self,
+        unavailable_timeout: float,
+        rssi_filter_factory: Callable[[], RssiFilter],
+        source_column: Callable[[str], int],
+        unavailable_timeouts: Mapping[str, float] | None = None,
+    ) -> None:
+        """Initialize the index.
+
+        source_column returns the area column of a source for the source
+        tables of the beacon states. unavailable_timeouts overrides the
+        default unavailable_timeout by group id or by UUID.
+        """
+        self._rssi_filter_factory = rssi_filter_factory
+        self._source_column = source_column
+        self._unavailable_timeout = unavailable_timeout
+        self._unavailable_timeouts = unavailable_timeouts or {}
+        self.uuids: dict[UUID, BeaconUUID] = {}
+        self.addresses: dict[str, BeaconAddress] = {}
+        self.beacons: dict[str, TrackedBeacon] = {}
+        self.random_mac_groups: dict[str, BeaconGroup] = {}
+        # Every group keyed by its raw UUID, major and minor bytes
+        self.raw_groups: dict[bytes, BeaconGroup] = {}
+
+    def add_uuid(self, uuid: UUID, uuid_str: str | None = None) -> BeaconUUID:
+        """Add an UUID to the index."""
+        if not (beacon_uuid := self.uuids.get(uuid)):
+            beacon_uuid = self.uuids[uuid] = BeaconUUID(
+                uuid, sys.intern(uuid_str or str(uuid))
+            )
+        return beacon_uuid
+
+    def add_group(self, beacon_uuid: BeaconUUID, major: int, minor: int) -> BeaconGroup:
+        """Add a major/minor group for an UUID to the index."""
+        if not (group := beacon_uuid.groups.get((major, minor))):
+            group = beacon_uuid.groups[(major, minor)] = BeaconGroup(
+                beacon_uuid, major, minor, self._unavailable_timeout
+            )
+            self.raw_groups[group.raw_id] = group
+            if self._unavailable_timeouts:
+                group.unavailable_timeout = float(
+                    self._unavailable_timeouts.get(
+                        group.group_id,
+                        self._unavailable_timeouts.get(
+                            beacon_uuid.uuid_str, self._unavailable_timeout
+                        ),
+                    )
+                )
+        return group
+
+    def _new_state(self) -> BeaconState:
+        """Return the state of a new beacon or random MAC group."""
+        return BeaconState(self._rssi_filter_factory(), self._source_column)
+
+    def track(self, group: BeaconGroup, address: str) -> TrackedBeacon:
+        """Track a group being broadcast from a fixed address."""
+        if beacon := group.beacons.get(address):
+            return beacon
+        beacon = group.beacons[address] = TrackedBeacon(
+            group, address, self._new_state()
+        )
+        if not (address_entry := self.addresses.get(address)):
+            address_entry = self.addresses[address] = BeaconAddress(address)
+        address_entry.beacons[group.group_id] = beacon
+        self.beacons[beacon.unique_id] = beacon
+        return beacon
+
+    def set_random_mac(
+        self,
+        group: BeaconGroup,
+        device_id: str | None = None,
+        state: BeaconState | None = None,
+    ) -> None:
+        """Switch a group to random MAC tracking.
+
+        The group takes over the device id and state of one of its
+        addresses if they are given.
+        """
+        group.random_mac = True
+        if device_id is not None:
+            group.device_id = device_id
+        if state is not None:
+            group.state = state
+        elif group.state is None:
+            group.state = self._new_state()
+        self.random_mac_groups[group.device_id] = group
+
+    def get_state(self, device_id: str) -> BeaconState | None:
+        """Return the state of a tracked beacon or random MAC group."""
+        if beacon := self.beacons.get(device_id):
+            return beacon.state
+        if group := self.random_mac_groups.get(device_id):
+            return group.state
+        return None
+
+    def get_group(self, device_id: str) -> BeaconGroup | None:
+        """Return the group of a tracked beacon or random MAC group."""
+        if beacon := self.beacons.get(device_id):
+            return beacon.group
+        return self.random_mac_groups.get(device_id)
+
+    def prune_group(self, group: BeaconGroup) -> None:
+        """Remove a group that is not tracking anything and its UUID if it has no groups left."""
+        if group.beacons or group.random_mac:
+            return
+        beacon_uuid = group.beacon_uuid
+        if beacon_uuid.groups.get((group.major, group.minor)) is group:
+            del beacon_uuid.groups[(group.major, group.minor)]
+        if self.raw_groups.get(group.raw_id) is group:
+            del self.raw_groups[group.raw_id]
+        if not beacon_uuid.groups and self.uuids.get(beacon_uuid.uuid) is beacon_uuid:
+            del self.uuids[beacon_uuid.uuid]
+
+    def evict_beacon(self, beacon: TrackedBeacon) -> None:
+        """Stop tracking a beacon and prune its group."""
+        self._untrack(beacon)
+        self.prune_group(beacon.group)
+
+    def evict_random_mac_group(self, group: BeaconGroup) -> None:
+        """Stop tracking a random MAC group and prune it."""
+        self.random_mac_groups.pop(group.device_id, None)
+        group.random_mac = False
+        self.prune_group(group)
+
+    def _untrack(self, beacon: TrackedBeacon) -> BeaconAddress | None:
+        """Stop tracking a beacon and return its address entry if it is now empty."""
+        self.beacons.pop(beacon.unique_id, None)
+        beacon.group.beacons.pop(beacon.address, None)
+        if not (address_entry := self.addresses.get(beacon.address)):
+            return None
+        address_entry.beacons.pop(beacon.group.group_id, None)
+        if address_entry.beacons:
+            return None
+        del self.addresses[beacon.address]
+        return address_entry
+
+    def pop_address(
+        self, address: str
+    ) -> tuple[BeaconAddress | None, list[TrackedBeacon]]:
+        """Remove an address and return it with the beacons it was broadcasting."""
+        if not (address_entry := self.addresses.pop(address, None)):
+            return None, []
+        beacons = list(address_entry.beacons.values())
+        for beacon in beacons:
+            self.beacons.pop(beacon.unique_id, None)
+            beacon.group.beacons.pop(address, None)
+        address_entry.beacons.clear()
+        return address_entry, beacons
+
+    def pop_group_beacons(
+        self, group: BeaconGroup
+    ) -> tuple[list[BeaconAddress], list[TrackedBeacon]]:
+        """Stop tracking the fixed addresses of a group.
+
+        Returns the address entries that are no longer broadcasting
+        anything and the beacons that were removed.
+        """
+        beacons = list(group.beacons.values())
+        emptied = [
+            address_entry
+            for beacon in beacons
+            if (address_entry := self._untrack(beacon))
+        ]
+        return emptied, beacons
+
+    def pop_uuid(
+        self, uuid: UUID
+    ) -> tuple[list[BeaconAddress], list[TrackedBeacon]]:
+        """Remove an UUID and all of its groups.
+
+        Returns the address entries that are no longer broadcasting
+        anything and the beacons that were removed.
+        """
+        if not (beacon_uuid := self.uuids.pop(uuid, None)):
+            return [], []
+        emptied: list[BeaconAddress] = []
+        beacons: list[TrackedBeacon] = []
+        for group in beacon_uuid.groups.values():
+            self.random_mac_groups.pop(group.device_id, None)
+            self.raw_groups.pop(group.raw_id, None)
+            group_emptied, group_beacons = self.pop_group_beacons(group)
+            emptied.extend(group_emptied)
+            beacons.extend(group_beacons)
+        return emptied, beacons
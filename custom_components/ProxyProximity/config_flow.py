@@ -1,13 +1,87 @@
 """Config flow for ProxyProximity Tracker integration."""
 from __future__ import annotations
 
+from collections.abc import Mapping
 from typing import Any
+from uuid import UUID
+
+import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.components import bluetooth
+from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers.selector import ObjectSelector
+
+from .const import (
+    CONF_AREA_FINGERPRINTS,
+    CONF_CALIBRATION_OFFSETS,
+    CONF_DISTANCE_FILTER,
+    CONF_EVICTION_RETENTION,
+    CONF_FAST_REFRESH,
+    CONF_IGNORE_TTL,
+    CONF_MAX_UNAVAILABLE,
+    CONF_MIN_STATE_WRITE_INTERVAL,
+    CONF_PATH_LOSS_EXPONENTS,
+    CONF_PIPELINE,
+    CONF_REFRESH_BUDGET,
+    CONF_SCANNER_AREAS,
+    CONF_SHARD_PARTITION,
+    CONF_SHARD_PARTITIONS,
+    CONF_SHARD_SOURCES,
+    CONF_SHARD_UUIDS,
+    CONF_SIGNIFICANT_DISTANCE_CHANGE,
+    CONF_SIGNIFICANT_RSSI_CHANGE,
+    CONF_TRANSIENT_MIN_DWELL,
+    CONF_TRANSIENT_MIN_OBSERVATIONS,
+    CONF_UNAVAILABLE_TIMEOUTS,
+    DEFAULT_DISTANCE_FILTER,
+    DEFAULT_PIPELINE,
+    DOMAIN,
+    EVICTION_RETENTION,
+    MAX_UNAVAILABLE,
+    MIN_STATE_WRITE_INTERVAL,
+    REFRESH_BUDGET,
+    SIGNIFICANT_DISTANCE_CHANGE,
+    SIGNIFICANT_RSSI_CHANGE,
+    TRANSIENT_MIN_DWELL,
+    TRANSIENT_MIN_OBSERVATIONS,
+    DistanceFilter,
+    Pipeline,
+)
+from .shard import Shard
+
+DEFAULT_NAME = "ProxyProximity Tracker"
+
+
+def _split(value: str) -> list[str]:
+    """Split a comma separated list."""
+    return [item for item in (part.strip() for part in value.split(",")) if item]
+
 
-from .const import DOMAIN
+def _uuid_str(value: Any) -> str:
+    """Return an UUID in its canonical form."""
+    return str(UUID(str(value)))
+
+
+_SECONDS = vol.All(vol.Coerce(float), vol.Range(min=0))
+_RSSI = vol.All(vol.Coerce(float), vol.Range(min=-127, max=0))
+
+# Options entered as a mapping, validated once the form is submitted
+MAPPING_OPTIONS: dict[str, vol.Schema] = {
+    CONF_UNAVAILABLE_TIMEOUTS: vol.Schema(
+        {str: vol.All(vol.Coerce(float), vol.Range(min=1))}
+    ),
+    CONF_PATH_LOSS_EXPONENTS: vol.Schema(
+        {_uuid_str: vol.All(vol.Coerce(float), vol.Range(min=1, max=6))}
+    ),
+    CONF_CALIBRATION_OFFSETS: vol.Schema(
+        {_uuid_str: vol.All(vol.Coerce(float), vol.Range(min=-30, max=30))}
+    ),
+    CONF_SCANNER_AREAS: vol.Schema({str: str}),
+    CONF_AREA_FINGERPRINTS: vol.Schema({str: {str: _RSSI}}),
+}
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -18,14 +92,188 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the initial step."""
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
+        """Handle the initial step.
 
+        Each entry tracks a shard of the beacons, an entry left with the
+        defaults tracks every beacon.
+        """
         if not bluetooth.async_scanner_count(self.hass, connectable=False):
             return self.async_abort(reason="bluetooth_not_available")
 
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            try:
+                uuids = sorted(
+                    str(UUID(uuid_str))
+                    for uuid_str in _split(user_input[CONF_SHARD_UUIDS])
+                )
+            except ValueError:
+                errors[CONF_SHARD_UUIDS] = "invalid_uuid"
+            partitions = user_input[CONF_SHARD_PARTITIONS]
+            partition = user_input[CONF_SHARD_PARTITION]
+            if partition >= partitions:
+                errors[CONF_SHARD_PARTITION] = "invalid_partition"
+            if not errors:
+                data = {
+                    CONF_SHARD_UUIDS: uuids,
+                    CONF_SHARD_SOURCES: sorted(
+                        set(_split(user_input[CONF_SHARD_SOURCES]))
+                    ),
+                    CONF_SHARD_PARTITIONS: partitions,
+                    CONF_SHARD_PARTITION: partition,
+                }
+                shard = Shard(data)
+                for entry in self._async_current_entries(include_ignore=False):
+                    other = Shard(entry.data)
+                    if other.key == shard.key:
+                        return self.async_abort(reason="already_configured")
+                    if other.overlaps(shard):
+                        return self.async_abort(reason="shard_overlap")
+                return self.async_create_entry(
+                    title=user_input[CONF_NAME], data=data
+                )
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_NAME, default=DEFAULT_NAME): str,
+                    vol.Optional(CONF_SHARD_UUIDS, default=""): str,
+                    vol.Optional(CONF_SHARD_SOURCES, default=""): str,
+                    vol.Optional(CONF_SHARD_PARTITIONS, default=1): vol.All(
+                        vol.Coerce(int), vol.Range(min=1)
+                    ),
+                    vol.Optional(CONF_SHARD_PARTITION, default=0): vol.All(
+                        vol.Coerce(int), vol.Range(min=0)
+                    ),
+                }
+            ),
+            errors=errors,
+        )
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+
+def _suggested(options: Mapping[str, Any], key: str) -> dict[str, Any]:
+    """Return the description suggesting the current value of an optional option."""
+    if key not in options:
+        return {}
+    return {"suggested_value": options[key]}
+
+
+def _options_schema(options: Mapping[str, Any]) -> vol.Schema:
+    """Return the schema of the options form filled in with the current options."""
+    return vol.Schema(
+        {
+            vol.Optional(
+                CONF_DISTANCE_FILTER,
+                default=options.get(
+                    CONF_DISTANCE_FILTER, DEFAULT_DISTANCE_FILTER.value
+                ),
+            ): vol.In([distance_filter.value for distance_filter in DistanceFilter]),
+            vol.Optional(
+                CONF_PIPELINE,
+                default=options.get(CONF_PIPELINE, DEFAULT_PIPELINE.value),
+            ): vol.In([pipeline.value for pipeline in Pipeline]),
+            vol.Optional(
+                CONF_MIN_STATE_WRITE_INTERVAL,
+                default=options.get(
+                    CONF_MIN_STATE_WRITE_INTERVAL, MIN_STATE_WRITE_INTERVAL
+                ),
+            ): _SECONDS,
+            vol.Optional(
+                CONF_SIGNIFICANT_RSSI_CHANGE,
+                default=options.get(
+                    CONF_SIGNIFICANT_RSSI_CHANGE, SIGNIFICANT_RSSI_CHANGE
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(
+                CONF_SIGNIFICANT_DISTANCE_CHANGE,
+                default=options.get(
+                    CONF_SIGNIFICANT_DISTANCE_CHANGE, SIGNIFICANT_DISTANCE_CHANGE
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                CONF_REFRESH_BUDGET,
+                default=options.get(CONF_REFRESH_BUDGET, REFRESH_BUDGET),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                CONF_FAST_REFRESH,
+                default=", ".join(options.get(CONF_FAST_REFRESH, [])),
+            ): str,
+            vol.Optional(
+                CONF_TRANSIENT_MIN_OBSERVATIONS,
+                default=options.get(
+                    CONF_TRANSIENT_MIN_OBSERVATIONS, TRANSIENT_MIN_OBSERVATIONS
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                CONF_TRANSIENT_MIN_DWELL,
+                default=options.get(CONF_TRANSIENT_MIN_DWELL, TRANSIENT_MIN_DWELL),
+            ): _SECONDS,
+            vol.Optional(
+                CONF_EVICTION_RETENTION,
+                default=options.get(CONF_EVICTION_RETENTION, EVICTION_RETENTION),
+            ): _SECONDS,
+            vol.Optional(
+                CONF_MAX_UNAVAILABLE,
+                default=options.get(CONF_MAX_UNAVAILABLE, MAX_UNAVAILABLE),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(
+                CONF_IGNORE_TTL, description=_suggested(options, CONF_IGNORE_TTL)
+            ): vol.All(vol.Coerce(float), vol.Range(min=1)),
+            **{
+                vol.Optional(
+                    key, description=_suggested(options, key)
+                ): ObjectSelector()
+                for key in MAPPING_OPTIONS
+            },
+        }
+    )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of ProxyProximity Tracker.
+
+    The entry is reloaded when the options change. Options left empty
+    fall back to their default, the ignore TTL to ignoring forever.
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        options: Mapping[str, Any] = self.config_entry.options
         if user_input is not None:
-            return self.async_create_entry(title="ProxyProximity Tracker", data={})
+            new_options = dict(user_input)
+            new_options[CONF_FAST_REFRESH] = sorted(
+                set(_split(user_input.get(CONF_FAST_REFRESH, "")))
+            )
+            for key, schema in MAPPING_OPTIONS.items():
+                if user_input.get(key) is None:
+                    new_options.pop(key, None)
+                    continue
+                try:
+                    new_options[key] = schema(user_input[key])
+                except vol.Invalid:
+                    errors[key] = "invalid_mapping"
+            if not errors:
+                return self.async_create_entry(title="", data=new_options)
+            options = new_options
 
-        return self.async_show_form(step_id="user")
+        return self.async_show_form(
+            step_id="init",
+            data_schema=_options_schema(options),
+            errors=errors,
+        )
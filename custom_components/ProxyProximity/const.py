@@ -1,10 +1,8 @@
 """Constants for the ProxyProximity Tracker integration."""
 
 from datetime import timedelta
+from enum import StrEnum
 
-from homeassistant.components.bluetooth import (
-    FALLBACK_MAXIMUM_STALE_ADVERTISEMENT_SECONDS,
-)
 from homeassistant.const import Platform
 
 DOMAIN = "ProxyProximity"
@@ -12,13 +10,22 @@ DOMAIN = "ProxyProximity"
 PLATFORMS = [Platform.DEVICE_TRACKER, Platform.SENSOR]
 
 SIGNAL_ProxyProximity_DEVICE_NEW = "ProxyProximity_tracker_new_device"
-SIGNAL_ProxyProximity_DEVICE_UNAVAILABLE = "ProxyProximity_tracker_unavailable_device"
-SIGNAL_ProxyProximity_DEVICE_SEEN = "ProxyProximity_seen_device"
+SIGNAL_ProxyProximity_METRICS_UPDATED = "ProxyProximity_tracker_metrics_updated"
 
 ATTR_UUID = "uuid"
 ATTR_MAJOR = "major"
 ATTR_MINOR = "minor"
 ATTR_SOURCE = "source"
+ATTR_SOURCE_RSSI = "source_rssi"
+ATTR_DEVICE_ID = "device_id"
+ATTR_MINUTES = "minutes"
+ATTR_SECONDS = "seconds"
+ATTR_MEASURED_POWER = "measured_power"
+ATTR_APPLY_TO_UUID = "apply_to_uuid"
+
+SERVICE_GET_RSSI_HISTORY = "get_rssi_history"
+SERVICE_CALIBRATE = "calibrate"
+SERVICE_CLEAR_CALIBRATION = "clear_calibration"
 
 UNAVAILABLE_TIMEOUT = 180  # Number of seconds we wait for a beacon to be seen before marking it unavailable
 
@@ -26,23 +33,215 @@ UNAVAILABLE_TIMEOUT = 180  # Number of seconds we wait for a beacon to be seen b
 # and look for unavailable groups that use a random MAC address
 UPDATE_INTERVAL = timedelta(seconds=60)
 
+# How often the RSSI refresh scheduler runs. Each address is refreshed
+# from the last service info at the interval of its tier: fast for moving
+# or watched beacons, slow for static beacons and normal otherwise.
+REFRESH_TICK = timedelta(seconds=1)
+REFRESH_INTERVAL_FAST = 5
+REFRESH_INTERVAL_NORMAL = UPDATE_INTERVAL.total_seconds()
+REFRESH_INTERVAL_SLOW = 300
+# Maximum number of addresses refreshed per second, the addresses that
+# have been due the longest are refreshed first
+REFRESH_BUDGET = 100
+# RSSI variance (dB squared) above which a beacon is moving and below
+# which it is static
+MOVING_RSSI_VARIANCE = 16.0
+STATIC_RSSI_VARIANCE = 4.0
+# Weight of a new sample for the moving average of the RSSI variance
+RSSI_VARIANCE_ALPHA = 0.2
+
 # If a device broadcasts this many unique ids from the same address
 # we will add it to the ignore list since its garbage data.
 MAX_IDS = 10
 
+# A group switches to random MAC tracking before it reaches MAX_IDS once
+# a new address replaced the previous one this many times within the
+# window. A new address only replaces the previous one if at most one
+# other address of the group was seen within the overlap seconds.
+ROTATION_MIN_ROTATIONS = 2
+ROTATION_WINDOW = 3600
+ROTATION_OVERLAP = 30
+# Number of seconds after which the group an address was seen
+# broadcasting is forgotten and the maximum number of addresses kept
+ROTATION_ADDRESS_TTL = 3600
+MAX_ROTATION_ADDRESSES = 10000
+
 # If a device broadcasts this many major minors for the same uuid
 # we will add it to the ignore list since its garbage data.
 MAX_IDS_PER_UUID = 50
 
-# Number of times a beacon must be seen before it is added to the system
-# This is to prevent devices that are just passing by from being added
-# to the system.
-MIN_SEEN_TRANSIENT_NEW = (
-    round(
-        FALLBACK_MAXIMUM_STALE_ADVERTISEMENT_SECONDS / UPDATE_INTERVAL.total_seconds()
-    )
-    + 1
-)
+# A transient beacon, such as a phone or a visitor badge, is only added
+# to the system once it has been seen this many times over at least
+# this many seconds. This is to prevent devices that are just passing by
+# from being added to the system. Candidates are polled from the last
+# service info at the poll interval and dropped once they have not been
+# seen for the stale timeout.
+TRANSIENT_MIN_OBSERVATIONS = 5
+TRANSIENT_MIN_DWELL = 30
+TRANSIENT_POLL_INTERVAL = 5
+TRANSIENT_STALE_TIMEOUT = 60
+
+# Number of seconds new devices are collected for before they are sent to
+# the platforms in one batch, after a restart hundreds of beacons show up
+# at once and each platform should add their entities in a few calls. New
+# devices are only batched for NEW_DEVICE_BATCH_WINDOW seconds after
+# setup, later ones are sent right away, and a batch is sent as soon as
+# it has NEW_DEVICE_BATCH_SIZE devices.
+NEW_DEVICE_BATCH_DELAY = 0.1
+NEW_DEVICE_BATCH_WINDOW = 60
+NEW_DEVICE_BATCH_SIZE = 100
+
+
+class DistanceFilter(StrEnum):
+    """Filters used to smooth the RSSI before estimating the distance."""
+
+    EMA = "ema"
+    MEDIAN = "median"
+    KALMAN = "kalman"
+
+
+DEFAULT_DISTANCE_FILTER = DistanceFilter.KALMAN
+
+
+class Pipeline(StrEnum):
+    """Where the area classification of each update tick runs.
+
+    The tables of the beacons are snapshot on the event loop and the
+    results applied back on it in one batch, only the math in between
+    runs in an executor thread or a worker process.
+    """
+
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+DEFAULT_PIPELINE = Pipeline.THREAD
+# Weight of a new sample for the exponential moving average
+EMA_ALPHA = 0.3
+# Number of samples the median is taken over
+MEDIAN_WINDOW = 5
+# Variance of the RSSI drift between samples and of the measurement noise
+KALMAN_PROCESS_NOISE = 0.5
+KALMAN_MEASUREMENT_NOISE = 8.0
+
+# Maximum number of sources (proxies) whose RSSI is kept per beacon
+MAX_SOURCES_PER_BEACON = 8
+# dB the RSSI heard by a source loses per second since it was last heard
+SOURCE_RSSI_DECAY = 0.1
+# Number of seconds after which the RSSI heard by a source is dropped
+SOURCE_RSSI_MAX_AGE = 300
+# dB another source must be stronger than the nearest source to replace it
+NEAREST_SOURCE_HYSTERESIS = 6
+
+# Number of RSSI samples kept per beacon, at most 255
+RSSI_HISTORY_SIZE = 120
+# Maximum number of minutes of RSSI history returned by the service
+MAX_RSSI_HISTORY_MINUTES = 60
+
+# Maximum distance in meters estimated for a beacon, the same cap as
+# the distance ProxyProximity_ble estimates for each advertisement
+MAX_THEORETICAL_DISTANCE = 400.0
+# Path loss exponent of the log-distance model used with calibration
+# profiles of UUIDs without a configured exponent, 2 is free space
+DEFAULT_PATH_LOSS_EXPONENT = 2.0
+# Range of the integer RSSI covered by the calibration lookup tables
+CALIBRATION_TABLE_MIN_RSSI = -128
+CALIBRATION_TABLE_MAX_RSSI = 0
+# Default and maximum number of seconds of RSSI history the calibration
+# service takes the median of
+CALIBRATION_SECONDS = 30
+MAX_CALIBRATION_SECONDS = 300
+
+# Maximum number of scanners with an area used for room presence
+MAX_AREA_SCANNERS = 64
+# RSSI used for a scanner that does not hear a beacon
+AREA_RSSI_FLOOR = -100.0
+# RSSI expected from the scanners in the area a beacon is in when the
+# area has no configured fingerprint
+AREA_FINGERPRINT_RSSI = -60.0
+
+# Length of the Apple manufacturer data of an ProxyProximity advertisement and
+# the offsets of the UUID, major and minor in it
+ProxyProximity_PAYLOAD_LENGTH = 23
+ProxyProximity_UUID_START = 2
+ProxyProximity_ID_END = 22
+
+# Maximum number of (address, manufacturer data) payloads to keep parsed
+# advertisements for. Fixed beacons send the same payload for their whole
+# life so only the RSSI and source need to be updated on a hit.
+PARSE_CACHE_SIZE = 4096
+
+# Minimum number of seconds between seen updates written for a device
+# unless its RSSI or estimated distance changed by at least the
+# significant change amount. Updates in between are coalesced and
+# written in one batch at the end of the interval.
+MIN_STATE_WRITE_INTERVAL = 10
+SIGNIFICANT_RSSI_CHANGE = 5  # dBm
+SIGNIFICANT_DISTANCE_CHANGE = 1.0  # meters
+
+# Number of seconds a beacon or random MAC group without a device in the
+# device registry is kept after it went unavailable
+EVICTION_RETENTION = 3600
+# Maximum number of unavailable addresses and of unavailable random MAC
+# groups kept, the least recently seen are evicted first
+MAX_UNAVAILABLE = 1000
+
+# Number of seconds changes to the ignored addresses and UUIDs are
+# collected for before they are written to the config entry
+IGNORE_SAVE_DELAY = 10
+# Number of ignored addresses and UUIDs with the most dropped
+# advertisements shown in the diagnostics
+IGNORE_DIAGNOSTICS_TOP = 50
+
+# Only every this many advertisements are timed for the latency
+# histograms, must be a power of two
+METRICS_SAMPLE_INTERVAL = 16
+
+# Version of the stored snapshot of the tracked beacons
+STORAGE_VERSION = 1
+# Number of seconds the snapshot save is delayed by, the snapshot is
+# also written when Home Assistant stops
+SNAPSHOT_SAVE_DELAY = 300
 
+# Shard of the beacons a config entry tracks: the UUIDs and sources it
+# is limited to, all if empty, and its partition of the beacons hashed
+# by UUID, major and minor into the number of partitions
+CONF_SHARD_UUIDS = "shard_uuids"
+CONF_SHARD_SOURCES = "shard_sources"
+CONF_SHARD_PARTITIONS = "shard_partitions"
+CONF_SHARD_PARTITION = "shard_partition"
 CONF_IGNORE_ADDRESSES = "ignore_addresses"
 CONF_IGNORE_UUIDS = "ignore_uuids"
+# Mapping of ignored address or UUID to the time it expires at
+CONF_IGNORE_EXPIRES = "ignore_expires"
+# Number of seconds addresses and UUIDs stay ignored, forever if not set
+CONF_IGNORE_TTL = "ignore_ttl"
+# Mapping of group id (uuid_major_minor) or UUID to the number of seconds
+# without an advertisement before it is marked unavailable
+CONF_UNAVAILABLE_TIMEOUTS = "unavailable_timeouts"
+CONF_DISTANCE_FILTER = "distance_filter"
+CONF_PIPELINE = "pipeline"
+# Mapping of UUID to the path loss exponent of the log-distance model
+# used for its beacons instead of the default curve fit
+CONF_PATH_LOSS_EXPONENTS = "path_loss_exponents"
+# Mapping of UUID to the dB added to the Tx power its beacons advertise
+CONF_CALIBRATION_OFFSETS = "calibration_offsets"
+# Mapping of device id or UUID to the RSSI measured at 1 m, set by the
+# calibrate service
+CONF_CALIBRATION_PROFILES = "calibration_profiles"
+# Mapping of source to area id for scanners whose device has no area
+CONF_SCANNER_AREAS = "scanner_areas"
+# Mapping of area id to the RSSI expected from each source in that area
+CONF_AREA_FINGERPRINTS = "area_fingerprints"
+CONF_MIN_STATE_WRITE_INTERVAL = "min_state_write_interval"
+CONF_SIGNIFICANT_RSSI_CHANGE = "significant_rssi_change"
+CONF_SIGNIFICANT_DISTANCE_CHANGE = "significant_distance_change"
+# Device ids, group ids (uuid_major_minor) or UUIDs always refreshed
+# at the fast interval, such as asset tags watched by automations
+CONF_FAST_REFRESH = "fast_refresh"
+CONF_REFRESH_BUDGET = "refresh_budget"
+CONF_TRANSIENT_MIN_OBSERVATIONS = "transient_min_observations"
+CONF_TRANSIENT_MIN_DWELL = "transient_min_dwell"
+CONF_EVICTION_RETENTION = "eviction_retention"
+CONF_MAX_UNAVAILABLE = "max_unavailable"
@@ -1,50 +1,129 @@
 """Tracking for ProxyProximity devices."""
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
+import logging
+import multiprocessing
+from statistics import median
 import time
+from typing import Any
+from uuid import UUID
 
 from ProxyProximity_ble import (
     APPLE_MFR_ID,
-    ProxyProximity_FIRST_BYTE,
-    ProxyProximity_SECOND_BYTE,
     ProxyProximityAdvertisement,
     ProxyProximityParser,
 )
 
 from homeassistant.components import bluetooth
-from homeassistant.components.bluetooth.match import BluetoothCallbackMatcher
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceRegistry
+from homeassistant.core import CALLBACK_TYPE, CoreState, HomeAssistant, callback
+from homeassistant.helpers.device_registry import (
+    DeviceRegistry,
+    async_entries_for_config_entry,
+)
 from homeassistant.helpers.dispatcher import async_dispatcher_send
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.storage import Store
 
+from .area import AreaInputs, AreaPresenceEngine, classify_areas
+from .beacon_index import (
+    BeaconAddress,
+    BeaconGroup,
+    BeaconIndex,
+    BeaconState,
+    BeaconUUID,
+    TrackedBeacon,
+)
 from .const import (
-    CONF_IGNORE_ADDRESSES,
-    CONF_IGNORE_UUIDS,
+    CONF_AREA_FINGERPRINTS,
+    CONF_CALIBRATION_PROFILES,
+    CONF_EVICTION_RETENTION,
+    CONF_FAST_REFRESH,
+    CONF_IGNORE_TTL,
+    CONF_MAX_UNAVAILABLE,
+    CONF_MIN_STATE_WRITE_INTERVAL,
+    CONF_PIPELINE,
+    CONF_REFRESH_BUDGET,
+    CONF_SCANNER_AREAS,
+    CONF_SIGNIFICANT_DISTANCE_CHANGE,
+    CONF_SIGNIFICANT_RSSI_CHANGE,
+    CONF_TRANSIENT_MIN_DWELL,
+    CONF_TRANSIENT_MIN_OBSERVATIONS,
+    CONF_UNAVAILABLE_TIMEOUTS,
+    DEFAULT_PIPELINE,
     DOMAIN,
+    EVICTION_RETENTION,
+    IGNORE_DIAGNOSTICS_TOP,
     MAX_IDS,
     MAX_IDS_PER_UUID,
-    MIN_SEEN_TRANSIENT_NEW,
+    MAX_ROTATION_ADDRESSES,
+    MAX_UNAVAILABLE,
+    METRICS_SAMPLE_INTERVAL,
+    MIN_STATE_WRITE_INTERVAL,
+    MOVING_RSSI_VARIANCE,
+    NEW_DEVICE_BATCH_DELAY,
+    NEW_DEVICE_BATCH_SIZE,
+    NEW_DEVICE_BATCH_WINDOW,
+    REFRESH_BUDGET,
+    REFRESH_INTERVAL_FAST,
+    REFRESH_INTERVAL_NORMAL,
+    REFRESH_INTERVAL_SLOW,
+    REFRESH_TICK,
+    ROTATION_ADDRESS_TTL,
+    ROTATION_MIN_ROTATIONS,
+    ROTATION_OVERLAP,
+    ROTATION_WINDOW,
+    ProxyProximity_ID_END,
+    ProxyProximity_PAYLOAD_LENGTH,
+    ProxyProximity_UUID_START,
+    SIGNIFICANT_DISTANCE_CHANGE,
+    SIGNIFICANT_RSSI_CHANGE,
     SIGNAL_ProxyProximity_DEVICE_NEW,
-    SIGNAL_ProxyProximity_DEVICE_SEEN,
-    SIGNAL_ProxyProximity_DEVICE_UNAVAILABLE,
+    SIGNAL_ProxyProximity_METRICS_UPDATED,
+    SNAPSHOT_SAVE_DELAY,
+    STATIC_RSSI_VARIANCE,
+    STORAGE_VERSION,
+    TRANSIENT_MIN_DWELL,
+    TRANSIENT_MIN_OBSERVATIONS,
+    TRANSIENT_POLL_INTERVAL,
+    TRANSIENT_STALE_TIMEOUT,
     UNAVAILABLE_TIMEOUT,
     UPDATE_INTERVAL,
+    Pipeline,
 )
+from .distance import distance_model, rssi_filter_factory
+from .expiry import ExpiryQueue
+from .ignore_list import IgnoreList
+from .metrics import CoordinatorMetrics
+from .parse_cache import ProxyProximityParseCache
+from .rotation import RotationResolver
+from .shard import Shard
+from .snapshot import build_snapshot, restore_snapshot
+from .state_writer import StateWriteCoalescer
+from .transients import TransientAdmission
+
+_LOGGER = logging.getLogger(__name__)
 
 MONOTONIC_TIME = time.monotonic
+PERF_COUNTER = time.perf_counter
 
+# unique_id, name and advertisement of a device that needs entities
+NewDevice = tuple[str, str, ProxyProximityAdvertisement]
 
-def signal_unavailable(unique_id: str) -> str:
-    """Signal for the unique_id going unavailable."""
-    return f"{SIGNAL_ProxyProximity_DEVICE_UNAVAILABLE}_{unique_id}"
 
+class _DeviceListeners:
+    """The entity callbacks registered for a device."""
 
-def signal_seen(unique_id: str) -> str:
-    """Signal for the unique_id being seen."""
-    return f"{SIGNAL_ProxyProximity_DEVICE_SEEN}_{unique_id}"
+    __slots__ = ("seen", "unavailable")
+
+    def __init__(self) -> None:
+        """Initialize the listeners."""
+        self.seen: list[Callable[[ProxyProximityAdvertisement], None]] = []
+        self.unavailable: list[Callable[[], None]] = []
 
 
 def make_short_address(address: str) -> str:
@@ -74,31 +153,15 @@ def async_name(
     return base_name
 
 
-@callback
-def _async_dispatch_update(
-    hass: HomeAssistant,
-    device_id: str,
-    service_info: bluetooth.BluetoothServiceInfoBleak,
-    ProxyProximity_advertisement: ProxyProximityAdvertisement,
-    new: bool,
-    unique_address: bool,
-) -> None:
-    """Dispatch an update."""
-    if new:
-        async_dispatcher_send(
-            hass,
-            SIGNAL_ProxyProximity_DEVICE_NEW,
-            device_id,
-            async_name(service_info, ProxyProximity_advertisement, unique_address),
-            ProxyProximity_advertisement,
-        )
-        return
+def _start_worker(pool: ProcessPoolExecutor) -> None:
+    """Spawn the worker of a process pool and wait until it runs."""
+    pool.submit(int).result()
+
 
-    async_dispatcher_send(
-        hass,
-        signal_seen(device_id),
-        ProxyProximity_advertisement,
-    )
+@callback
+def async_get_store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Return the store of the snapshot of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
 
 
 class ProxyProximityCoordinator:
@@ -112,126 +175,557 @@ class ProxyProximityCoordinator:
         self._entry = entry
         self._dev_reg = registry
         self._ProxyProximity_parser = ProxyProximityParser()
+        self._parse_cache = ProxyProximityParseCache(self._ProxyProximity_parser)
+        self._metrics = CoordinatorMetrics(METRICS_SAMPLE_INTERVAL)
+        self._shard = Shard(entry.data)
+        # Signals are per config entry so each shard only gets its own devices
+        self._signal_device_new = f"{SIGNAL_ProxyProximity_DEVICE_NEW}_{entry.entry_id}"
+        self._signal_metrics_updated = (
+            f"{SIGNAL_ProxyProximity_METRICS_UPDATED}_{entry.entry_id}"
+        )
 
-        # ProxyProximity devices that do not follow the spec
+        # ProxyProximity devices and UUIDs that do not follow the spec
         # and broadcast custom data in the major and minor fields
-        self._ignore_addresses: set[str] = set(
-            entry.data.get(CONF_IGNORE_ADDRESSES, [])
+        self._ignore_list = IgnoreList(
+            hass, entry, entry.options.get(CONF_IGNORE_TTL)
         )
-        # ProxyProximity devices that do not follow the spec
-        # and broadcast custom data in the major and minor fields
-        self._ignore_uuids: set[str] = set(entry.data.get(CONF_IGNORE_UUIDS, []))
 
-        # ProxyProximitys with fixed MAC addresses
-        self._last_ProxyProximity_advertisement_by_unique_id: dict[
-            str, ProxyProximityAdvertisement
+        # ProxyProximitys with fixed MAC addresses, ProxyProximitys with random
+        # MAC addresses and ProxyProximitys with random major/minor are all
+        # tracked in the index
+        options = self._options = dict(entry.options)
+        # The area column of each source is looked up by the source
+        # tables of the beacons when they first hear the source
+        self._area_engine = AreaPresenceEngine(
+            hass,
+            registry,
+            options.get(CONF_SCANNER_AREAS, {}),
+            options.get(CONF_AREA_FINGERPRINTS, {}),
+        )
+        self._index = BeaconIndex(
+            UNAVAILABLE_TIMEOUT,
+            rssi_filter_factory(options),
+            self._area_engine.async_source_column,
+            options.get(CONF_UNAVAILABLE_TIMEOUTS),
+        )
+        # Addresses of ProxyProximitys with fixed MAC addresses by the
+        # time they will be unavailable if they are not seen again
+        self._unavailable_addresses: ExpiryQueue[BeaconAddress] = ExpiryQueue()
+        # Groups of ProxyProximitys with random MAC addresses by the
+        # time they will be unavailable if they are not seen again
+        self._unavailable_random_mac_groups: ExpiryQueue[BeaconGroup] = ExpiryQueue()
+        # Unavailable addresses and random MAC groups by the time they
+        # will be evicted from the index if they are not seen again
+        self._eviction_retention: float = options.get(
+            CONF_EVICTION_RETENTION, EVICTION_RETENTION
+        )
+        self._max_unavailable: int = options.get(CONF_MAX_UNAVAILABLE, MAX_UNAVAILABLE)
+        self._evictable_addresses: ExpiryQueue[BeaconAddress] = ExpiryQueue()
+        self._evictable_random_mac_groups: ExpiryQueue[BeaconGroup] = ExpiryQueue()
+        # Detects groups rotating their address before they reach MAX_IDS
+        self._rotation = RotationResolver(
+            ROTATION_WINDOW,
+            ROTATION_MIN_ROTATIONS,
+            ROTATION_OVERLAP,
+            ROTATION_ADDRESS_TTL,
+            MAX_ROTATION_ADDRESSES,
+        )
+        # Transient addresses waiting to be seen long enough to get entities
+        self._transients: TransientAdmission[BeaconAddress] = TransientAdmission(
+            options.get(CONF_TRANSIENT_MIN_DWELL, TRANSIENT_MIN_DWELL),
+            options.get(CONF_TRANSIENT_MIN_OBSERVATIONS, TRANSIENT_MIN_OBSERVATIONS),
+            TRANSIENT_STALE_TIMEOUT,
+        )
+        # Addresses by the time their RSSI is next refreshed, or by the
+        # time they are next polled while they are transient candidates
+        self._refresh_queue: ExpiryQueue[BeaconAddress] = ExpiryQueue()
+        self._fast_refresh: set[str] = set(options.get(CONF_FAST_REFRESH, []))
+        self._refresh_budget = max(
+            1,
+            round(
+                options.get(CONF_REFRESH_BUDGET, REFRESH_BUDGET)
+                * REFRESH_TICK.total_seconds()
+            ),
+        )
+        self._pipeline = Pipeline(options.get(CONF_PIPELINE, DEFAULT_PIPELINE))
+        self._process_pool: ProcessPoolExecutor | None = None
+        # Set while the areas of a tick are classified in an executor
+        self._area_task: asyncio.Task[None] | None = None
+        # Devices whose smoothed RSSI changed since the last tick by device
+        # id, their distances are estimated in one batch every tick. The
+        # flag forces the seen update to be written, None if the device has
+        # no entities yet and only needs its distance.
+        self._distance_model = distance_model(
+            options, entry.data.get(CONF_CALIBRATION_PROFILES, {})
+        )
+        self._pending_distances: dict[
+            str, tuple[BeaconState, ProxyProximityAdvertisement, bool | None]
         ] = {}
-        self._transient_seen_count: dict[str, int] = {}
-        self._group_ids_by_address: dict[str, set[str]] = {}
-        self._unique_ids_by_address: dict[str, set[str]] = {}
-        self._unique_ids_by_group_id: dict[str, set[str]] = {}
-        self._addresses_by_group_id: dict[str, set[str]] = {}
-        self._unavailable_trackers: dict[str, CALLBACK_TYPE] = {}
+        # New devices waiting to be sent to the platforms in one batch
+        self._new_devices: list[NewDevice] = []
+        self._cancel_new_devices_flush: CALLBACK_TYPE | None = None
+        self._batch_new_devices_until = MONOTONIC_TIME() + NEW_DEVICE_BATCH_WINDOW
+        # Entity callbacks by device id, called directly instead
+        # of sending a dispatcher signal for every update
+        self._listeners: dict[str, _DeviceListeners] = {}
+        self._state_writer = StateWriteCoalescer(
+            hass,
+            self._async_write_seen,
+            options.get(CONF_MIN_STATE_WRITE_INTERVAL, MIN_STATE_WRITE_INTERVAL),
+            options.get(CONF_SIGNIFICANT_RSSI_CHANGE, SIGNIFICANT_RSSI_CHANGE),
+            options.get(CONF_SIGNIFICANT_DISTANCE_CHANGE, SIGNIFICANT_DISTANCE_CHANGE),
+        )
+        # Snapshot of the index so beacons come back with their
+        # last advertisement right away after a restart
+        self._store = async_get_store(hass, entry.entry_id)
+        self._snapshot_pending = False
+
+    @property
+    def options(self) -> dict[str, Any]:
+        """Return the options the Coordinator was set up with."""
+        return self._options
+
+    @property
+    def parse_cache(self) -> ProxyProximityParseCache:
+        """Return the parse cache."""
+        return self._parse_cache
 
-        # ProxyProximity with random MAC addresses
-        self._group_ids_random_macs: set[str] = set()
-        self._last_seen_by_group_id: dict[str, bluetooth.BluetoothServiceInfoBleak] = {}
-        self._unavailable_group_ids: set[str] = set()
+    @property
+    def metrics(self) -> CoordinatorMetrics:
+        """Return the metrics."""
+        return self._metrics
 
-        # ProxyProximitys with random MAC addresses, fixed UUID, random major/minor
-        self._major_minor_by_uuid: dict[str, set[tuple[int, int]]] = {}
+    @property
+    def signal_device_new(self) -> str:
+        """Return the signal sent with each batch of new devices."""
+        return self._signal_device_new
+
+    @property
+    def signal_metrics_updated(self) -> str:
+        """Return the signal sent when the metrics are updated."""
+        return self._signal_metrics_updated
+
+    @callback
+    def async_diagnostics(self) -> dict[str, Any]:
+        """Return the metrics and the size of the index for diagnostics."""
+        index = self._index
+        parse_cache = self._parse_cache
+        return {
+            "shard": self._shard.as_dict(),
+            "metrics": self._metrics.as_dict(),
+            "parse_cache": {"hits": parse_cache.hits, "misses": parse_cache.misses},
+            "ignore_list": self._ignore_list.as_dict(IGNORE_DIAGNOSTICS_TOP),
+            "index": {
+                "uuids": len(index.uuids),
+                "addresses": len(index.addresses),
+                "beacons": len(index.beacons),
+                "random_mac_groups": len(index.random_mac_groups),
+                "evictable_addresses": len(self._evictable_addresses),
+                "evictable_random_mac_groups": len(self._evictable_random_mac_groups),
+                "rotation_addresses": len(self._rotation),
+            },
+        }
+
+    @callback
+    def async_add_device_listener(
+        self,
+        device_id: str,
+        seen_callback: Callable[[ProxyProximityAdvertisement], None],
+        unavailable_callback: Callable[[], None],
+    ) -> CALLBACK_TYPE:
+        """Listen for a device being seen or going unavailable."""
+        if not (listeners := self._listeners.get(device_id)):
+            listeners = self._listeners[device_id] = _DeviceListeners()
+        listeners.seen.append(seen_callback)
+        listeners.unavailable.append(unavailable_callback)
+
+        @callback
+        def _async_remove_listener() -> None:
+            listeners.seen.remove(seen_callback)
+            listeners.unavailable.remove(unavailable_callback)
+            if not listeners.seen and self._listeners.get(device_id) is listeners:
+                del self._listeners[device_id]
+
+        return _async_remove_listener
 
     @callback
     def async_device_id_seen(self, device_id: str) -> bool:
         """Return True if the device_id has been seen since boot."""
+        index = self._index
+        if beacon := index.beacons.get(device_id):
+            return beacon.advertisement is not None
         return bool(
-            device_id in self._last_ProxyProximity_advertisement_by_unique_id
-            or device_id in self._last_seen_by_group_id
+            (group := index.random_mac_groups.get(device_id))
+            and group.advertisement
+        )
+
+    @callback
+    def async_get_beacon_state(self, device_id: str) -> BeaconState | None:
+        """Return the smoothed state of a device."""
+        return self._index.get_state(device_id)
+
+    @callback
+    def async_get_rssi_history(
+        self, device_id: str, seconds: float
+    ) -> list[dict[str, Any]] | None:
+        """Return the RSSI samples of a device from the last seconds, oldest first.
+
+        Returns None if the device is not tracked.
+        """
+        if not (beacon_state := self._index.get_state(device_id)):
+            return None
+        now = MONOTONIC_TIME()
+        # Samples are timestamped with the monotonic clock
+        wall_offset = time.time() - now
+        return [
+            {
+                "time": datetime.fromtimestamp(seen + wall_offset, UTC).isoformat(),
+                "rssi": rssi,
+                "source": source,
+            }
+            for seen, rssi, source in beacon_state.history.since(now - seconds)
+        ]
+
+    @callback
+    def async_calibrate(
+        self,
+        device_id: str,
+        seconds: float,
+        measured_power: int | None,
+        apply_to_uuid: bool,
+    ) -> dict[str, Any] | None:
+        """Set the RSSI at 1 m of a device or of its UUID.
+
+        The measured power is the median RSSI over the last seconds of the
+        source hearing the device the strongest, the one it was placed 1 m
+        from, unless it is given. Returns None if the device is not tracked
+        and no measured power if it has no samples.
+        """
+        if not (group := self._index.get_group(device_id)) or not (
+            beacon_state := self._index.get_state(device_id)
+        ):
+            return None
+        key = group.beacon_uuid.uuid_str if apply_to_uuid else device_id
+        samples = 0
+        if measured_power is None:
+            by_source: dict[str, list[int]] = {}
+            for _, rssi, source in beacon_state.history.since(
+                MONOTONIC_TIME() - seconds
+            ):
+                by_source.setdefault(source, []).append(rssi)
+            if by_source:
+                nearest = max(by_source.values(), key=median)
+                samples = len(nearest)
+                measured_power = round(median(nearest))
+        if measured_power is not None:
+            self._distance_model.set_profile(key, measured_power)
+            self._async_save_calibration()
+        return {"profile": key, "measured_power": measured_power, "samples": samples}
+
+    @callback
+    def async_clear_calibration(
+        self, device_id: str, apply_to_uuid: bool
+    ) -> bool | None:
+        """Remove the calibration profile of a device or of its UUID.
+
+        Returns None if the device is not tracked and False if there
+        was no profile.
+        """
+        if not (group := self._index.get_group(device_id)):
+            return None
+        key = group.beacon_uuid.uuid_str if apply_to_uuid else device_id
+        if not self._distance_model.remove_profile(key):
+            return False
+        self._async_save_calibration()
+        return True
+
+    @callback
+    def _async_save_calibration(self) -> None:
+        """Write the calibration profiles to the config entry."""
+        entry = self._entry
+        self.hass.config_entries.async_update_entry(
+            entry,
+            data=entry.data
+            | {CONF_CALIBRATION_PROFILES: dict(self._distance_model.profiles)},
         )
 
     @callback
-    def _async_handle_unavailable(
-        self, service_info: bluetooth.BluetoothServiceInfoBleak
+    def _async_dispatch_update(
+        self,
+        device_id: str,
+        beacon_state: BeaconState,
+        service_info: bluetooth.BluetoothServiceInfoBleak,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+        new: bool,
+        unique_address: bool,
     ) -> None:
+        """Dispatch an update."""
+        metrics = self._metrics
+        metrics.dispatched += 1
+        if metrics.dispatch_start < 0:
+            metrics.dispatch_start = PERF_COUNTER()
+        if not new:
+            self._async_dispatch_seen(
+                device_id, beacon_state, ProxyProximity_advertisement, service_info.time
+            )
+            return
+        beacon_state.update_rssi(ProxyProximity_advertisement.rssi)
+        beacon_state.add_sample(
+            service_info.source, ProxyProximity_advertisement.rssi, service_info.time
+        )
+        beacon_state.sources.refresh(MONOTONIC_TIME())
+        self._pending_distances[device_id] = (
+            beacon_state,
+            ProxyProximity_advertisement,
+            None,
+        )
+        self._new_devices.append(
+            (
+                device_id,
+                async_name(service_info, ProxyProximity_advertisement, unique_address),
+                ProxyProximity_advertisement,
+            )
+        )
+        self._async_schedule_new_devices_flush()
+
+    @callback
+    def _async_dispatch_seen(
+        self,
+        device_id: str,
+        beacon_state: BeaconState,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+        seen: float,
+    ) -> None:
+        """Smooth the RSSI and queue the device for the next distance batch."""
+        beacon_state.update_rssi(ProxyProximity_advertisement.rssi)
+        beacon_state.add_sample(
+            ProxyProximity_advertisement.source, ProxyProximity_advertisement.rssi, seen
+        )
+        force: bool | None = beacon_state.sources.refresh(MONOTONIC_TIME())
+        pending_distances = self._pending_distances
+        if device_id not in self._listeners:
+            # The device has no entities yet and only needs its distance
+            force = None
+        elif (pending := pending_distances.get(device_id)) and (
+            pending[2] is not False
+        ):
+            # A forced write is pending or the entities registered since the
+            # device was queued without any, their first update is forced
+            force = True
+        pending_distances[device_id] = (beacon_state, ProxyProximity_advertisement, force)
+
+    @callback
+    def _async_flush_distances(self) -> None:
+        """Estimate the distance of the queued devices in one pass and write them.
+
+        The distance from the smoothed RSSI and from the last RSSI sample
+        are estimated in the same batch. Devices that already have
+        entities get a seen update if their RSSI or distance changed
+        enough.
+        """
+        if not (pending_distances := self._pending_distances):
+            return
+        start = PERF_COUNTER()
+        self._pending_distances = {}
+        pending = list(pending_distances.items())
+        device_ids = [device_id for device_id, _ in pending]
+        uuids = [advertisement.uuid for _, (_, advertisement, _) in pending]
+        power = [advertisement.power for _, (_, advertisement, _) in pending]
+        distances = self._distance_model.distances(
+            device_ids * 2,
+            uuids * 2,
+            [beacon_state.rssi for _, (beacon_state, _, _) in pending]
+            + [advertisement.rssi for _, (_, advertisement, _) in pending],
+            power * 2,
+        )
+        state_writer = self._state_writer
+        for (
+            (device_id, (beacon_state, advertisement, force)),
+            distance,
+            raw_distance,
+        ) in zip(pending, distances, distances[len(pending) :]):
+            beacon_state.distance = distance
+            beacon_state.raw_distance = raw_distance
+            if force is not None:
+                state_writer.async_seen(
+                    device_id, advertisement, beacon_state.rssi, distance, force
+                )
+        self._metrics.distance_flush.record(PERF_COUNTER() - start)
+
+    @callback
+    def _async_force_write(
+        self,
+        device_id: str,
+        beacon_state: BeaconState,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+    ) -> None:
+        """Write a device right away because derived state changed."""
+        self._state_writer.async_seen(
+            device_id,
+            ProxyProximity_advertisement,
+            ProxyProximity_advertisement.rssi
+            if beacon_state.rssi is None
+            else beacon_state.rssi,
+            beacon_state.distance,
+            True,
+        )
+
+    @callback
+    def _async_schedule_new_devices_flush(self) -> None:
+        """Send the new devices now or schedule sending them in one batch.
+
+        New devices are batched while the startup burst is coming in,
+        the batch is sent as soon as it is full.
+        """
+        if (
+            len(self._new_devices) >= NEW_DEVICE_BATCH_SIZE
+            or MONOTONIC_TIME() > self._batch_new_devices_until
+        ):
+            if self._cancel_new_devices_flush:
+                self._cancel_new_devices_flush()
+            self._async_flush_new_devices(None)
+        elif self._cancel_new_devices_flush is None:
+            self._cancel_new_devices_flush = async_call_later(
+                self.hass, NEW_DEVICE_BATCH_DELAY, self._async_flush_new_devices
+            )
+
+    @callback
+    def _async_flush_new_devices(self, _now: datetime | None) -> None:
+        """Send the new devices seen since the last flush as one batch."""
+        self._cancel_new_devices_flush = None
+        self._async_flush_distances()
+        new_devices = self._new_devices
+        self._new_devices = []
+        async_dispatcher_send(self.hass, self._signal_device_new, new_devices)
+
+    @callback
+    def _async_write_seen(
+        self, device_id: str, ProxyProximity_advertisement: ProxyProximityAdvertisement
+    ) -> None:
+        """Send a seen update to the entities of a device."""
+        if listeners := self._listeners.get(device_id):
+            for seen_callback in listeners.seen:
+                seen_callback(ProxyProximity_advertisement)
+
+    @callback
+    def _async_dispatch_unavailable(self, device_id: str) -> None:
+        """Send an unavailable update to the entities of a device."""
+        self._state_writer.async_unavailable(device_id)
+        if listeners := self._listeners.get(device_id):
+            for unavailable_callback in listeners.unavailable:
+                unavailable_callback()
+
+    @callback
+    def _async_handle_unavailable(self, address_entry: BeaconAddress) -> None:
         """Handle unavailable devices."""
-        address = service_info.address
-        self._async_cancel_unavailable_tracker(address)
-        for unique_id in self._unique_ids_by_address[address]:
-            async_dispatcher_send(self.hass, signal_unavailable(unique_id))
+        self._async_cancel_unavailable_tracker(address_entry)
+        for beacon in address_entry.beacons.values():
+            self._async_dispatch_unavailable(beacon.unique_id)
+        self._evictable_addresses.schedule(
+            address_entry, MONOTONIC_TIME() + self._eviction_retention
+        )
 
     @callback
-    def _async_cancel_unavailable_tracker(self, address: str) -> None:
+    def _async_cancel_unavailable_tracker(self, address_entry: BeaconAddress) -> None:
         """Cancel unavailable tracking for an address."""
-        self._unavailable_trackers.pop(address)()
-        self._transient_seen_count.pop(address, None)
+        self._unavailable_addresses.discard(address_entry)
+        self._evictable_addresses.discard(address_entry)
+        self._refresh_queue.discard(address_entry)
+        self._transients.discard(address_entry)
+        address_entry.transient = False
 
     @callback
-    def _async_ignore_uuid(self, uuid: str) -> None:
+    def _async_ignore_uuid(self, beacon_uuid: BeaconUUID) -> None:
         """Ignore an UUID that does not follow the spec and any entities created by it."""
-        self._ignore_uuids.add(uuid)
-        major_minor_by_uuid = self._major_minor_by_uuid.pop(uuid)
-        unique_ids_to_purge = set()
-        for major, minor in major_minor_by_uuid:
-            group_id = f"{uuid}_{major}_{minor}"
-            if unique_ids := self._unique_ids_by_group_id.pop(group_id, None):
-                unique_ids_to_purge.update(unique_ids)
-            for address in self._addresses_by_group_id.pop(group_id, []):
-                self._async_cancel_unavailable_tracker(address)
-                self._unique_ids_by_address.pop(address)
-                self._group_ids_by_address.pop(address)
-        self._async_purge_untrackable_entities(unique_ids_to_purge)
-        entry_data = self._entry.data
-        new_data = entry_data | {CONF_IGNORE_UUIDS: list(self._ignore_uuids)}
-        self.hass.config_entries.async_update_entry(self._entry, data=new_data)
+        self._ignore_list.async_ignore_uuid(beacon_uuid.uuid_str, time.time())
+        emptied, beacons = self._index.pop_uuid(beacon_uuid.uuid)
+        for address_entry in emptied:
+            self._async_cancel_unavailable_tracker(address_entry)
+        self._async_purge_untrackable_entities(beacons)
 
     @callback
     def _async_ignore_address(self, address: str) -> None:
         """Ignore an address that does not follow the spec and any entities created by it."""
-        self._ignore_addresses.add(address)
-        self._async_cancel_unavailable_tracker(address)
-        entry_data = self._entry.data
-        new_data = entry_data | {CONF_IGNORE_ADDRESSES: list(self._ignore_addresses)}
-        self.hass.config_entries.async_update_entry(self._entry, data=new_data)
-        self._async_purge_untrackable_entities(self._unique_ids_by_address[address])
-        self._group_ids_by_address.pop(address)
-        self._unique_ids_by_address.pop(address)
-
-    @callback
-    def _async_purge_untrackable_entities(self, unique_ids: set[str]) -> None:
-        """Remove entities that are no longer trackable."""
-        for unique_id in unique_ids:
+        self._ignore_list.async_ignore_address(address, time.time())
+        index = self._index
+        address_entry, beacons = index.pop_address(address)
+        if address_entry:
+            self._async_cancel_unavailable_tracker(address_entry)
+        for beacon in beacons:
+            index.prune_group(beacon.group)
+        self._async_purge_untrackable_entities(beacons)
+
+    @callback
+    def _async_purge_untrackable_entities(self, beacons: list[TrackedBeacon]) -> None:
+        """Remove entities that are no longer trackable.
+
+        Devices still waiting in the new device batch are dropped from it
+        so their entities are not created after they were purged.
+        """
+        if not beacons:
+            return
+        purged = {beacon.unique_id for beacon in beacons}
+        if self._new_devices:
+            self._new_devices = [
+                new_device
+                for new_device in self._new_devices
+                if new_device[0] not in purged
+            ]
+        pending_distances = self._pending_distances
+        for beacon in beacons:
+            pending_distances.pop(beacon.unique_id, None)
+            self._state_writer.async_remove(beacon.unique_id)
             if device := self._dev_reg.async_get_device(
-                identifiers={(DOMAIN, unique_id)}
+                identifiers={(DOMAIN, beacon.unique_id)}
             ):
                 self._dev_reg.async_remove_device(device.id)
-            self._last_ProxyProximity_advertisement_by_unique_id.pop(unique_id, None)
 
     @callback
     def _async_convert_random_mac_tracking(
         self,
-        group_id: str,
+        group: BeaconGroup,
         service_info: bluetooth.BluetoothServiceInfoBleak,
         ProxyProximity_advertisement: ProxyProximityAdvertisement,
     ) -> None:
-        """Switch to random mac tracking method when a group is using rotating mac addresses."""
-        self._group_ids_random_macs.add(group_id)
-        self._async_purge_untrackable_entities(self._unique_ids_by_group_id[group_id])
-        self._unique_ids_by_group_id.pop(group_id)
-        self._addresses_by_group_id.pop(group_id)
+        """Switch to random mac tracking method when a group is using rotating mac addresses.
+
+        The group takes over the device, entities and state of the address
+        seen most recently before the one it rotated to, so the device and
+        its history are kept. The devices of the other addresses are removed
+        so they are not left behind as unavailable devices.
+        """
+        index = self._index
+        rotation = self._rotation
+        address = service_info.address
+        addresses = index.addresses
+        anchor: TrackedBeacon | None = None
+        anchor_seen = -1.0
+        for beacon in group.beacons.values():
+            if (
+                beacon.address == address
+                or beacon.advertisement is None
+                or addresses[beacon.address].transient
+            ):
+                continue
+            if (seen := rotation.last_seen(beacon.address) or 0.0) > anchor_seen:
+                anchor, anchor_seen = beacon, seen
+        emptied, beacons = index.pop_group_beacons(group)
+        if anchor:
+            index.set_random_mac(group, anchor.unique_id, anchor.state)
+            group.advertisement = anchor.advertisement
+        else:
+            index.set_random_mac(group)
+        rotation.forget_group(group)
+        for address_entry in emptied:
+            self._async_cancel_unavailable_tracker(address_entry)
+        self._async_purge_untrackable_entities(
+            [beacon for beacon in beacons if beacon is not anchor]
+        )
+        self._metrics.rotations += 1
         self._async_update_ProxyProximity_with_random_mac(
-            group_id, service_info, ProxyProximity_advertisement
+            group, service_info, ProxyProximity_advertisement
         )
 
-    def _async_track_ProxyProximity_with_unique_address(
-        self, address: str, group_id: str, unique_id: str
-    ) -> None:
-        """Track an ProxyProximity with a unique address."""
-        self._unique_ids_by_address.setdefault(address, set()).add(unique_id)
-        self._group_ids_by_address.setdefault(address, set()).add(group_id)
-
-        self._unique_ids_by_group_id.setdefault(group_id, set()).add(unique_id)
-        self._addresses_by_group_id.setdefault(group_id, set()).add(address)
-
     @callback
     def _async_update_ProxyProximity(
         self,
@@ -239,82 +733,218 @@ class ProxyProximityCoordinator:
         change: bluetooth.BluetoothChange,
     ) -> None:
         """Update from a bluetooth callback."""
-        if service_info.address in self._ignore_addresses:
+        metrics = self._metrics
+        metrics.received += 1
+        ignore_list = self._ignore_list
+        if (address := service_info.address) in ignore_list.addresses:
+            metrics.ignored_address += 1
+            ignore_list.drops[address] += 1
             return
-        if not (ProxyProximity_advertisement := self._ProxyProximity_parser.parse(service_info)):
+        data = service_info.manufacturer_data[APPLE_MFR_ID]
+        if len(data) < ProxyProximity_PAYLOAD_LENGTH:
+            metrics.rejected += 1
             return
-
-        uuid_str = str(ProxyProximity_advertisement.uuid)
-        if uuid_str in self._ignore_uuids:
+        # The UUID, major and minor are at the same offsets in every
+        # ProxyProximity advertisement so ignored UUIDs can be dropped and
+        # known groups found without parsing or copying the payload
+        view = memoryview(data)
+        if (shard := self._shard).filtered and not shard.accepts(
+            service_info.source,
+            view[ProxyProximity_UUID_START:ProxyProximity_ID_END],
+        ):
+            metrics.other_shard += 1
             return
-
-        major = ProxyProximity_advertisement.major
-        minor = ProxyProximity_advertisement.minor
-        major_minor_by_uuid = self._major_minor_by_uuid.setdefault(uuid_str, set())
-        if len(major_minor_by_uuid) + 1 > MAX_IDS_PER_UUID:
-            self._async_ignore_uuid(uuid_str)
+        if ignore_list.uuid_bytes and (
+            (uuid_view := view[ProxyProximity_UUID_START : ProxyProximity_UUID_START + 16])
+            in ignore_list.uuid_bytes
+        ):
+            metrics.ignored_uuid += 1
+            ignore_list.uuid_drops[uuid_view.tobytes()] += 1
             return
+        group = self._index.raw_groups.get(
+            view[ProxyProximity_UUID_START:ProxyProximity_ID_END]
+        )
+        if metrics.received & metrics.sample_mask:
+            if ProxyProximity_advertisement := self._async_parse(
+                service_info, data, group
+            ):
+                self._async_update_index(
+                    service_info, ProxyProximity_advertisement, group
+                )
+            return
+        # Time every METRICS_SAMPLE_INTERVAL advertisement, the dispatch
+        # phase sets dispatch_start when it is reached
+        metrics.dispatch_start = -1.0
+        start = PERF_COUNTER()
+        ProxyProximity_advertisement = self._async_parse(service_info, data, group)
+        parsed = PERF_COUNTER()
+        metrics.parse.record(parsed - start)
+        if ProxyProximity_advertisement:
+            self._async_update_index(service_info, ProxyProximity_advertisement, group)
+        end = PERF_COUNTER()
+        if (dispatch_start := metrics.dispatch_start) > 0:
+            metrics.dispatch.record(end - dispatch_start)
+            end = dispatch_start
+        metrics.dispatch_start = 0.0
+        if ProxyProximity_advertisement:
+            metrics.index_update.record(end - parsed)
 
-        major_minor_by_uuid.add((major, minor))
-        group_id = f"{uuid_str}_{major}_{minor}"
+    @callback
+    def _async_parse(
+        self,
+        service_info: bluetooth.BluetoothServiceInfoBleak,
+        data: bytes,
+        group: BeaconGroup | None,
+    ) -> ProxyProximityAdvertisement | None:
+        """Parse an advertisement unless it is the unchanged payload of a known group."""
+        if (
+            group is not None
+            and group.random_mac
+            and (ProxyProximity_advertisement := group.advertisement)
+            and group.payload == data
+        ):
+            # Rotating addresses always miss the parse cache
+            # but the payload of the group stays the same
+            ProxyProximity_advertisement.source = service_info.source
+            ProxyProximity_advertisement.rssi = service_info.rssi
+            return ProxyProximity_advertisement
+        if not (
+            ProxyProximity_advertisement := self._parse_cache.parse(service_info)
+        ):
+            self._metrics.rejected += 1
+        return ProxyProximity_advertisement
+
+    @callback
+    def _async_update_index(
+        self,
+        service_info: bluetooth.BluetoothServiceInfoBleak,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+        group: BeaconGroup | None,
+    ) -> None:
+        """Update the index with a parsed advertisement.
 
-        if group_id in self._group_ids_random_macs:
+        group is the known group found by the prefilter, if any.
+        """
+        self._metrics.parsed += 1
+        if group is None:
+            group = self._async_add_group(ProxyProximity_advertisement)
+            if group is None:
+                return
+
+        if group.random_mac:
             self._async_update_ProxyProximity_with_random_mac(
-                group_id, service_info, ProxyProximity_advertisement
+                group, service_info, ProxyProximity_advertisement
             )
             return
 
         self._async_update_ProxyProximity_with_unique_address(
-            group_id, service_info, ProxyProximity_advertisement
+            group, service_info, ProxyProximity_advertisement
+        )
+
+    @callback
+    def _async_add_group(
+        self, ProxyProximity_advertisement: ProxyProximityAdvertisement
+    ) -> BeaconGroup | None:
+        """Add the group of an advertisement that is not in the index yet.
+
+        Returns None if the UUID is ignored or has too many groups.
+        """
+        index = self._index
+        uuid = ProxyProximity_advertisement.uuid
+        # Ignored UUIDs are never in the index so the string
+        # only needs to be built the first time an UUID is seen
+        if not (beacon_uuid := index.uuids.get(uuid)):
+            uuid_str = str(uuid)
+            if uuid_str in self._ignore_list.uuids:
+                self._metrics.ignored_uuid += 1
+                self._ignore_list.drops[uuid_str] += 1
+                return None
+            beacon_uuid = index.add_uuid(uuid, uuid_str)
+
+        if len(beacon_uuid.groups) + 1 > MAX_IDS_PER_UUID:
+            self._async_ignore_uuid(beacon_uuid)
+            return None
+
+        return index.add_group(
+            beacon_uuid,
+            ProxyProximity_advertisement.major,
+            ProxyProximity_advertisement.minor,
         )
 
     @callback
     def _async_update_ProxyProximity_with_random_mac(
         self,
-        group_id: str,
+        group: BeaconGroup,
         service_info: bluetooth.BluetoothServiceInfoBleak,
         ProxyProximity_advertisement: ProxyProximityAdvertisement,
     ) -> None:
         """Update ProxyProximitys with random mac addresses."""
-        new = group_id not in self._last_seen_by_group_id
-        self._last_seen_by_group_id[group_id] = service_info
-        self._unavailable_group_ids.discard(group_id)
-        _async_dispatch_update(
-            self.hass, group_id, service_info, ProxyProximity_advertisement, new, False
+        new = group.advertisement is None
+        group.last_service_info = service_info
+        group.advertisement = ProxyProximity_advertisement
+        group.name = service_info.name
+        group.payload = service_info.manufacturer_data[APPLE_MFR_ID]
+        if group.unavailable:
+            group.unavailable = False
+            self._evictable_random_mac_groups.discard(group)
+        self._unavailable_random_mac_groups.schedule(
+            group, service_info.time + group.unavailable_timeout
+        )
+        assert group.state is not None
+        self._async_dispatch_update(
+            group.device_id,
+            group.state,
+            service_info,
+            ProxyProximity_advertisement,
+            new,
+            False,
         )
 
     @callback
     def _async_update_ProxyProximity_with_unique_address(
         self,
-        group_id: str,
+        group: BeaconGroup,
         service_info: bluetooth.BluetoothServiceInfoBleak,
         ProxyProximity_advertisement: ProxyProximityAdvertisement,
     ) -> None:
         # Handle ProxyProximity with a fixed mac address
         # and or detect if the ProxyProximity is using a rotating mac address
         # and switch to random mac tracking method
+        index = self._index
         address = service_info.address
-        unique_id = f"{group_id}_{address}"
-        new = unique_id not in self._last_ProxyProximity_advertisement_by_unique_id
+        beacon = group.beacons.get(address)
+        new = beacon is None or beacon.advertisement is None
         # Reject creating new trackers if the name is not set
         if new and (
             service_info.device.name is None
             or service_info.device.name.replace("-", ":") == service_info.device.address
         ):
+            # Do not keep a group created by an advertisement that was rejected
+            if beacon is None:
+                index.prune_group(group)
             return
-        previously_tracked = address in self._unique_ids_by_address
-        self._last_ProxyProximity_advertisement_by_unique_id[unique_id] = ProxyProximity_advertisement
-        self._async_track_ProxyProximity_with_unique_address(address, group_id, unique_id)
-        if address not in self._unavailable_trackers:
-            self._unavailable_trackers[address] = bluetooth.async_track_unavailable(
-                self.hass, self._async_handle_unavailable, address
-            )
+        previously_tracked = address in index.addresses
+        if beacon is None:
+            beacon = index.track(group, address)
+        beacon.advertisement = ProxyProximity_advertisement
+        beacon.name = service_info.name
+        beacon.payload = service_info.manufacturer_data[APPLE_MFR_ID]
+        address_entry = index.addresses[address]
+        self._unavailable_addresses.schedule(
+            address_entry, service_info.time + group.unavailable_timeout
+        )
+        self._evictable_addresses.discard(address_entry)
 
         if not previously_tracked and new and ProxyProximity_advertisement.transient:
             # Do not create a new tracker right away for transient devices
             # If they keep advertising, we will create entities for them
-            # once _async_update_rssi_and_transients has seen them enough times
-            self._transient_seen_count[address] = 1
+            # once they have been seen for long enough
+            address_entry.transient = True
+            self._transients.add(address_entry, service_info.time)
+            self._refresh_queue.schedule(
+                address_entry, service_info.time + TRANSIENT_POLL_INTERVAL
+            )
+            self._metrics.transient += 1
             return
 
         # Some manufacturers violate the spec and flood us with random
@@ -323,121 +953,579 @@ class ProxyProximityCoordinator:
         # Once we see more than MAX_IDS from the same
         # address we remove all the trackers for that address and add the
         # address to the ignore list since we know its garbage data.
-        if len(self._group_ids_by_address[address]) >= MAX_IDS:
+        if len(address_entry.beacons) >= MAX_IDS:
             self._async_ignore_address(address)
             return
 
-        # Once we see more than MAX_IDS from the same
-        # group_id we remove all the trackers for that group_id
-        # as it means the addresses are being rotated.
-        if len(self._addresses_by_group_id[group_id]) >= MAX_IDS:
+        # Once new addresses keep replacing each other for the same
+        # group_id, or we see more than MAX_IDS from it, the addresses
+        # are being rotated and the group is tracked as a whole.
+        if (
+            self._rotation.observe(group, address, service_info.time)
+            or len(group.beacons) >= MAX_IDS
+        ):
             self._async_convert_random_mac_tracking(
-                group_id, service_info, ProxyProximity_advertisement
+                group, service_info, ProxyProximity_advertisement
             )
             return
 
-        _async_dispatch_update(
-            self.hass, unique_id, service_info, ProxyProximity_advertisement, new, True
+        if address_entry.transient:
+            if self._transients.observe(address_entry, service_info.time):
+                self._async_promote_transient(address_entry, service_info)
+            return
+
+        if address_entry not in self._refresh_queue:
+            self._async_schedule_refresh(address_entry, service_info.time)
+
+        self._async_dispatch_update(
+            beacon.unique_id,
+            beacon.state,
+            service_info,
+            ProxyProximity_advertisement,
+            new,
+            True,
         )
 
     @callback
     def _async_stop(self) -> None:
         """Stop the Coordinator."""
-        for cancel in self._unavailable_trackers.values():
-            cancel()
-        self._unavailable_trackers.clear()
+        self._unavailable_addresses.clear()
+        self._unavailable_random_mac_groups.clear()
+        self._evictable_addresses.clear()
+        self._evictable_random_mac_groups.clear()
+        self._refresh_queue.clear()
+        self._transients.clear()
+        self._rotation.clear()
+        if self._area_task:
+            self._area_task.cancel()
+            self._area_task = None
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        self._state_writer.async_stop()
+        self._ignore_list.async_stop()
+        if self._cancel_new_devices_flush:
+            self._cancel_new_devices_flush()
+            self._cancel_new_devices_flush = None
+        self._new_devices.clear()
+        self._pending_distances.clear()
+
+    @callback
+    def _async_check_unavailable_addresses(self) -> None:
+        """Check for fixed mac addresses that have not been seen in a while and mark them as unavailable."""
+        now = MONOTONIC_TIME()
+        for address_entry in self._unavailable_addresses.pop_expired(now):
+            if not address_entry.beacons:
+                continue
+            # Advertisements that did not change do not trigger a callback
+            # so the deadline may be based on an old timestamp. Ask for
+            # the latest service info before marking the address unavailable.
+            timeout = max(
+                beacon.group.unavailable_timeout
+                for beacon in address_entry.beacons.values()
+            )
+            if (
+                latest_service_info := bluetooth.async_last_service_info(
+                    self.hass, address_entry.address, connectable=False
+                )
+            ) and now - latest_service_info.time <= timeout:
+                self._unavailable_addresses.schedule(
+                    address_entry, latest_service_info.time + timeout
+                )
+                continue
+            self._async_handle_unavailable(address_entry)
 
     @callback
     def _async_check_unavailable_groups_with_random_macs(self) -> None:
         """Check for random mac groups that have not been seen in a while and mark them as unavailable."""
         now = MONOTONIC_TIME()
-        gone_unavailable = [
-            group_id
-            for group_id in self._group_ids_random_macs
-            if group_id not in self._unavailable_group_ids
-            and (service_info := self._last_seen_by_group_id.get(group_id))
-            and (
-                # We will not get callbacks for ProxyProximitys with random macs
-                # that rotate infrequently since their advertisement data
-                # does not change as the bluetooth.async_register_callback API
-                # suppresses callbacks for duplicate advertisements to avoid
-                # exposing integrations to the firehose of bluetooth advertisements.
-                #
-                # To solve this we need to ask for the latest service info for
-                # the address we last saw to get the latest timestamp.
-                #
-                # If there is no last service info for the address we know that
-                # the device is no longer advertising.
-                not (
+        random_mac_groups = self._index.random_mac_groups
+        for group in self._unavailable_random_mac_groups.pop_expired(now):
+            if (
+                group.unavailable
+                or random_mac_groups.get(group.device_id) is not group
+            ):
+                continue
+            # We will not get callbacks for ProxyProximitys with random macs
+            # that rotate infrequently since their advertisement data
+            # does not change as the bluetooth.async_register_callback API
+            # suppresses callbacks for duplicate advertisements to avoid
+            # exposing integrations to the firehose of bluetooth advertisements.
+            #
+            # To solve this we need to ask for the latest service info for
+            # the address we last saw to get the latest timestamp.
+            #
+            # If there is no last service info for the address we know that
+            # the device is no longer advertising. Groups restored from the
+            # snapshot that have not been seen since boot have no address.
+            if (
+                (service_info := group.last_service_info)
+                and (
                     latest_service_info := bluetooth.async_last_service_info(
                         self.hass, service_info.address, connectable=False
                     )
                 )
-                or now - latest_service_info.time > UNAVAILABLE_TIMEOUT
+                and now - latest_service_info.time <= group.unavailable_timeout
+            ):
+                self._unavailable_random_mac_groups.schedule(
+                    group, latest_service_info.time + group.unavailable_timeout
+                )
+                continue
+            group.unavailable = True
+            self._async_dispatch_unavailable(group.device_id)
+            self._evictable_random_mac_groups.schedule(
+                group, now + self._eviction_retention
             )
-        ]
-        for group_id in gone_unavailable:
-            self._unavailable_group_ids.add(group_id)
-            async_dispatcher_send(self.hass, signal_unavailable(group_id))
 
     @callback
-    def _async_update_rssi_and_transients(self) -> None:
-        """Check to see if the rssi has changed and update any devices.
+    def _async_has_registry_device(self, device_id: str) -> bool:
+        """Return True if a device id has a device in the device registry."""
+        return (
+            self._dev_reg.async_get_device(identifiers={(DOMAIN, device_id)})
+            is not None
+        )
 
-        We don't callback on RSSI changes so we need to check them
-        here and send them over the dispatcher periodically to
-        ensure the distance calculation is update.
+    @callback
+    def _async_evict_address(self, address_entry: BeaconAddress) -> None:
+        """Evict the beacons of an address that have no device in the device registry."""
+        index = self._index
+        if index.addresses.get(address_entry.address) is not address_entry:
+            return
+        metrics = self._metrics
+        for beacon in list(address_entry.beacons.values()):
+            if self._async_has_registry_device(beacon.unique_id):
+                continue
+            index.evict_beacon(beacon)
+            self._state_writer.async_remove(beacon.unique_id)
+            metrics.evicted_beacons += 1
 
-        If the transient flag is set we also need to check to see
-        if the device is still transmitting and increment the counter
+    @callback
+    def _async_evict_random_mac_group(self, group: BeaconGroup) -> None:
+        """Evict a random MAC group that has no device in the device registry."""
+        if (
+            not group.unavailable
+            or self._index.random_mac_groups.get(group.device_id) is not group
+            or self._async_has_registry_device(group.device_id)
+        ):
+            return
+        self._index.evict_random_mac_group(group)
+        self._state_writer.async_remove(group.device_id)
+        self._metrics.evicted_groups += 1
+
+    @callback
+    def _async_evict_unavailable(self) -> None:
+        """Evict what has been unavailable for longer than the retention period.
+
+        The least recently seen addresses and random MAC groups are
+        evicted early when more than the maximum are unavailable.
+        Beacons and groups with a device in the device registry are kept
+        so their entities can come back.
         """
-        for (
-            unique_id,
-            ProxyProximity_advertisement,
-        ) in self._last_ProxyProximity_advertisement_by_unique_id.items():
-            address = unique_id.split("_")[-1]
-            service_info = bluetooth.async_last_service_info(
-                self.hass, address, connectable=False
+        now = MONOTONIC_TIME()
+        addresses = self._evictable_addresses
+        groups = self._evictable_random_mac_groups
+        for address_entry in addresses.pop_expired(now):
+            self._async_evict_address(address_entry)
+        for group in groups.pop_expired(now):
+            self._async_evict_random_mac_group(group)
+        while len(addresses) > self._max_unavailable and (
+            address_entry := addresses.pop_earliest()
+        ):
+            self._async_evict_address(address_entry)
+        while len(groups) > self._max_unavailable and (
+            group := groups.pop_earliest()
+        ):
+            self._async_evict_random_mac_group(group)
+
+    @callback
+    def _async_promote_transient(
+        self,
+        address_entry: BeaconAddress,
+        service_info: bluetooth.BluetoothServiceInfoBleak,
+    ) -> None:
+        """Create the entities of a transient address that has been seen long enough."""
+        address_entry.transient = False
+        self._metrics.promoted += 1
+        for beacon in address_entry.beacons.values():
+            if ProxyProximity_advertisement := beacon.advertisement:
+                self._async_dispatch_update(
+                    beacon.unique_id,
+                    beacon.state,
+                    service_info,
+                    ProxyProximity_advertisement,
+                    True,
+                    True,
+                )
+        self._async_schedule_refresh(address_entry, service_info.time)
+
+    @callback
+    def _async_poll_transient(self, address_entry: BeaconAddress, now: float) -> None:
+        """Observe a transient address from its last service info.
+
+        Advertisements that did not change do not trigger a callback so
+        candidates are also polled. The address is polled again unless it
+        was promoted.
+        """
+        if (
+            service_info := bluetooth.async_last_service_info(
+                self.hass, address_entry.address, connectable=False
             )
-            if not service_info:
-                continue
+        ) and self._transients.observe(address_entry, service_info.time):
+            self._async_promote_transient(address_entry, service_info)
+            return
+        self._refresh_queue.schedule(address_entry, now + TRANSIENT_POLL_INTERVAL)
 
-            if address in self._transient_seen_count:
-                self._transient_seen_count[address] += 1
-                if self._transient_seen_count[address] == MIN_SEEN_TRANSIENT_NEW:
-                    self._transient_seen_count.pop(address)
-                    _async_dispatch_update(
-                        self.hass,
-                        unique_id,
-                        service_info,
-                        ProxyProximity_advertisement,
-                        True,
-                        True,
-                    )
-                    continue
+    @callback
+    def _async_drop_stale_transients(self, now: float) -> None:
+        """Evict the transient addresses that stopped advertising before they were promoted."""
+        for address_entry in self._transients.pop_stale(now):
+            self._async_cancel_unavailable_tracker(address_entry)
+            self._async_evict_address(address_entry)
+
+    @callback
+    def _async_refresh_interval(self, address_entry: BeaconAddress) -> float:
+        """Return the refresh interval of the tier of an address.
+
+        An address is in the fast tier if any of its beacons is watched
+        or moving, in the slow tier if all of them are static and in the
+        normal tier otherwise.
+        """
+        fast_refresh = self._fast_refresh
+        interval = REFRESH_INTERVAL_SLOW
+        for beacon in address_entry.beacons.values():
+            group = beacon.group
+            if fast_refresh and (
+                beacon.unique_id in fast_refresh
+                or group.group_id in fast_refresh
+                or group.beacon_uuid.uuid_str in fast_refresh
+            ):
+                return REFRESH_INTERVAL_FAST
+            beacon_state = beacon.state
+            if beacon_state.variance >= MOVING_RSSI_VARIANCE:
+                return REFRESH_INTERVAL_FAST
+            if beacon_state.rssi is None or beacon_state.variance > STATIC_RSSI_VARIANCE:
+                interval = REFRESH_INTERVAL_NORMAL
+        return interval
+
+    @callback
+    def _async_schedule_refresh(self, address_entry: BeaconAddress, now: float) -> None:
+        """Schedule the next RSSI refresh of an address."""
+        self._refresh_queue.schedule(
+            address_entry, now + self._async_refresh_interval(address_entry)
+        )
 
+    @callback
+    def _async_refresh_address(self, address_entry: BeaconAddress, now: float) -> bool:
+        """Check to see if the rssi of an address has changed and update its devices.
+
+        We don't callback on RSSI changes so we need to check them
+        here and send them to the entities periodically to ensure
+        the distance calculation is updated.
+
+        The last service info only has the source the Bluetooth manager
+        prefers, which it keeps until another scanner is much stronger, so
+        the per source RSSI table of every beacon is also fed the RSSI
+        every scanner holds for the address. Scanners drop addresses they
+        stop hearing, the RSSI they still hold is taken as heard now. The
+        tables are refreshed in the same pass so the nearest source
+        changes once the other sources stop hearing the beacon.
+
+        Returns False if the address is no longer advertising.
+        """
+        # The last service info and the scanner devices are fetched once
+        # per address no matter how many groups the address is broadcasting
+        service_info: bluetooth.BluetoothServiceInfoBleak | None = None
+        scanner_rssi: list[tuple[str, int]] = []
+        for beacon in address_entry.beacons.values():
+            if not (ProxyProximity_advertisement := beacon.advertisement):
+                continue
+            if service_info is None:
+                if not (
+                    service_info := bluetooth.async_last_service_info(
+                        self.hass, address_entry.address, connectable=False
+                    )
+                ):
+                    return False
+                # The preferred source is added with the time it was heard
+                scanner_rssi = [
+                    (scanner_device.scanner.source, scanner_device.advertisement.rssi)
+                    for scanner_device in bluetooth.async_scanner_devices_by_address(
+                        self.hass, address_entry.address, connectable=False
+                    )
+                    if scanner_device.scanner.source != service_info.source
+                ]
+            sources = beacon.state.sources
+            for source, rssi in scanner_rssi:
+                sources.add(source, rssi, now)
             if (
                 service_info.rssi != ProxyProximity_advertisement.rssi
                 or service_info.source != ProxyProximity_advertisement.source
             ):
                 ProxyProximity_advertisement.source = service_info.source
-                ProxyProximity_advertisement.update_rssi(service_info.rssi)
-                async_dispatcher_send(
-                    self.hass,
-                    signal_seen(unique_id),
+                ProxyProximity_advertisement.rssi = service_info.rssi
+                self._async_dispatch_seen(
+                    beacon.unique_id,
+                    beacon.state,
                     ProxyProximity_advertisement,
+                    service_info.time,
+                )
+            elif sources.refresh(now):
+                # The nearest source changed because the RSSI heard by
+                # the other sources changed, decayed or expired
+                self._async_force_write(
+                    beacon.unique_id, beacon.state, ProxyProximity_advertisement
+                )
+        return service_info is not None
+
+    @callback
+    def _async_refresh(self, _now: datetime) -> None:
+        """Refresh the RSSI of the addresses that are due within the budget.
+
+        Addresses that do not fit in the budget stay due and are refreshed
+        first on the next run. Addresses that stopped advertising leave the
+        schedule until they are seen again. Transient candidates are polled
+        instead and the stale ones are dropped. The distances of every device
+        whose RSSI changed since the last run are estimated afterwards.
+        """
+        now = MONOTONIC_TIME()
+        refresh_queue = self._refresh_queue
+        addresses = self._index.addresses
+        for address_entry in refresh_queue.pop_expired(now, self._refresh_budget):
+            if addresses.get(address_entry.address) is not address_entry:
+                continue
+            if address_entry.transient:
+                self._async_poll_transient(address_entry, now)
+            elif self._async_refresh_address(address_entry, now):
+                self._async_schedule_refresh(address_entry, now)
+        self._async_drop_stale_transients(now)
+        self._async_flush_distances()
+
+    @callback
+    def _async_update_areas(self) -> None:
+        """Classify the area of every beacon that has been seen in one batch."""
+        if not self._area_engine.active:
+            return
+        index = self._index
+        # Parallel lists of objects that already exist instead of a tuple
+        # per device so the tick allocates nothing per device that the
+        # garbage collector has to track
+        device_ids: list[str] = []
+        states: list[BeaconState] = []
+        advertisements: list[ProxyProximityAdvertisement] = []
+        for beacon in index.beacons.values():
+            if beacon.advertisement:
+                device_ids.append(beacon.unique_id)
+                states.append(beacon.state)
+                advertisements.append(beacon.advertisement)
+        for group in index.random_mac_groups.values():
+            if group.state and group.advertisement and not group.unavailable:
+                device_ids.append(group.device_id)
+                states.append(group.state)
+                advertisements.append(group.advertisement)
+        if self._pipeline is Pipeline.INLINE:
+            for row in self._area_engine.async_classify(states, MONOTONIC_TIME()):
+                self._async_force_write(
+                    device_ids[row], states[row], advertisements[row]
+                )
+            return
+        # Skip the tick if the previous classification is still running
+        # instead of queueing snapshots behind it
+        if self._area_task is not None or not (
+            inputs := self._area_engine.async_snapshot(states, MONOTONIC_TIME())
+        ):
+            return
+        self._area_task = self._entry.async_create_background_task(
+            self.hass,
+            self._async_classify_areas(inputs, device_ids, states, advertisements),
+            "ProxyProximity area classification",
+        )
+
+    async def _async_classify_areas(
+        self,
+        inputs: AreaInputs,
+        device_ids: list[str],
+        states: list[BeaconState],
+        advertisements: list[ProxyProximityAdvertisement],
+    ) -> None:
+        """Classify the areas of a snapshot in an executor and apply the results."""
+        try:
+            if self._pipeline is Pipeline.PROCESS:
+                if self._process_pool is None:
+                    await self._async_start_process_pool()
+                    assert self._process_pool is not None
+                nearest, heard = await self.hass.loop.run_in_executor(
+                    self._process_pool, classify_areas, inputs
                 )
+            else:
+                nearest, heard = await self.hass.async_add_executor_job(
+                    classify_areas, inputs
+                )
+        finally:
+            self._area_task = None
+        get_state = self._index.get_state
+        for row in self._area_engine.async_apply(states, nearest, heard):
+            device_id = device_ids[row]
+            beacon_state = states[row]
+            # The device may have been evicted while it was classified
+            if get_state(device_id) is beacon_state:
+                self._async_force_write(device_id, beacon_state, advertisements[row])
+
+    async def _async_start_process_pool(self) -> None:
+        """Start the worker process of the process pipeline.
+
+        The worker is spawned from an executor thread as spawning it
+        blocks for tens of milliseconds.
+        """
+        self._process_pool = pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        await self.hass.async_add_executor_job(_start_worker, pool)
 
     @callback
     def _async_update(self, _now: datetime) -> None:
         """Update the Coordinator."""
+        start = PERF_COUNTER()
+        self._async_check_unavailable_addresses()
         self._async_check_unavailable_groups_with_random_macs()
-        self._async_update_rssi_and_transients()
+        self._async_evict_unavailable()
+        self._ignore_list.async_expire(time.time())
+        self._rotation.expire(MONOTONIC_TIME())
+        self._async_update_areas()
+        self._async_schedule_snapshot()
+        metrics = self._metrics
+        metrics.last_tick = duration = PERF_COUNTER() - start
+        metrics.tick.record(duration)
+        async_dispatcher_send(self.hass, self._signal_metrics_updated)
+
+    @callback
+    def _async_schedule_snapshot(self) -> None:
+        """Schedule a save of the snapshot unless one is already pending.
+
+        Store.async_delay_save restarts the delay every time it is called
+        so it is only called once per save to keep the save from being
+        pushed back by every update.
+        """
+        if self._snapshot_pending:
+            return
+        self._snapshot_pending = True
+        self._store.async_delay_save(self._async_snapshot_data, SNAPSHOT_SAVE_DELAY)
+
+    async def async_save_snapshot(self) -> None:
+        """Save the snapshot now instead of after the save delay.
+
+        Called when the entry is unloaded, saving replaces the pending
+        delayed save so it cannot write the snapshot once the entry is
+        unloaded or removed.
+        """
+        # Keeps the update tick from scheduling another delayed save
+        self._snapshot_pending = True
+        await self._store.async_save(build_snapshot(self._index, True))
+
+    @callback
+    def _async_snapshot_data(self) -> dict[str, Any]:
+        """Return the snapshot to save.
+
+        The snapshot written when Home Assistant stops has every device
+        of the entry, a delayed save can miss devices created after it if
+        Home Assistant does not stop cleanly.
+        """
+        self._snapshot_pending = False
+        return build_snapshot(self._index, self.hass.state is CoreState.final_write)
+
+    @callback
+    def _async_restore_device(
+        self,
+        device_id: str,
+        beacon_state: BeaconState,
+        service_info: bluetooth.BluetoothServiceInfo,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+        unique_address: bool,
+        now: float,
+    ) -> None:
+        """Seed the state of a device restored from the snapshot and queue its entities."""
+        beacon_state.update_rssi(ProxyProximity_advertisement.rssi)
+        self._pending_distances[device_id] = (
+            beacon_state,
+            ProxyProximity_advertisement,
+            None,
+        )
+        beacon_state.sources.add(
+            ProxyProximity_advertisement.source, ProxyProximity_advertisement.rssi, now
+        )
+        beacon_state.sources.refresh(now)
+        self._new_devices.append(
+            (
+                device_id,
+                async_name(service_info, ProxyProximity_advertisement, unique_address),
+                ProxyProximity_advertisement,
+            )
+        )
+
+    @callback
+    def _async_restore_from_snapshot(self, data: dict[str, Any]) -> bool:
+        """Restore the state of the Coordinator from the snapshot.
+
+        The restored devices get their entities right away and are marked
+        unavailable if they are not seen again within their timeout.
+        Returns True if the snapshot has every device of the entry.
+        """
+        try:
+            restored_beacons, restored_groups = restore_snapshot(
+                self._index,
+                data,
+                self._ProxyProximity_parser,
+                self._ignore_list.uuids,
+                self._ignore_list.addresses,
+            )
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid ProxyProximity snapshot: %s", err)
+            return False
+        now = MONOTONIC_TIME()
+        addresses = self._index.addresses
+        for beacon, service_info in restored_beacons:
+            assert beacon.advertisement is not None
+            address_entry = addresses[beacon.address]
+            self._unavailable_addresses.schedule(
+                address_entry, now + beacon.group.unavailable_timeout
+            )
+            if address_entry.transient:
+                self._transients.add(address_entry, now)
+                self._refresh_queue.schedule(
+                    address_entry, now + TRANSIENT_POLL_INTERVAL
+                )
+                continue
+            self._async_restore_device(
+                beacon.unique_id,
+                beacon.state,
+                service_info,
+                beacon.advertisement,
+                True,
+                now,
+            )
+        for group, service_info in restored_groups:
+            assert group.state is not None and group.advertisement is not None
+            self._unavailable_random_mac_groups.schedule(
+                group, now + group.unavailable_timeout
+            )
+            self._async_restore_device(
+                group.device_id,
+                group.state,
+                service_info,
+                group.advertisement,
+                False,
+                now,
+            )
+        if self._new_devices:
+            self._async_schedule_new_devices_flush()
+        return bool(data.get("complete"))
 
     @callback
     def _async_restore_from_registry(self) -> None:
         """Restore the state of the Coordinator from the device registry."""
-        for device in self._dev_reg.devices.values():
+        index = self._index
+        for device in async_entries_for_config_entry(
+            self._dev_reg, self._entry.entry_id
+        ):
             unique_id = None
             for identifier in device.identifiers:
                 if identifier[0] == DOMAIN:
@@ -445,37 +1533,62 @@ class ProxyProximityCoordinator:
                     break
             if not unique_id:
                 continue
+            address = None
             # ProxyProximitys with a fixed MAC address
             if unique_id.count("_") == 3:
-                uuid, major, minor, address = unique_id.split("_")
-                group_id = f"{uuid}_{major}_{minor}"
-                self._async_track_ProxyProximity_with_unique_address(
-                    address, group_id, unique_id
-                )
+                uuid_str, major, minor, address = unique_id.split("_")
+                if address in self._ignore_list.addresses:
+                    continue
             # ProxyProximitys with a random MAC address
             elif unique_id.count("_") == 2:
-                uuid, major, minor = unique_id.split("_")
-                group_id = f"{uuid}_{major}_{minor}"
-                self._group_ids_random_macs.add(group_id)
+                uuid_str, major, minor = unique_id.split("_")
+            else:
+                continue
+            if uuid_str in self._ignore_list.uuids:
+                continue
+            try:
+                uuid = UUID(uuid_str)
+                group = index.add_group(index.add_uuid(uuid), int(major), int(minor))
+            except ValueError:
+                continue
+            if address:
+                # The snapshot already restored the group as random MAC
+                # tracking, the device is the one of an address the group
+                # took over or of one of its old addresses
+                if group.random_mac:
+                    continue
+                index.track(group, address)
+            else:
+                index.set_random_mac(group)
 
     async def async_start(self) -> None:
         """Start the Coordinator."""
         await self._ProxyProximity_parser.async_setup()
-        self._async_restore_from_registry()
+        if self._pipeline is Pipeline.PROCESS:
+            await self._async_start_process_pool()
+        # The device registry is only restored from when there is no
+        # snapshot or it may be missing devices created after it was saved
+        if not (
+            (data := await self._store.async_load())
+            and self._async_restore_from_snapshot(data)
+        ):
+            self._async_restore_from_registry()
         entry = self._entry
-        entry.async_on_unload(
-            bluetooth.async_register_callback(
-                self.hass,
-                self._async_update_ProxyProximity,
-                BluetoothCallbackMatcher(
-                    connectable=False,
-                    manufacturer_id=APPLE_MFR_ID,
-                    manufacturer_data_start=[ProxyProximity_FIRST_BYTE, ProxyProximity_SECOND_BYTE],
-                ),  # We will take data from any source
-                bluetooth.BluetoothScanningMode.PASSIVE,
+        # One callback per UUID of the shard so the Bluetooth manager
+        # drops the other UUIDs, we will take data from any source
+        for matcher in self._shard.matchers():
+            entry.async_on_unload(
+                bluetooth.async_register_callback(
+                    self.hass,
+                    self._async_update_ProxyProximity,
+                    matcher,
+                    bluetooth.BluetoothScanningMode.PASSIVE,
+                )
             )
-        )
         entry.async_on_unload(self._async_stop)
         entry.async_on_unload(
             async_track_time_interval(self.hass, self._async_update, UPDATE_INTERVAL)
         )
+        entry.async_on_unload(
+            async_track_time_interval(self.hass, self._async_refresh, REFRESH_TICK)
+        )
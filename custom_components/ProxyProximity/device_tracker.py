@@ -1,6 +1,8 @@
 """Support for tracking ProxyProximity devices."""
 from __future__ import annotations
 
+from typing import Any
+
 from ProxyProximity_ble import ProxyProximityAdvertisement
 
 from homeassistant.components.device_tracker import SourceType
@@ -11,8 +13,8 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, SIGNAL_ProxyProximity_DEVICE_NEW
-from .coordinator import ProxyProximityCoordinator
+from .const import ATTR_SOURCE_RSSI, DOMAIN
+from .coordinator import NewDevice, ProxyProximityCoordinator
 from .entity import ProxyProximityEntity
 
 
@@ -20,28 +22,23 @@ async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up device tracker for ProxyProximity Tracker component."""
-    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN]
+    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN][entry.entry_id]
 
     @callback
-    def _async_device_new(
-        unique_id: str,
-        identifier: str,
-        ProxyProximity_advertisement: ProxyProximityAdvertisement,
-    ) -> None:
-        """Signal a new device."""
+    def _async_devices_new(new_devices: list[NewDevice]) -> None:
+        """Signal a batch of new devices."""
         async_add_entities(
-            [
-                ProxyProximityTrackerEntity(
-                    coordinator,
-                    identifier,
-                    unique_id,
-                    ProxyProximity_advertisement,
-                )
-            ]
+            ProxyProximityTrackerEntity(
+                coordinator,
+                identifier,
+                unique_id,
+                ProxyProximity_advertisement,
+            )
+            for unique_id, identifier, ProxyProximity_advertisement in new_devices
         )
 
     entry.async_on_unload(
-        async_dispatcher_connect(hass, SIGNAL_ProxyProximity_DEVICE_NEW, _async_device_new)
+        async_dispatcher_connect(hass, coordinator.signal_device_new, _async_devices_new)
     )
 
 
@@ -69,6 +66,16 @@ class ProxyProximityTrackerEntity(ProxyProximityEntity, BaseTrackerEntity):
         """Return the state of the device."""
         return STATE_HOME if self._active else STATE_NOT_HOME
 
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the device state attributes."""
+        attributes: dict[str, Any] = dict(super().extra_state_attributes)
+        if beacon_state := self._coordinator.async_get_beacon_state(
+            self._device_unique_id
+        ):
+            attributes[ATTR_SOURCE_RSSI] = beacon_state.sources.as_dict()
+        return attributes
+
     @property
     def source_type(self) -> SourceType:
         """Return tracker source type."""
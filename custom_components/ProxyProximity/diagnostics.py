@@ -0,0 +1,21 @@
+"""Diagnostics support for ProxyProximity."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import ProxyProximityCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": {"data": dict(entry.data), "options": dict(entry.options)},
+        **coordinator.async_diagnostics(),
+    }
@@ -0,0 +1,304 @@
+"""RSSI smoothing and distance estimation for ProxyProximity beacons."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+
+from .const import (
+    CALIBRATION_TABLE_MAX_RSSI,
+    CALIBRATION_TABLE_MIN_RSSI,
+    CONF_CALIBRATION_OFFSETS,
+    CONF_DISTANCE_FILTER,
+    CONF_PATH_LOSS_EXPONENTS,
+    DEFAULT_DISTANCE_FILTER,
+    DEFAULT_PATH_LOSS_EXPONENT,
+    EMA_ALPHA,
+    KALMAN_MEASUREMENT_NOISE,
+    KALMAN_PROCESS_NOISE,
+    MAX_THEORETICAL_DISTANCE,
+    MEDIAN_WINDOW,
+    DistanceFilter,
+)
+
+
+def _uuid_mapping(mapping: Mapping[str, float]) -> dict[UUID, float]:
+    """Return a mapping of UUID strings to floats keyed by UUID, skipping invalid UUIDs."""
+    result: dict[UUID, float] = {}
+    for uuid_str, value in mapping.items():
+        try:
+            result[UUID(uuid_str)] = float(value)
+        except ValueError:
+            continue
+    return result
+
+
+def _profile_uuid(key: str) -> UUID | None:
+    """Return the UUID of a calibration profile key, a device id or an UUID."""
+    try:
+        return UUID(key.split("_", 1)[0])
+    except ValueError:
+        return None
+
+
+# RSSI of each column of the calibration lookup tables
+_TABLE_RSSI = np.arange(CALIBRATION_TABLE_MIN_RSSI, CALIBRATION_TABLE_MAX_RSSI + 1)
+
+
+class DistanceModel:
+    """Estimates the distance in meters of many beacons in one pass.
+
+    Beacons with a calibration profile, the RSSI measured at 1 m for the
+    device or for its UUID, look their distance up in a table of the
+    distance for each integer RSSI built when the profile is set. For
+    the others the calibration offset of the UUID in dB is added to the
+    advertised Tx power, UUIDs with a path loss exponent use the
+    log-distance path loss model and the rest use the curve fit of the
+    RSSI to Tx power ratio. Every distance is capped at
+    MAX_THEORETICAL_DISTANCE. Distances of beacons without any
+    calibration are rounded to the meter like the ones ProxyProximity_ble
+    estimates, calibrated ones to the decimeter.
+    """
+
+    def __init__(
+        self,
+        exponents: Mapping[str, float],
+        offsets: Mapping[str, float],
+        profiles: Mapping[str, int],
+    ) -> None:
+        """Initialize the model."""
+        self._exponents = _uuid_mapping(exponents)
+        self._offsets = _uuid_mapping(offsets)
+        # Measured RSSI at 1 m by device id or UUID string
+        self.profiles: dict[str, int] = {
+            key: int(measured_power)
+            for key, measured_power in profiles.items()
+            if _profile_uuid(key) is not None
+        }
+        # Row of the lookup table of each profile
+        self._device_rows: dict[str, int] = {}
+        self._uuid_rows: dict[UUID, int] = {}
+        self._tables: np.ndarray | None = None
+        self._build_tables()
+
+    def _build_tables(self) -> None:
+        """Build the lookup table of every profile."""
+        self._device_rows.clear()
+        self._uuid_rows.clear()
+        if not (profiles := self.profiles):
+            self._tables = None
+            return
+        calibrated = [
+            (key, uuid, measured_power)
+            for key, measured_power in profiles.items()
+            if (uuid := _profile_uuid(key)) is not None
+        ]
+        tables = np.empty((len(calibrated), len(_TABLE_RSSI)))
+        for row, (key, uuid, measured_power) in enumerate(calibrated):
+            if key == str(uuid):
+                self._uuid_rows[uuid] = row
+            else:
+                self._device_rows[key] = row
+            exponent = self._exponents.get(uuid, DEFAULT_PATH_LOSS_EXPONENT)
+            tables[row] = np.round(
+                np.minimum(
+                    10 ** ((measured_power - _TABLE_RSSI) / (10 * exponent)),
+                    MAX_THEORETICAL_DISTANCE,
+                ),
+                1,
+            )
+        self._tables = tables
+
+    def set_profile(self, key: str, measured_power: int) -> None:
+        """Set the RSSI measured at 1 m for a device id or an UUID string."""
+        self.profiles[key] = measured_power
+        self._build_tables()
+
+    def remove_profile(self, key: str) -> bool:
+        """Remove the profile of a device id or an UUID string if it has one."""
+        if self.profiles.pop(key, None) is None:
+            return False
+        self._build_tables()
+        return True
+
+    def distances(
+        self,
+        device_ids: Sequence[str],
+        uuids: Sequence[UUID],
+        rssi: Sequence[float],
+        power: Sequence[int],
+    ) -> list[float | None]:
+        """Return the distance for each row, None if it cannot be estimated."""
+        count = len(uuids)
+        rssi_array = np.fromiter(rssi, dtype=np.float64, count=count)
+        power_array = np.fromiter(power, dtype=np.float64, count=count)
+        valid = power_array != 0
+        # Rows with an offset or an exponent for their UUID
+        calibrated = np.zeros(count, dtype=bool)
+        if offsets := self._offsets:
+            offset_array = np.fromiter(
+                (offsets.get(uuid, 0.0) for uuid in uuids),
+                dtype=np.float64,
+                count=count,
+            )
+            calibrated |= offset_array != 0
+            power_array += offset_array
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            ratio = rssi_array / power_array
+            distance = np.where(
+                ratio < 1.0, ratio**10, 0.89976 * ratio**7.7095 + 0.111
+            )
+            if exponents := self._exponents:
+                exponent = np.fromiter(
+                    (exponents.get(uuid, np.nan) for uuid in uuids),
+                    dtype=np.float64,
+                    count=count,
+                )
+                has_exponent = ~np.isnan(exponent)
+                calibrated |= has_exponent
+                distance = np.where(
+                    has_exponent,
+                    10 ** ((power_array - rssi_array) / (10 * exponent)),
+                    distance,
+                )
+        distance = np.minimum(distance, MAX_THEORETICAL_DISTANCE)
+        distance = np.where(calibrated, np.round(distance, 1), np.round(distance))
+        if (tables := self._tables) is not None:
+            device_rows = self._device_rows
+            uuid_rows = self._uuid_rows
+            rows = np.fromiter(
+                (
+                    device_rows.get(device_id, uuid_rows.get(uuid, -1))
+                    for device_id, uuid in zip(device_ids, uuids)
+                ),
+                dtype=np.intp,
+                count=count,
+            )
+            profiled = rows >= 0
+            columns = (
+                np.clip(
+                    np.rint(rssi_array),
+                    CALIBRATION_TABLE_MIN_RSSI,
+                    CALIBRATION_TABLE_MAX_RSSI,
+                ).astype(np.intp)
+                - CALIBRATION_TABLE_MIN_RSSI
+            )
+            distance = np.where(profiled, tables[rows, columns], distance)
+            valid |= profiled
+        valid &= (rssi_array != 0) & np.isfinite(distance)
+        return [
+            row_distance if row_valid else None
+            for row_distance, row_valid in zip(distance.tolist(), valid.tolist())
+        ]
+
+
+def distance_model(
+    options: Mapping[str, Any], profiles: Mapping[str, int]
+) -> DistanceModel:
+    """Return the distance model configured in the options with the calibration profiles."""
+    return DistanceModel(
+        options.get(CONF_PATH_LOSS_EXPONENTS, {}),
+        options.get(CONF_CALIBRATION_OFFSETS, {}),
+        profiles,
+    )
+
+
+class RssiFilter(ABC):
+    """Base class for per beacon RSSI filters."""
+
+    __slots__ = ()
+
+    @abstractmethod
+    def update(self, rssi: int) -> float:
+        """Add a sample and return the filtered RSSI."""
+
+
+class EMAFilter(RssiFilter):
+    """Exponential moving average of the RSSI."""
+
+    __slots__ = ("_alpha", "_value")
+
+    def __init__(self, alpha: float = EMA_ALPHA) -> None:
+        """Initialize the filter."""
+        self._alpha = alpha
+        self._value: float | None = None
+
+    def update(self, rssi: int) -> float:
+        """Add a sample and return the filtered RSSI."""
+        if self._value is None:
+            self._value = float(rssi)
+        else:
+            self._value += self._alpha * (rssi - self._value)
+        return self._value
+
+
+class MedianFilter(RssiFilter):
+    """Median of the last samples of the RSSI."""
+
+    __slots__ = ("_samples", "_size", "_next", "_count")
+
+    def __init__(self, size: int = MEDIAN_WINDOW) -> None:
+        """Initialize the filter."""
+        self._samples = array("b", bytes(size))
+        self._size = size
+        self._next = 0
+        self._count = 0
+
+    def update(self, rssi: int) -> float:
+        """Add a sample and return the filtered RSSI."""
+        self._samples[self._next] = max(-128, min(127, rssi))
+        self._next = (self._next + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+        ordered = sorted(self._samples[: self._count])
+        middle = self._count // 2
+        if self._count % 2:
+            return float(ordered[middle])
+        return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+class KalmanFilter(RssiFilter):
+    """One dimensional Kalman filter of the RSSI."""
+
+    __slots__ = ("_process_noise", "_measurement_noise", "_estimate", "_error")
+
+    def __init__(
+        self,
+        process_noise: float = KALMAN_PROCESS_NOISE,
+        measurement_noise: float = KALMAN_MEASUREMENT_NOISE,
+    ) -> None:
+        """Initialize the filter."""
+        self._process_noise = process_noise
+        self._measurement_noise = measurement_noise
+        self._estimate: float | None = None
+        self._error = 1.0
+
+    def update(self, rssi: int) -> float:
+        """Add a sample and return the filtered RSSI."""
+        if self._estimate is None:
+            self._estimate = float(rssi)
+            self._error = self._measurement_noise
+            return self._estimate
+        error = self._error + self._process_noise
+        gain = error / (error + self._measurement_noise)
+        self._estimate += gain * (rssi - self._estimate)
+        self._error = (1 - gain) * error
+        return self._estimate
+
+
+RSSI_FILTERS: dict[DistanceFilter, type[RssiFilter]] = {
+    DistanceFilter.EMA: EMAFilter,
+    DistanceFilter.MEDIAN: MedianFilter,
+    DistanceFilter.KALMAN: KalmanFilter,
+}
+
+
+def rssi_filter_factory(options: Mapping[str, Any]) -> Callable[[], RssiFilter]:
+    """Return a factory for the RSSI filter selected in the options."""
+    return RSSI_FILTERS[
+        DistanceFilter(options.get(CONF_DISTANCE_FILTER, DEFAULT_DISTANCE_FILTER))
+    ]
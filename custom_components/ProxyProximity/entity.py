@@ -7,11 +7,10 @@ from ProxyProximity_ble import ProxyProximityAdvertisement
 
 from homeassistant.core import callback
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
 
 from .const import ATTR_MAJOR, ATTR_MINOR, ATTR_SOURCE, ATTR_UUID, DOMAIN
-from .coordinator import ProxyProximityCoordinator, signal_seen, signal_unavailable
+from .coordinator import ProxyProximityCoordinator
 
 
 class ProxyProximityEntity(Entity):
@@ -46,9 +45,20 @@ class ProxyProximityEntity(Entity):
             ATTR_UUID: str(ProxyProximity_advertisement.uuid),
             ATTR_MAJOR: ProxyProximity_advertisement.major,
             ATTR_MINOR: ProxyProximity_advertisement.minor,
-            ATTR_SOURCE: ProxyProximity_advertisement.source,
+            ATTR_SOURCE: self._nearest_source,
         }
 
+    @property
+    def _nearest_source(self) -> str:
+        """Return the nearest source, which does not flip between proxies on every update."""
+        if (
+            beacon_state := self._coordinator.async_get_beacon_state(
+                self._device_unique_id
+            )
+        ) and (nearest := beacon_state.sources.nearest):
+            return nearest
+        return self._ProxyProximity_advertisement.source
+
     @abstractmethod
     @callback
     def _async_seen(
@@ -66,16 +76,9 @@ class ProxyProximityEntity(Entity):
         """Register state update callbacks."""
         await super().async_added_to_hass()
         self.async_on_remove(
-            async_dispatcher_connect(
-                self.hass,
-                signal_seen(self._device_unique_id),
+            self._coordinator.async_add_device_listener(
+                self._device_unique_id,
                 self._async_seen,
-            )
-        )
-        self.async_on_remove(
-            async_dispatcher_connect(
-                self.hass,
-                signal_unavailable(self._device_unique_id),
                 self._async_unavailable,
             )
         )
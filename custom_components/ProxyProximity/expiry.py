@@ -0,0 +1,99 @@
+"""Deadline queue used to expire ProxyProximity beacons."""
+from __future__ import annotations
+
+from collections.abc import Hashable
+from heapq import heappop, heappush
+from itertools import count
+from typing import Generic, TypeVar
+
+_KeyT = TypeVar("_KeyT", bound=Hashable)
+
+
+class ExpiryQueue(Generic[_KeyT]):
+    """Min-heap of deadlines with lazy rescheduling.
+
+    Moving a deadline later only updates a dict so it is cheap enough to
+    do on every advertisement. The heap is only touched when a deadline
+    moves earlier or when an expired entry turns out to have been pushed
+    back, so the cost of a sweep depends on how many keys are expiring and
+    not on how many are being tracked.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the queue."""
+        self._heap: list[tuple[float, int, _KeyT]] = []
+        self._counter = count()
+        # The deadline each key expires at
+        self._deadlines: dict[_KeyT, float] = {}
+        # The deadline of the live heap entry for each key, other
+        # heap entries for the key are stale and skipped when popped
+        self._queued: dict[_KeyT, float] = {}
+
+    def __len__(self) -> int:
+        """Return the number of scheduled keys."""
+        return len(self._deadlines)
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if the key is scheduled."""
+        return key in self._deadlines
+
+    def schedule(self, key: _KeyT, deadline: float) -> None:
+        """Schedule a key to expire at deadline."""
+        self._deadlines[key] = deadline
+        queued = self._queued.get(key)
+        if queued is None or deadline < queued:
+            self._queued[key] = deadline
+            heappush(self._heap, (deadline, next(self._counter), key))
+
+    def discard(self, key: _KeyT) -> None:
+        """Stop tracking a key."""
+        if self._deadlines.pop(key, None) is not None:
+            del self._queued[key]
+
+    def clear(self) -> None:
+        """Stop tracking all keys."""
+        self._heap.clear()
+        self._deadlines.clear()
+        self._queued.clear()
+
+    def pop_earliest(self) -> _KeyT | None:
+        """Remove and return the key with the earliest deadline."""
+        heap = self._heap
+        deadlines = self._deadlines
+        queued = self._queued
+        while heap:
+            heap_deadline, _, key = heappop(heap)
+            if queued.get(key) != heap_deadline:
+                continue
+            deadline = deadlines[key]
+            if deadline > heap_deadline:
+                queued[key] = deadline
+                heappush(heap, (deadline, next(self._counter), key))
+                continue
+            del deadlines[key]
+            del queued[key]
+            return key
+        return None
+
+    def pop_expired(self, now: float, limit: int | None = None) -> list[_KeyT]:
+        """Remove and return the keys with a deadline at or before now.
+
+        At most limit keys are returned if it is set, the earliest first.
+        """
+        heap = self._heap
+        deadlines = self._deadlines
+        queued = self._queued
+        expired: list[_KeyT] = []
+        while heap and heap[0][0] <= now and (limit is None or len(expired) < limit):
+            heap_deadline, _, key = heappop(heap)
+            if queued.get(key) != heap_deadline:
+                continue
+            deadline = deadlines[key]
+            if deadline > now:
+                queued[key] = deadline
+                heappush(heap, (deadline, next(self._counter), key))
+                continue
+            del deadlines[key]
+            del queued[key]
+            expired.append(key)
+        return expired
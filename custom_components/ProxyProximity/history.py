@@ -0,0 +1,71 @@
+"""RSSI history of ProxyProximity beacons."""
+from __future__ import annotations
+
+from array import array
+
+from .const import RSSI_HISTORY_SIZE
+
+
+class RssiHistory:
+    """Ring buffer of timestamped RSSI samples and the source that heard them.
+
+    Samples are kept in preallocated arrays, sources are stored as an index
+    into the list of sources the beacon has been heard by.
+    """
+
+    __slots__ = ("times", "rssi", "source_ids", "source_names", "next", "count")
+
+    def __init__(self, size: int = RSSI_HISTORY_SIZE) -> None:
+        """Initialize the history."""
+        self.times = array("d", bytes(8 * size))
+        self.rssi = array("b", bytes(size))
+        self.source_ids = array("B", bytes(size))
+        self.source_names: list[str] = []
+        self.next = 0
+        self.count = 0
+
+    def add(self, seen: float, rssi: int, source: str) -> None:
+        """Add a sample, replacing the oldest one when the buffer is full."""
+        source_names = self.source_names
+        try:
+            source_id = source_names.index(source)
+        except ValueError:
+            if len(source_names) > 0xFF:
+                self._compact_sources()
+            source_id = len(source_names)
+            source_names.append(source)
+        slot = self.next
+        self.times[slot] = seen
+        self.rssi[slot] = max(-128, min(127, rssi))
+        self.source_ids[slot] = source_id
+        self.next = (slot + 1) % len(self.times)
+        if self.count < len(self.times):
+            self.count += 1
+
+    def _slots(self) -> list[int]:
+        """Return the slots holding samples, oldest first."""
+        size = len(self.times)
+        first = (self.next - self.count) % size
+        return [(first + offset) % size for offset in range(self.count)]
+
+    def _compact_sources(self) -> None:
+        """Drop the sources no sample in the buffer refers to anymore."""
+        source_ids = self.source_ids
+        slots = self._slots()
+        used = sorted({source_ids[slot] for slot in slots})
+        remap = {old: new for new, old in enumerate(used)}
+        self.source_names[:] = [self.source_names[old] for old in used]
+        for slot in slots:
+            source_ids[slot] = remap[source_ids[slot]]
+
+    def since(self, start: float) -> list[tuple[float, int, str]]:
+        """Return the samples taken at or after start, oldest first."""
+        times = self.times
+        rssi = self.rssi
+        source_ids = self.source_ids
+        source_names = self.source_names
+        return [
+            (times[slot], rssi[slot], source_names[source_ids[slot]])
+            for slot in self._slots()
+            if times[slot] >= start
+        ]
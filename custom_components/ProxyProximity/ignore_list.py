@@ -0,0 +1,148 @@
+"""Addresses and UUIDs ignored by the ProxyProximity coordinator."""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    CONF_IGNORE_ADDRESSES,
+    CONF_IGNORE_EXPIRES,
+    CONF_IGNORE_UUIDS,
+    IGNORE_SAVE_DELAY,
+)
+from .expiry import ExpiryQueue
+
+
+def _uuid_bytes(uuid_str: str) -> bytes | None:
+    """Return the bytes of an UUID as they appear in an advertisement."""
+    try:
+        return UUID(uuid_str).bytes
+    except ValueError:
+        return None
+
+
+class IgnoreList:
+    """Ignored addresses and UUIDs with batched persistence.
+
+    The sets are checked before an advertisement is parsed, ignored
+    UUIDs are also kept as the raw bytes found in the manufacturer data.
+    Changes are written to the config entry in one batch after
+    IGNORE_SAVE_DELAY seconds so a flood of garbage does not rewrite the
+    entry for every address or UUID it ignores. Entries expire after ttl
+    seconds of wall clock time if it is set.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, ttl: float | None
+    ) -> None:
+        """Initialize the ignore list from the config entry."""
+        self._hass = hass
+        self._entry = entry
+        self._ttl = ttl
+        data = entry.data
+        self.addresses: set[str] = set(data.get(CONF_IGNORE_ADDRESSES, []))
+        self.uuids: set[str] = set(data.get(CONF_IGNORE_UUIDS, []))
+        self.uuid_bytes: set[bytes] = {
+            uuid_bytes
+            for uuid_str in self.uuids
+            if (uuid_bytes := _uuid_bytes(uuid_str)) is not None
+        }
+        # Number of advertisements dropped for each address or UUID, the
+        # prefilter counts UUIDs by their raw bytes so a flood does not
+        # build an UUID string for every advertisement it drops
+        self.drops: Counter[str] = Counter()
+        self.uuid_drops: Counter[bytes] = Counter()
+        # Ignored addresses and UUIDs by the wall clock time they expire at
+        self._expires: dict[str, float] = dict(data.get(CONF_IGNORE_EXPIRES, {}))
+        self._expiry: ExpiryQueue[str] = ExpiryQueue()
+        for key, expires in self._expires.items():
+            self._expiry.schedule(key, expires)
+        self._cancel_save: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_ignore_address(self, address: str, now: float) -> None:
+        """Ignore an address."""
+        self.addresses.add(address)
+        self._async_added(address, now)
+
+    @callback
+    def async_ignore_uuid(self, uuid_str: str, now: float) -> None:
+        """Ignore an UUID."""
+        self.uuids.add(uuid_str)
+        if (uuid_bytes := _uuid_bytes(uuid_str)) is not None:
+            self.uuid_bytes.add(uuid_bytes)
+        self._async_added(uuid_str, now)
+
+    @callback
+    def _async_added(self, key: str, now: float) -> None:
+        """Schedule the expiry of a new entry and save."""
+        if self._ttl is not None:
+            self._expires[key] = expires = now + self._ttl
+            self._expiry.schedule(key, expires)
+        self._async_schedule_save()
+
+    @callback
+    def async_expire(self, now: float) -> list[str]:
+        """Stop ignoring the entries that expired and return them."""
+        if not (expired := self._expiry.pop_expired(now)):
+            return expired
+        for key in expired:
+            del self._expires[key]
+            self.drops.pop(key, None)
+            if key in self.addresses:
+                self.addresses.discard(key)
+            elif key in self.uuids:
+                self.uuids.discard(key)
+                if (uuid_bytes := _uuid_bytes(key)) is not None:
+                    self.uuid_bytes.discard(uuid_bytes)
+                    self.uuid_drops.pop(uuid_bytes, None)
+        self._async_schedule_save()
+        return expired
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save the ignore list unless a save is already scheduled."""
+        if self._cancel_save is None:
+            self._cancel_save = async_call_later(
+                self._hass, IGNORE_SAVE_DELAY, self._async_save
+            )
+
+    @callback
+    def _async_save(self, _now: datetime | None = None) -> None:
+        """Write the ignore list to the config entry."""
+        self._cancel_save = None
+        entry = self._entry
+        self._hass.config_entries.async_update_entry(
+            entry,
+            data=entry.data
+            | {
+                CONF_IGNORE_ADDRESSES: list(self.addresses),
+                CONF_IGNORE_UUIDS: list(self.uuids),
+                CONF_IGNORE_EXPIRES: dict(self._expires),
+            },
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Write any pending changes right away."""
+        if self._cancel_save:
+            self._cancel_save()
+            self._async_save()
+
+    def as_dict(self, top: int) -> dict[str, Any]:
+        """Return the size of the ignore list and the entries dropping the most."""
+        drops = self.drops.copy()
+        for uuid_bytes, count in self.uuid_drops.items():
+            drops[str(UUID(bytes=uuid_bytes))] += count
+        return {
+            "addresses": len(self.addresses),
+            "uuids": len(self.uuids),
+            "expiring": len(self._expires),
+            "drops": dict(drops.most_common(top)),
+        }
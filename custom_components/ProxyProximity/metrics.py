@@ -0,0 +1,160 @@
+"""Metrics of the ProxyProximity coordinator."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Any
+
+# Upper bounds of the latency histogram buckets in microseconds,
+# latencies above the last bound go in an overflow bucket
+LATENCY_BUCKETS = (
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1_000,
+    2_000,
+    5_000,
+    10_000,
+    20_000,
+    50_000,
+    100_000,
+)
+
+
+class LatencyHistogram:
+    """Histogram of latencies with fixed buckets."""
+
+    __slots__ = ("count", "counts", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize the histogram."""
+        self.counts = array("Q", bytes(8 * (len(LATENCY_BUCKETS) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add a latency."""
+        micros = seconds * 1_000_000
+        self.counts[bisect_left(LATENCY_BUCKETS, micros)] += 1
+        self.count += 1
+        self.total += micros
+        self.max = max(self.max, micros)
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the upper bound in microseconds of the bucket holding a percentile."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return float(bound)
+        return round(self.max, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram as a dict."""
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count, 1) if self.count else None,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": round(self.max, 1),
+            "buckets": {
+                f"le_{bound}": count
+                for bound, count in zip(LATENCY_BUCKETS, self.counts)
+            }
+            | {"overflow": self.counts[-1]},
+        }
+
+
+class CoordinatorMetrics:
+    """Counters and sampled latencies of the advertisement hot path.
+
+    Counters are plain slot attributes so counting costs one attribute
+    increment. Only every sample_interval advertisement is timed, the
+    interval must be a power of two.
+    """
+
+    __slots__ = (
+        "dispatch",
+        "dispatch_start",
+        "dispatched",
+        "distance_flush",
+        "evicted_beacons",
+        "evicted_groups",
+        "ignored_address",
+        "ignored_uuid",
+        "index_update",
+        "last_tick",
+        "other_shard",
+        "parse",
+        "parsed",
+        "promoted",
+        "received",
+        "rejected",
+        "rotations",
+        "sample_mask",
+        "tick",
+        "transient",
+    )
+
+    def __init__(self, sample_interval: int) -> None:
+        """Initialize the metrics."""
+        self.received = 0
+        self.parsed = 0
+        self.ignored_address = 0
+        self.ignored_uuid = 0
+        self.other_shard = 0
+        self.rejected = 0
+        self.transient = 0
+        self.promoted = 0
+        self.rotations = 0
+        self.dispatched = 0
+        self.evicted_beacons = 0
+        self.evicted_groups = 0
+        self.sample_mask = sample_interval - 1
+        # Set when a sampled advertisement reaches the dispatch phase
+        self.dispatch_start = 0.0
+        self.parse = LatencyHistogram()
+        self.index_update = LatencyHistogram()
+        # Queueing an update for the next distance batch, the batch
+        # estimates and writes the distances in distance_flush
+        self.dispatch = LatencyHistogram()
+        self.distance_flush = LatencyHistogram()
+        self.tick = LatencyHistogram()
+        # Duration of the last update tick in seconds
+        self.last_tick: float | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics as a dict."""
+        return {
+            "received": self.received,
+            "parsed": self.parsed,
+            "ignored_address": self.ignored_address,
+            "ignored_uuid": self.ignored_uuid,
+            "other_shard": self.other_shard,
+            "rejected": self.rejected,
+            "transient": self.transient,
+            "promoted": self.promoted,
+            "rotations": self.rotations,
+            "dispatched": self.dispatched,
+            "evicted_beacons": self.evicted_beacons,
+            "evicted_groups": self.evicted_groups,
+            "sample_interval": self.sample_mask + 1,
+            "parse": self.parse.as_dict(),
+            "index_update": self.index_update.as_dict(),
+            "dispatch": self.dispatch.as_dict(),
+            "distance_flush": self.distance_flush.as_dict(),
+            "tick": self.tick.as_dict(),
+            "last_tick_ms": None
+            if self.last_tick is None
+            else round(self.last_tick * 1000, 3),
+        }
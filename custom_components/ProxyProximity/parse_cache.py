@@ -0,0 +1,74 @@
+"""Cache of parsed ProxyProximity advertisements."""
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from ProxyProximity_ble import (
+    APPLE_MFR_ID,
+    ProxyProximityAdvertisement,
+    ProxyProximityParser,
+)
+
+from homeassistant.components import bluetooth
+
+from .const import PARSE_CACHE_SIZE
+
+
+class ProxyProximityParseCache:
+    """Bounded LRU cache in front of ProxyProximityParser.parse.
+
+    Entries are keyed by (address, name, manufacturer data), the name is
+    part of the key as the parser derives the name and transient flag of
+    the advertisement from it. A cached advertisement is a template that
+    only gets its RSSI and source updated on a hit, its distance is left
+    as parsed since the coordinator estimates distances in batches with
+    the calibration applied. Payloads
+    that fail to parse are cached as rejected (None) so they are not parsed
+    again either.
+    """
+
+    def __init__(
+        self, parser: ProxyProximityParser, maxsize: int = PARSE_CACHE_SIZE
+    ) -> None:
+        """Initialize the cache."""
+        self._parser = parser
+        self._maxsize = maxsize
+        self._cache: OrderedDict[
+            tuple[str, str | None, bytes], ProxyProximityAdvertisement | None
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached payloads."""
+        return len(self._cache)
+
+    def parse(
+        self, service_info: bluetooth.BluetoothServiceInfoBleak
+    ) -> ProxyProximityAdvertisement | None:
+        """Parse an advertisement, reusing the cached result if the payload is unchanged."""
+        if (data := service_info.manufacturer_data.get(APPLE_MFR_ID)) is None:
+            return None
+        key = (service_info.address, service_info.name, data)
+        cache = self._cache
+        try:
+            ProxyProximity_advertisement = cache[key]
+        except KeyError:
+            self.misses += 1
+            ProxyProximity_advertisement = self._parser.parse(service_info)
+            cache[key] = ProxyProximity_advertisement
+            if len(cache) > self._maxsize:
+                cache.popitem(last=False)
+            return ProxyProximity_advertisement
+
+        self.hits += 1
+        cache.move_to_end(key)
+        if ProxyProximity_advertisement is None:
+            return None
+        ProxyProximity_advertisement.source = service_info.source
+        ProxyProximity_advertisement.rssi = service_info.rssi
+        return ProxyProximity_advertisement
+
+    def clear(self) -> None:
+        """Clear the cache."""
+        self._cache.clear()
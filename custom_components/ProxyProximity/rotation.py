@@ -0,0 +1,112 @@
+"""Detection of ProxyProximity beacons that rotate their MAC address."""
+from __future__ import annotations
+
+from collections import deque
+
+from .beacon_index import BeaconGroup
+from .expiry import ExpiryQueue
+
+
+class RotationResolver:
+    """Detects groups whose beacons rotate their MAC address.
+
+    The group each address was last seen broadcasting and when is kept
+    for ttl seconds after the address was last seen, for at most
+    max_addresses addresses with the least recently seen dropped first.
+
+    A new address of a group is a rotation when another address of the
+    group has been seen and at most one has been seen within overlap
+    seconds. The same beacon cloned onto several fixed addresses
+    advertises from all of them at once so it never looks like a
+    rotation. Addresses of the group that have not been seen since the
+    resolver started, such as the ones restored after a restart, are not
+    counted so hearing them again is not taken for rotations. A group is
+    rotating once min_rotations rotations happened within window seconds.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        min_rotations: int,
+        overlap: float,
+        ttl: float,
+        max_addresses: int,
+    ) -> None:
+        """Initialize the resolver."""
+        self._window = window
+        self._min_rotations = min_rotations
+        self._overlap = overlap
+        self._ttl = ttl
+        self._max_addresses = max_addresses
+        self._groups: dict[str, BeaconGroup] = {}
+        self._last_seen: dict[str, float] = {}
+        self._expiry: ExpiryQueue[str] = ExpiryQueue()
+        # Times of the last rotations of each group
+        self._rotations: dict[BeaconGroup, deque[float]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of addresses mapped to a group."""
+        return len(self._groups)
+
+    def last_seen(self, address: str) -> float | None:
+        """Return when an address was last seen."""
+        return self._last_seen.get(address)
+
+    def observe(self, group: BeaconGroup, address: str, seen: float) -> bool:
+        """Record an advertisement of a group from an address.
+
+        Returns True if the group is rotating its address.
+        """
+        groups = self._groups
+        last_seen = self._last_seen
+        known = groups.get(address) is group
+        groups[address] = group
+        last_seen[address] = seen
+        self._expiry.schedule(address, seen + self._ttl)
+        if len(groups) > self._max_addresses and (
+            oldest := self._expiry.pop_earliest()
+        ):
+            self._forget(oldest)
+        if known:
+            return False
+        overlap = self._overlap
+        others = 0
+        active = 0
+        for other in group.beacons:
+            if other == address or (other_seen := last_seen.get(other)) is None:
+                continue
+            others += 1
+            if seen - other_seen <= overlap:
+                active += 1
+        if not others or active > 1:
+            return False
+        if not (rotations := self._rotations.get(group)):
+            rotations = self._rotations[group] = deque(maxlen=self._min_rotations)
+        rotations.append(seen)
+        return (
+            len(rotations) == self._min_rotations
+            and seen - rotations[0] <= self._window
+        )
+
+    def forget_group(self, group: BeaconGroup) -> None:
+        """Forget the rotations of a group."""
+        self._rotations.pop(group, None)
+
+    def _forget(self, address: str) -> None:
+        """Forget an address."""
+        del self._last_seen[address]
+        group = self._groups.pop(address)
+        if not group.beacons:
+            self._rotations.pop(group, None)
+
+    def expire(self, now: float) -> None:
+        """Forget the addresses that have not been seen for the ttl."""
+        for address in self._expiry.pop_expired(now):
+            self._forget(address)
+
+    def clear(self) -> None:
+        """Forget everything."""
+        self._groups.clear()
+        self._last_seen.clear()
+        self._expiry.clear()
+        self._rotations.clear()
@@ -13,14 +13,22 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import SIGNAL_STRENGTH_DECIBELS_MILLIWATT, UnitOfLength
+from homeassistant.const import (
+    SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    EntityCategory,
+    UnitOfLength,
+    UnitOfTime,
+)
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, SIGNAL_ProxyProximity_DEVICE_NEW
-from .coordinator import ProxyProximityCoordinator
+from .beacon_index import BeaconState
+from .const import DOMAIN
+from .coordinator import NewDevice, ProxyProximityCoordinator
 from .entity import ProxyProximityEntity
+from .metrics import CoordinatorMetrics
 
 
 @dataclass
@@ -34,6 +42,23 @@ class ProxyProximityRequiredKeysMixin:
 class ProxyProximitySensorEntityDescription(SensorEntityDescription, ProxyProximityRequiredKeysMixin):
     """Describes ProxyProximity sensor entity."""
 
+    # Value derived by the coordinator, value_fn is used until it is known
+    state_value_fn: Callable[[BeaconState], str | int | float | None] | None = None
+
+
+@dataclass
+class ProxyProximityMetricsRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    metrics_fn: Callable[[CoordinatorMetrics], int | float | None]
+
+
+@dataclass
+class ProxyProximityMetricsSensorEntityDescription(
+    SensorEntityDescription, ProxyProximityMetricsRequiredKeysMixin
+):
+    """Describes ProxyProximity coordinator metrics sensor entity."""
+
 
 SENSOR_DESCRIPTIONS = (
     ProxyProximitySensorEntityDescription(
@@ -58,10 +83,40 @@ SENSOR_DESCRIPTIONS = (
         translation_key="estimated_distance",
         icon="mdi:signal-distance-variant",
         native_unit_of_measurement=UnitOfLength.METERS,
-        value_fn=lambda ProxyProximity_advertisement: ProxyProximity_advertisement.distance,
+        value_fn=lambda ProxyProximity_advertisement: None,
+        state_value_fn=lambda beacon_state: beacon_state.raw_distance,
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.DISTANCE,
+    ),
+    ProxyProximitySensorEntityDescription(
+        key="smoothed_rssi",
+        translation_key="smoothed_rssi",
+        device_class=SensorDeviceClass.SIGNAL_STRENGTH,
+        native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda ProxyProximity_advertisement: ProxyProximity_advertisement.rssi,
+        state_value_fn=lambda beacon_state: (
+            None if beacon_state.rssi is None else round(beacon_state.rssi)
+        ),
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    ProxyProximitySensorEntityDescription(
+        key="smoothed_distance",
+        translation_key="smoothed_distance",
+        icon="mdi:signal-distance-variant",
+        native_unit_of_measurement=UnitOfLength.METERS,
+        value_fn=lambda ProxyProximity_advertisement: None,
+        state_value_fn=lambda beacon_state: beacon_state.distance,
         state_class=SensorStateClass.MEASUREMENT,
         device_class=SensorDeviceClass.DISTANCE,
     ),
+    ProxyProximitySensorEntityDescription(
+        key="area",
+        translation_key="area",
+        icon="mdi:home-map-marker",
+        value_fn=lambda ProxyProximity_advertisement: None,
+        state_value_fn=lambda beacon_state: beacon_state.area,
+    ),
     ProxyProximitySensorEntityDescription(
         key="vendor",
         translation_key="vendor",
@@ -70,20 +125,137 @@ SENSOR_DESCRIPTIONS = (
     ),
 )
 
+METRICS_SENSOR_DESCRIPTIONS = (
+    ProxyProximityMetricsSensorEntityDescription(
+        key="advertisements_received",
+        translation_key="advertisements_received",
+        icon="mdi:bluetooth",
+        metrics_fn=lambda metrics: metrics.received,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="advertisements_parsed",
+        translation_key="advertisements_parsed",
+        icon="mdi:bluetooth",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.parsed,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="ignored_address",
+        translation_key="ignored_address",
+        icon="mdi:bluetooth-off",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.ignored_address,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="ignored_uuid",
+        translation_key="ignored_uuid",
+        icon="mdi:bluetooth-off",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.ignored_uuid,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="other_shard",
+        translation_key="other_shard",
+        icon="mdi:bluetooth-off",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.other_shard,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="transient_dropped",
+        translation_key="transient_dropped",
+        icon="mdi:bluetooth-off",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.transient,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="transient_promoted",
+        translation_key="transient_promoted",
+        icon="mdi:bluetooth-connect",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.promoted,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="dispatched",
+        translation_key="dispatched",
+        icon="mdi:send",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.dispatched,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="evicted",
+        translation_key="evicted",
+        icon="mdi:delete-clock",
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.evicted_beacons + metrics.evicted_groups,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="parse_latency_p99",
+        translation_key="parse_latency_p99",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.parse.percentile(99),
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="index_update_latency_p99",
+        translation_key="index_update_latency_p99",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.index_update.percentile(99),
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="dispatch_latency_p99",
+        translation_key="dispatch_latency_p99",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.dispatch.percentile(99),
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="distance_flush_duration_p99",
+        translation_key="distance_flush_duration_p99",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MICROSECONDS,
+        entity_registry_enabled_default=False,
+        metrics_fn=lambda metrics: metrics.distance_flush.percentile(99),
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    ProxyProximityMetricsSensorEntityDescription(
+        key="tick_duration",
+        translation_key="tick_duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        suggested_display_precision=1,
+        metrics_fn=lambda metrics: None
+        if metrics.last_tick is None
+        else metrics.last_tick * 1000,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up sensors for ProxyProximity Tracker component."""
-    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN]
+    coordinator: ProxyProximityCoordinator = hass.data[DOMAIN][entry.entry_id]
 
     @callback
-    def _async_device_new(
-        unique_id: str,
-        identifier: str,
-        ProxyProximity_advertisement: ProxyProximityAdvertisement,
-    ) -> None:
-        """Signal a new device."""
+    def _async_devices_new(new_devices: list[NewDevice]) -> None:
+        """Signal a batch of new devices."""
         async_add_entities(
             ProxyProximitySensorEntity(
                 coordinator,
@@ -92,11 +264,16 @@ async def async_setup_entry(
                 unique_id,
                 ProxyProximity_advertisement,
             )
+            for unique_id, identifier, ProxyProximity_advertisement in new_devices
             for description in SENSOR_DESCRIPTIONS
         )
 
     entry.async_on_unload(
-        async_dispatcher_connect(hass, SIGNAL_ProxyProximity_DEVICE_NEW, _async_device_new)
+        async_dispatcher_connect(hass, coordinator.signal_device_new, _async_devices_new)
+    )
+    async_add_entities(
+        ProxyProximityMetricsSensorEntity(coordinator, entry, description)
+        for description in METRICS_SENSOR_DESCRIPTIONS
     )
 
 
@@ -137,6 +314,59 @@ class ProxyProximitySensorEntity(ProxyProximityEntity, SensorEntity):
         self.async_write_ha_state()
 
     @property
-    def native_value(self) -> str | int | None:
+    def native_value(self) -> str | int | float | None:
+        """Return the state of the sensor."""
+        description = self.entity_description
+        if (
+            description.state_value_fn
+            and (
+                beacon_state := self._coordinator.async_get_beacon_state(
+                    self._device_unique_id
+                )
+            )
+            and (value := description.state_value_fn(beacon_state)) is not None
+        ):
+            return value
+        return description.value_fn(self._ProxyProximity_advertisement)
+
+
+class ProxyProximityMetricsSensorEntity(SensorEntity):
+    """A diagnostic sensor for the metrics of the ProxyProximity coordinator."""
+
+    entity_description: ProxyProximityMetricsSensorEntityDescription
+
+    _attr_should_poll = False
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        coordinator: ProxyProximityCoordinator,
+        entry: ConfigEntry,
+        description: ProxyProximityMetricsSensorEntityDescription,
+    ) -> None:
+        """Initialize a metrics sensor entity."""
+        self._coordinator = coordinator
+        self.entity_description = description
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            name=entry.title,
+            identifiers={(DOMAIN, entry.entry_id)},
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    @property
+    def native_value(self) -> int | float | None:
         """Return the state of the sensor."""
-        return self.entity_description.value_fn(self._ProxyProximity_advertisement)
+        return self.entity_description.metrics_fn(self._coordinator.metrics)
+
+    async def async_added_to_hass(self) -> None:
+        """Register state update callbacks."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                self._coordinator.signal_metrics_updated,
+                self.async_write_ha_state,
+            )
+        )
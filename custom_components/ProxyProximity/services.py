@@ -0,0 +1,162 @@
+"""Services for the ProxyProximity Tracker integration."""
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+
+from .const import (
+    ATTR_APPLY_TO_UUID,
+    ATTR_DEVICE_ID,
+    ATTR_MEASURED_POWER,
+    ATTR_MINUTES,
+    ATTR_SECONDS,
+    CALIBRATION_SECONDS,
+    DOMAIN,
+    MAX_CALIBRATION_SECONDS,
+    MAX_RSSI_HISTORY_MINUTES,
+    SERVICE_CALIBRATE,
+    SERVICE_CLEAR_CALIBRATION,
+    SERVICE_GET_RSSI_HISTORY,
+)
+from .coordinator import ProxyProximityCoordinator
+
+GET_RSSI_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_MINUTES, default=10): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=MAX_RSSI_HISTORY_MINUTES)
+        ),
+    }
+)
+CALIBRATE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_SECONDS, default=CALIBRATION_SECONDS): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=MAX_CALIBRATION_SECONDS)
+        ),
+        vol.Optional(ATTR_MEASURED_POWER): vol.All(
+            vol.Coerce(int), vol.Range(min=-127, max=0)
+        ),
+        vol.Optional(ATTR_APPLY_TO_UUID, default=False): cv.boolean,
+    }
+)
+CLEAR_CALIBRATION_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_APPLY_TO_UUID, default=False): cv.boolean,
+    }
+)
+
+
+@callback
+def _async_unique_ids(
+    hass: HomeAssistant, device_id: str
+) -> list[tuple[ProxyProximityCoordinator, str]]:
+    """Return the ProxyProximity unique ids of a device in the device registry.
+
+    Each unique id is paired with the coordinator of every loaded config
+    entry the device belongs to.
+    """
+    if not (device := dr.async_get(hass).async_get(device_id)):
+        raise HomeAssistantError(f"Unknown device {device_id}")
+    coordinators: dict[str, ProxyProximityCoordinator] = hass.data.get(DOMAIN, {})
+    return [
+        (coordinator, unique_id)
+        for entry_id in device.config_entries
+        if (coordinator := coordinators.get(entry_id))
+        for domain, unique_id in device.identifiers
+        if domain == DOMAIN
+    ]
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services."""
+
+    @callback
+    def _async_get_rssi_history(call: ServiceCall) -> ServiceResponse:
+        """Return the RSSI history of a device."""
+        for coordinator, unique_id in _async_unique_ids(
+            hass, call.data[ATTR_DEVICE_ID]
+        ):
+            if (
+                samples := coordinator.async_get_rssi_history(
+                    unique_id, call.data[ATTR_MINUTES] * 60
+                )
+            ) is not None:
+                return {"samples": samples}
+        raise HomeAssistantError(
+            f"Device {call.data[ATTR_DEVICE_ID]} is not a tracked ProxyProximity"
+        )
+
+    @callback
+    def _async_calibrate(call: ServiceCall) -> ServiceResponse:
+        """Set the RSSI at 1 m of a device or of its UUID."""
+        for coordinator, unique_id in _async_unique_ids(
+            hass, call.data[ATTR_DEVICE_ID]
+        ):
+            if (
+                profile := coordinator.async_calibrate(
+                    unique_id,
+                    call.data[ATTR_SECONDS],
+                    call.data.get(ATTR_MEASURED_POWER),
+                    call.data[ATTR_APPLY_TO_UUID],
+                )
+            ) is None:
+                continue
+            if profile["measured_power"] is None:
+                raise HomeAssistantError(
+                    f"Device {call.data[ATTR_DEVICE_ID]} has not been heard in the"
+                    f" last {call.data[ATTR_SECONDS]:g} seconds"
+                )
+            return profile if call.return_response else None
+        raise HomeAssistantError(
+            f"Device {call.data[ATTR_DEVICE_ID]} is not a tracked ProxyProximity"
+        )
+
+    @callback
+    def _async_clear_calibration(call: ServiceCall) -> None:
+        """Remove the calibration profile of a device or of its UUID."""
+        for coordinator, unique_id in _async_unique_ids(
+            hass, call.data[ATTR_DEVICE_ID]
+        ):
+            if (
+                coordinator.async_clear_calibration(
+                    unique_id, call.data[ATTR_APPLY_TO_UUID]
+                )
+                is not None
+            ):
+                return
+        raise HomeAssistantError(
+            f"Device {call.data[ATTR_DEVICE_ID]} is not a tracked ProxyProximity"
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_RSSI_HISTORY,
+        _async_get_rssi_history,
+        schema=GET_RSSI_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CALIBRATE,
+        _async_calibrate,
+        schema=CALIBRATE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CLEAR_CALIBRATION,
+        _async_clear_calibration,
+        schema=CLEAR_CALIBRATION_SCHEMA,
+    )
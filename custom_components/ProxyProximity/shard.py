@@ -0,0 +1,114 @@
+"""Shards of the ProxyProximity beacons tracked by each config entry."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+from uuid import UUID
+from zlib import crc32
+
+from ProxyProximity_ble import (
+    APPLE_MFR_ID,
+    ProxyProximity_FIRST_BYTE,
+    ProxyProximity_SECOND_BYTE,
+)
+
+from homeassistant.components.bluetooth.match import BluetoothCallbackMatcher
+
+from .const import (
+    CONF_SHARD_PARTITION,
+    CONF_SHARD_PARTITIONS,
+    CONF_SHARD_SOURCES,
+    CONF_SHARD_UUIDS,
+)
+
+
+class Shard:
+    """The part of the beacons a config entry tracks.
+
+    An entry tracks the beacons with an UUID in its allow list, heard by
+    a source in its source list and whose UUID, major and minor hash to
+    its partition. An empty list and a single partition match everything
+    so an entry without shard data tracks every beacon.
+
+    The UUIDs are matched by the Bluetooth manager before the callback is
+    called. The sources and the partition are checked on the raw
+    manufacturer data before it is parsed, the partition is taken from
+    the beacon and not from the address so a beacon rotating its address
+    stays in the same shard.
+    """
+
+    __slots__ = ("uuids", "sources", "partitions", "partition", "filtered")
+
+    def __init__(self, data: Mapping[str, Any]) -> None:
+        """Initialize the shard from the config entry data."""
+        self.uuids: frozenset[UUID] = frozenset(
+            UUID(uuid_str) for uuid_str in data.get(CONF_SHARD_UUIDS, [])
+        )
+        self.sources: frozenset[str] = frozenset(data.get(CONF_SHARD_SOURCES, []))
+        self.partitions: int = data.get(CONF_SHARD_PARTITIONS, 1)
+        self.partition: int = data.get(CONF_SHARD_PARTITION, 0)
+        # Set if advertisements must be checked before they are parsed
+        self.filtered = bool(self.sources) or self.partitions > 1
+
+    @property
+    def key(self) -> tuple[tuple[str, ...], tuple[str, ...], int, int]:
+        """Return a key identifying the shard."""
+        return (
+            tuple(sorted(str(uuid) for uuid in self.uuids)),
+            tuple(sorted(self.sources)),
+            self.partitions,
+            self.partition,
+        )
+
+    def overlaps(self, other: Shard) -> bool:
+        """Return True if a beacon can be in both shards.
+
+        The sources do not keep shards apart as a beacon can be heard by
+        a source of each shard, only the UUIDs and the partition do.
+        """
+        if self.uuids and other.uuids and self.uuids.isdisjoint(other.uuids):
+            return False
+        return not (
+            self.partitions == other.partitions
+            and self.partitions > 1
+            and self.partition != other.partition
+        )
+
+    def matchers(self) -> list[BluetoothCallbackMatcher]:
+        """Return the matchers of the Bluetooth callbacks of the shard."""
+        prefix = [ProxyProximity_FIRST_BYTE, ProxyProximity_SECOND_BYTE]
+        if not self.uuids:
+            return [
+                BluetoothCallbackMatcher(
+                    connectable=False,
+                    manufacturer_id=APPLE_MFR_ID,
+                    manufacturer_data_start=prefix,
+                )
+            ]
+        return [
+            BluetoothCallbackMatcher(
+                connectable=False,
+                manufacturer_id=APPLE_MFR_ID,
+                manufacturer_data_start=[*prefix, *uuid.bytes],
+            )
+            for uuid in sorted(self.uuids)
+        ]
+
+    def accepts(self, source: str, raw_id: memoryview) -> bool:
+        """Return True if an advertisement heard by source belongs to the shard.
+
+        raw_id is the UUID, major and minor as they appear in the
+        manufacturer data.
+        """
+        if self.sources and source not in self.sources:
+            return False
+        return self.partitions == 1 or crc32(raw_id) % self.partitions == self.partition
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the shard as a dict."""
+        return {
+            "uuids": sorted(str(uuid) for uuid in self.uuids),
+            "sources": sorted(self.sources),
+            "partitions": self.partitions,
+            "partition": self.partition,
+        }
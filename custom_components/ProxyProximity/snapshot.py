@@ -0,0 +1,164 @@
+"""Snapshot of the ProxyProximity beacon index for fast warm restarts."""
+from __future__ import annotations
+
+from typing import Any
+from uuid import UUID
+
+from ProxyProximity_ble import (
+    APPLE_MFR_ID,
+    ProxyProximityAdvertisement,
+    ProxyProximityParser,
+)
+
+from homeassistant.components.bluetooth import BluetoothServiceInfo
+
+from .beacon_index import BeaconGroup, BeaconIndex, TrackedBeacon
+
+# Rows are positional lists to keep the stored snapshot compact:
+#
+# uuids:       {uuid: [major, minor, major, minor, ...]}
+# beacons:     [uuid, major, minor, address, transient,
+#               name, manufacturer data hex, rssi, source]
+# random_macs: [uuid, major, minor, name, manufacturer data hex, rssi, source,
+#               device id]
+#
+# name, manufacturer data, rssi and source are None if the beacon
+# has not been seen. complete is set if the snapshot has every device of
+# the entry so the device registry does not need to be restored from.
+
+
+def _advertisement_row(
+    name: str | None,
+    payload: bytes | None,
+    ProxyProximity_advertisement: ProxyProximityAdvertisement | None,
+) -> list[Any]:
+    """Return the last advertisement part of a row."""
+    if payload is None or ProxyProximity_advertisement is None:
+        return [None, None, None, None]
+    return [
+        name,
+        payload.hex(),
+        ProxyProximity_advertisement.rssi,
+        ProxyProximity_advertisement.source,
+    ]
+
+
+def build_snapshot(index: BeaconIndex, complete: bool = False) -> dict[str, Any]:
+    """Build a snapshot of the index."""
+    uuids: dict[str, list[int]] = {}
+    for beacon_uuid in index.uuids.values():
+        major_minors = uuids[beacon_uuid.uuid_str] = []
+        for major, minor in beacon_uuid.groups:
+            major_minors.extend((major, minor))
+    addresses = index.addresses
+    beacons = [
+        [
+            beacon.group.beacon_uuid.uuid_str,
+            beacon.group.major,
+            beacon.group.minor,
+            beacon.address,
+            int(addresses[beacon.address].transient),
+            *_advertisement_row(beacon.name, beacon.payload, beacon.advertisement),
+        ]
+        for beacon in index.beacons.values()
+    ]
+    random_macs = [
+        [
+            group.beacon_uuid.uuid_str,
+            group.major,
+            group.minor,
+            *_advertisement_row(group.name, group.payload, group.advertisement),
+            group.device_id,
+        ]
+        for group in index.random_mac_groups.values()
+    ]
+    return {
+        "uuids": uuids,
+        "beacons": beacons,
+        "random_macs": random_macs,
+        "complete": complete,
+    }
+
+
+def _restore_advertisement(
+    parser: ProxyProximityParser,
+    address: str,
+    name: str | None,
+    payload_hex: str | None,
+    rssi: int | None,
+    source: str | None,
+) -> tuple[bytes, BluetoothServiceInfo, ProxyProximityAdvertisement] | None:
+    """Parse the last advertisement of a row again."""
+    if payload_hex is None or rssi is None or source is None:
+        return None
+    payload = bytes.fromhex(payload_hex)
+    service_info = BluetoothServiceInfo(
+        name=name or address,
+        address=address,
+        rssi=rssi,
+        manufacturer_data={APPLE_MFR_ID: payload},
+        service_data={},
+        service_uuids=[],
+        source=source,
+    )
+    if not (ProxyProximity_advertisement := parser.parse(service_info)):
+        return None
+    return payload, service_info, ProxyProximity_advertisement
+
+
+def restore_snapshot(
+    index: BeaconIndex,
+    data: dict[str, Any],
+    parser: ProxyProximityParser,
+    ignore_uuids: set[str],
+    ignore_addresses: set[str],
+) -> tuple[
+    list[tuple[TrackedBeacon, BluetoothServiceInfo]],
+    list[tuple[BeaconGroup, BluetoothServiceInfo]],
+]:
+    """Restore the index from a snapshot.
+
+    Returns the beacons and random MAC groups whose last advertisement
+    was restored along with the service info it was parsed from.
+    """
+    for uuid_str, major_minors in data["uuids"].items():
+        if uuid_str in ignore_uuids:
+            continue
+        beacon_uuid = index.add_uuid(UUID(uuid_str), uuid_str)
+        for major, minor in zip(major_minors[::2], major_minors[1::2]):
+            index.add_group(beacon_uuid, major, minor)
+
+    restored_beacons: list[tuple[TrackedBeacon, BluetoothServiceInfo]] = []
+    for (
+        uuid_str,
+        major,
+        minor,
+        address,
+        transient,
+        *advertisement_row,
+    ) in data["beacons"]:
+        if uuid_str in ignore_uuids or address in ignore_addresses:
+            continue
+        group = index.add_group(index.add_uuid(UUID(uuid_str), uuid_str), major, minor)
+        beacon = index.track(group, address)
+        index.addresses[address].transient = bool(transient)
+        if restored := _restore_advertisement(parser, address, *advertisement_row):
+            beacon.payload, service_info, beacon.advertisement = restored
+            beacon.name = service_info.name
+            restored_beacons.append((beacon, service_info))
+
+    restored_groups: list[tuple[BeaconGroup, BluetoothServiceInfo]] = []
+    for uuid_str, major, minor, *advertisement_row in data["random_macs"]:
+        if uuid_str in ignore_uuids:
+            continue
+        group = index.add_group(index.add_uuid(UUID(uuid_str), uuid_str), major, minor)
+        # Snapshots saved before groups could take over the device of an
+        # address do not have the device id
+        device_id = advertisement_row.pop() if len(advertisement_row) > 4 else None
+        index.set_random_mac(group, device_id)
+        if restored := _restore_advertisement(parser, group.group_id, *advertisement_row):
+            group.payload, service_info, group.advertisement = restored
+            group.name = service_info.name
+            restored_groups.append((group, service_info))
+
+    return restored_beacons, restored_groups
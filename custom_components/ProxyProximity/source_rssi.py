@@ -0,0 +1,103 @@
+"""Per source RSSI tracking for ProxyProximity beacons."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Callable
+
+from .const import (
+    MAX_SOURCES_PER_BEACON,
+    NEAREST_SOURCE_HYSTERESIS,
+    SOURCE_RSSI_DECAY,
+    SOURCE_RSSI_MAX_AGE,
+)
+
+
+class SourceRssiTable:
+    """Recent RSSI of a beacon as heard by each source.
+
+    Holds at most size sources in preallocated arrays, the oldest source
+    is replaced when a new one is heard. The RSSI of a source loses
+    SOURCE_RSSI_DECAY dB per second since it was last heard, and sources not
+    heard for SOURCE_RSSI_MAX_AGE seconds are dropped. The nearest source
+    only changes when another source is stronger by more than the
+    hysteresis so it does not flip between proxies that hear the beacon
+    about equally well.
+
+    data holds the RSSI of each slot, then the time each source was last
+    heard, then the area column of each source, -1 if it has none, so
+    the area engine can copy the tables of every beacon in a single
+    join. The column is looked up with source_column when a source takes
+    a slot.
+    """
+
+    __slots__ = ("sources", "data", "nearest", "_source_column")
+
+    def __init__(
+        self, source_column: Callable[[str], int], size: int = MAX_SOURCES_PER_BEACON
+    ) -> None:
+        """Initialize the table."""
+        self._source_column = source_column
+        self.sources: list[str | None] = [None] * size
+        self.data = array("d", [0.0] * (2 * size) + [-1.0] * size)
+        self.nearest: str | None = None
+
+    def add(self, source: str, rssi: int, seen: float) -> None:
+        """Add an RSSI sample heard by a source."""
+        sources = self.sources
+        data = self.data
+        size = len(sources)
+        try:
+            slot = sources.index(source)
+        except ValueError:
+            if None in sources:
+                slot = sources.index(None)
+            else:
+                slot = min(range(size), key=data[size : 2 * size].__getitem__)
+            sources[slot] = source
+            data[2 * size + slot] = self._source_column(source)
+        else:
+            if seen < data[size + slot]:
+                return
+        data[slot] = rssi
+        data[size + slot] = seen
+
+    def refresh(self, now: float) -> bool:
+        """Drop expired sources and update the nearest source.
+
+        Returns True if the nearest source changed.
+        """
+        sources = self.sources
+        data = self.data
+        size = len(sources)
+        best: str | None = None
+        best_rssi = 0.0
+        nearest_rssi: float | None = None
+        for slot, source in enumerate(sources):
+            if source is None:
+                continue
+            age = now - data[size + slot]
+            if age > SOURCE_RSSI_MAX_AGE:
+                sources[slot] = None
+                continue
+            decayed = data[slot] - SOURCE_RSSI_DECAY * max(age, 0.0)
+            if source == self.nearest:
+                nearest_rssi = decayed
+            if best is None or decayed > best_rssi:
+                best = source
+                best_rssi = decayed
+        if best == self.nearest or (
+            nearest_rssi is not None
+            and best_rssi - nearest_rssi <= NEAREST_SOURCE_HYSTERESIS
+        ):
+            return False
+        self.nearest = best
+        return True
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the last RSSI heard by each source."""
+        data = self.data
+        return {
+            source: int(data[slot])
+            for slot, source in enumerate(self.sources)
+            if source is not None
+        }
@@ -0,0 +1,144 @@
+"""Coalescing of ProxyProximity state writes."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+import time
+
+from ProxyProximity_ble import ProxyProximityAdvertisement
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+MONOTONIC_TIME = time.monotonic
+
+# The advertisement, RSSI and distance of an update
+_PendingUpdate = tuple[ProxyProximityAdvertisement, float, float | None]
+
+
+class _DeviceWriteState:
+    """The values last written for a device."""
+
+    __slots__ = ("last_write", "rssi", "distance")
+
+    def __init__(self) -> None:
+        """Initialize the write state."""
+        self.last_write = 0.0
+        self.rssi: float | None = None
+        self.distance: float | None = None
+
+
+class StateWriteCoalescer:
+    """Rate limit seen updates per device.
+
+    An update is written right away when the device has not been written
+    for min_interval seconds, when it comes back from being unavailable or
+    when the RSSI or distance changed significantly. Otherwise only the
+    latest advertisement is kept and all pending devices are written in a
+    single batch at the end of the debounce window.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        write: Callable[[str, ProxyProximityAdvertisement], None],
+        min_interval: float,
+        rssi_threshold: float,
+        distance_threshold: float,
+    ) -> None:
+        """Initialize the coalescer."""
+        self._hass = hass
+        self._write = write
+        self._min_interval = min_interval
+        self._rssi_threshold = rssi_threshold
+        self._distance_threshold = distance_threshold
+        self._states: dict[str, _DeviceWriteState] = {}
+        self._pending: dict[str, _PendingUpdate] = {}
+        self._cancel_flush: CALLBACK_TYPE | None = None
+
+    def _is_significant(
+        self, state: _DeviceWriteState, rssi: float, distance: float | None
+    ) -> bool:
+        """Return True if the RSSI or distance changed enough to write right away."""
+        if state.rssi is None or abs(rssi - state.rssi) >= self._rssi_threshold:
+            return True
+        if distance is None or state.distance is None:
+            return distance is not state.distance
+        return abs(distance - state.distance) >= self._distance_threshold
+
+    @callback
+    def _async_write(
+        self,
+        device_id: str,
+        state: _DeviceWriteState,
+        update: _PendingUpdate,
+        now: float,
+    ) -> None:
+        """Write an update and remember what was written."""
+        ProxyProximity_advertisement, state.rssi, state.distance = update
+        state.last_write = now
+        self._write(device_id, ProxyProximity_advertisement)
+
+    @callback
+    def async_seen(
+        self,
+        device_id: str,
+        ProxyProximity_advertisement: ProxyProximityAdvertisement,
+        rssi: float,
+        distance: float | None,
+        force: bool = False,
+    ) -> None:
+        """Write or coalesce a seen update for a device.
+
+        The significant change check uses the rssi and distance passed
+        in, which are the smoothed values when a filter is in use. Set
+        force when something else the entities show changed significantly.
+        """
+        now = MONOTONIC_TIME()
+        update = (ProxyProximity_advertisement, rssi, distance)
+        if not (state := self._states.get(device_id)):
+            state = self._states[device_id] = _DeviceWriteState()
+        if (
+            force
+            or now - state.last_write >= self._min_interval
+            or self._is_significant(state, rssi, distance)
+        ):
+            self._pending.pop(device_id, None)
+            self._async_write(device_id, state, update, now)
+            return
+        self._pending[device_id] = update
+        if self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self._hass, self._min_interval, self._async_flush
+            )
+
+    @callback
+    def async_unavailable(self, device_id: str) -> None:
+        """Forget a device that went unavailable so it is written as soon as it is seen again."""
+        self._pending.pop(device_id, None)
+        self._states.pop(device_id, None)
+
+    @callback
+    def async_remove(self, device_id: str) -> None:
+        """Forget a device that is no longer tracked."""
+        self.async_unavailable(device_id)
+
+    @callback
+    def _async_flush(self, _now: datetime) -> None:
+        """Write all the pending updates."""
+        self._cancel_flush = None
+        pending = self._pending
+        self._pending = {}
+        now = MONOTONIC_TIME()
+        states = self._states
+        for device_id, update in pending.items():
+            if state := states.get(device_id):
+                self._async_write(device_id, state, update, now)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the coalescer and drop any pending updates."""
+        if self._cancel_flush:
+            self._cancel_flush()
+            self._cancel_flush = None
+        self._pending.clear()
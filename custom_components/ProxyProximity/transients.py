@@ -0,0 +1,88 @@
+"""Admission of transient ProxyProximity beacons."""
+from __future__ import annotations
+
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+from .expiry import ExpiryQueue
+
+_KeyT = TypeVar("_KeyT", bound=Hashable)
+
+
+class TransientCandidate:
+    """When a transient beacon was first and last seen and how often."""
+
+    __slots__ = ("first_seen", "last_seen", "observations")
+
+    def __init__(self, seen: float) -> None:
+        """Initialize the candidate."""
+        self.first_seen = seen
+        self.last_seen = seen
+        self.observations = 1
+
+
+class TransientAdmission(Generic[_KeyT]):
+    """Decides when a transient beacon has stayed long enough to be tracked.
+
+    A candidate is admitted as soon as it has been observed min_observations
+    times over at least dwell seconds. Candidates not observed for stale
+    seconds are dropped from a deadline queue so nothing has to walk the
+    candidates to find them.
+    """
+
+    def __init__(self, dwell: float, min_observations: int, stale: float) -> None:
+        """Initialize the admission."""
+        self._dwell = dwell
+        self._min_observations = min_observations
+        self._stale = stale
+        self._candidates: dict[_KeyT, TransientCandidate] = {}
+        self._stale_queue: ExpiryQueue[_KeyT] = ExpiryQueue()
+
+    def __len__(self) -> int:
+        """Return the number of candidates."""
+        return len(self._candidates)
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if the key is a candidate."""
+        return key in self._candidates
+
+    def add(self, key: _KeyT, seen: float) -> None:
+        """Start tracking a candidate first seen at seen."""
+        self._candidates[key] = TransientCandidate(seen)
+        self._stale_queue.schedule(key, seen + self._stale)
+
+    def observe(self, key: _KeyT, seen: float) -> bool:
+        """Record an observation of a candidate.
+
+        Returns True and forgets the candidate if it is admitted.
+        Observations that are not newer than the last one are ignored.
+        """
+        if not (candidate := self._candidates.get(key)) or seen <= candidate.last_seen:
+            return False
+        candidate.last_seen = seen
+        candidate.observations += 1
+        if (
+            candidate.observations >= self._min_observations
+            and seen - candidate.first_seen >= self._dwell
+        ):
+            self.discard(key)
+            return True
+        self._stale_queue.schedule(key, seen + self._stale)
+        return False
+
+    def discard(self, key: _KeyT) -> None:
+        """Forget a candidate."""
+        if self._candidates.pop(key, None) is not None:
+            self._stale_queue.discard(key)
+
+    def clear(self) -> None:
+        """Forget all candidates."""
+        self._candidates.clear()
+        self._stale_queue.clear()
+
+    def pop_stale(self, now: float) -> list[_KeyT]:
+        """Forget and return the candidates not observed for the stale period."""
+        stale = self._stale_queue.pop_expired(now)
+        for key in stale:
+            del self._candidates[key]
+        return stale